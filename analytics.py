@@ -0,0 +1,211 @@
+# analytics.py
+#
+# This module contains functions for portfolio-wide analysis of the
+# dependency catalog, using a sparse app x dependency-version incidence
+# matrix.
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# numpy is required for this module; scipy is optional, and only used to
+# hand back a scipy.sparse matrix and to speed up app similarity.
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+try:
+  import scipy.sparse
+except ImportError:
+  scipy = None
+
+# number of threat levels reported by Nexus IQ (0 through 10)
+NUM_THREAT_LEVELS = 11
+
+class IncidenceMatrix:
+
+  # Rows are apps and columns are dependency-versions, in CSR form:
+  # the dependency columns used by app i are indices[indptr[i]:indptr[i+1]].
+  # threats[j] and categories[j] describe dependency j; a threat of -1
+  # means Nexus IQ reported no threat level.
+  def __init__(self, appNames, depStrings, indptr, indices, threats,
+    categories, categoryNames):
+    super(IncidenceMatrix, self).__init__()
+
+    self.appNames = appNames
+    self.depStrings = depStrings
+    self.indptr = indptr
+    self.indices = indices
+    self.threats = threats
+    self.categories = categories
+    self.categoryNames = categoryNames
+
+  @property
+  def shape(self):
+    return (len(self.appNames), len(self.depStrings))
+
+  # returns: array with the row (app) index of each entry in indices
+  def rowIndices(self):
+    return np.repeat(np.arange(len(self.appNames)), np.diff(self.indptr))
+
+  # returns: scipy.sparse.csr_matrix of 0/1 entries
+  def toScipy(self):
+    if scipy is None:
+      raise ImportError("scipy is required for IncidenceMatrix.toScipy()")
+    data = np.ones(len(self.indices), dtype=np.int32)
+    return scipy.sparse.csr_matrix((data, self.indices, self.indptr),
+      shape=self.shape)
+
+def _requireNumpy():
+  if np is None:
+    raise ImportError("numpy is required for analytics; install it with `pip install numpy`")
+
+# Build the incidence matrix for all apps and dependency-versions in the
+# catalogs.
+# arguments:
+#   1) NexusData
+# returns: IncidenceMatrix
+def buildIncidenceMatrix(nd):
+  _requireNumpy()
+  depCatalog = nd._depCatalog
+
+  depStrings = sorted(depCatalog._dependencies.keys())
+  depIndexes = {ds: j for j, ds in enumerate(depStrings)}
+
+  categoryNames = sorted(depCatalog.getCategories())
+  categoryIndexes = {c: k for k, c in enumerate(categoryNames)}
+  threats = np.full(len(depStrings), -1, dtype=np.int8)
+  categories = np.zeros(len(depStrings), dtype=np.int16)
+  for j, ds in enumerate(depStrings):
+    threat, category, licString = depCatalog._indexKeys[ds]
+    if threat is not None:
+      threats[j] = threat
+    categories[j] = categoryIndexes[category]
+
+  # use the app index rather than each app's own list, so that repeated
+  # occurrences within an app only count once
+  appNames = sorted(depCatalog._byApp.keys())
+  indptr = np.zeros(len(appNames) + 1, dtype=np.int64)
+  columns = []
+  for i, appName in enumerate(appNames):
+    cols = sorted(depIndexes[ds] for ds in depCatalog._byApp[appName])
+    columns.extend(cols)
+    indptr[i+1] = indptr[i] + len(cols)
+  indices = np.array(columns, dtype=np.int32)
+
+  return IncidenceMatrix(appNames, depStrings, indptr, indices, threats,
+    categories, categoryNames)
+
+# returns: array of shape (apps, NUM_THREAT_LEVELS + 1), counting each
+#          app's dependencies at each threat level; the last column counts
+#          dependencies with no threat level
+def threatDistributionPerApp(m):
+  _requireNumpy()
+  threats = m.threats[m.indices].astype(np.int64)
+  threats[threats < 0] = NUM_THREAT_LEVELS
+  width = NUM_THREAT_LEVELS + 1
+  counts = np.bincount(m.rowIndices() * width + threats,
+    minlength=len(m.appNames) * width)
+  return counts.reshape(len(m.appNames), width)
+
+# returns: array of shape (apps, categories), counting each app's
+#          dependencies in each of m.categoryNames
+def categoryDistributionPerApp(m):
+  _requireNumpy()
+  width = len(m.categoryNames)
+  counts = np.bincount(m.rowIndices() * width + m.categories[m.indices],
+    minlength=len(m.appNames) * width)
+  return counts.reshape(len(m.appNames), width)
+
+# returns: array with the number of apps using each dependency-version
+def appsPerDependency(m):
+  _requireNumpy()
+  return np.bincount(m.indices, minlength=len(m.depStrings))
+
+# Rank the dependency-versions whose clearing would remove the most red
+# (app, dependency) findings across the portfolio.
+# arguments:
+#   1) IncidenceMatrix
+#   2) optional: minimum threat level counted as red
+#   3) optional: number of results to return
+# returns: list of tuples (depString, threat, number of apps) in
+#          decreasing order of number of apps
+def getRedClearanceImpact(m, minThreat=8, topN=25):
+  _requireNumpy()
+  counts = appsPerDependency(m)
+  red = np.nonzero(m.threats >= minThreat)[0]
+  order = red[np.argsort(-counts[red], kind="stable")][:topN]
+  return [(m.depStrings[j], int(m.threats[j]), int(counts[j])) for j in order]
+
+# returns: dense array of shape (apps, apps) with the Jaccard similarity of
+#          each pair of apps' dependency sets
+def getAppSimilarity(m):
+  _requireNumpy()
+  sizes = np.diff(m.indptr).astype(np.float64)
+  if scipy is not None:
+    M = m.toScipy()
+    shared = (M @ M.T).toarray().astype(np.float64)
+  else:
+    dense = np.zeros(m.shape, dtype=np.float32)
+    dense[m.rowIndices(), m.indices] = 1.0
+    shared = (dense @ dense.T).astype(np.float64)
+  union = sizes[:, None] + sizes[None, :] - shared
+  with np.errstate(divide="ignore", invalid="ignore"):
+    similarity = np.where(union > 0, shared / union, 0.0)
+  return similarity
+
+# Group apps into clusters, where apps whose dependency sets have at least
+# the given Jaccard similarity end up in the same cluster.
+# returns: list of lists of app names, largest cluster first
+def getAppClusters(m, threshold=0.5):
+  similarity = getAppSimilarity(m)
+  n = len(m.appNames)
+  parent = list(range(n))
+
+  def find(i):
+    while parent[i] != i:
+      parent[i] = parent[parent[i]]
+      i = parent[i]
+    return i
+
+  rows, cols = np.nonzero(np.triu(similarity >= threshold, k=1))
+  for i, j in zip(rows, cols):
+    ri, rj = find(i), find(j)
+    if ri != rj:
+      parent[rj] = ri
+
+  clusters = {}
+  for i in range(n):
+    clusters.setdefault(find(i), []).append(m.appNames[i])
+  return sorted(clusters.values(), key=len, reverse=True)
+
+# Save the incidence matrix and its aligned arrays to a .npz file, for
+# loading into other analysis tools with numpy.load().
+# returns: filename if successfully written, or None if error.
+def saveIncidenceMatrix(m, filename):
+  _requireNumpy()
+  try:
+    np.savez_compressed(filename,
+      appNames=np.array(m.appNames, dtype=object).astype(str),
+      depStrings=np.array(m.depStrings, dtype=object).astype(str),
+      indptr=m.indptr, indices=m.indices, threats=m.threats,
+      categories=m.categories,
+      categoryNames=np.array(m.categoryNames, dtype=object).astype(str))
+    return filename
+
+  except Exception as e:
+    print(f"Couldn't output incidence matrix to {filename}: {str(e)}")
+    return None
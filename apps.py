@@ -19,16 +19,60 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+# How current an app's license data is after a run:
+#   current => from the app's latest report
+#   stale   => from an older stored copy, because the latest report
+#              couldn't be fetched before the deadline or at all
+#   missing => no license data for the app
+FETCH_STATUS_CURRENT = "current"
+FETCH_STATUS_STALE = "stale"
+FETCH_STATUS_MISSING = "missing"
+
+# One organization in Nexus IQ, with the Jenkins instance that builds its
+# apps. A run can cover several targets; each app records the name of the
+# target it came from.
+class NexusTarget:
+
+  def __init__(self, name, orgId, baseurl, jenkinsBaseurl, username, password):
+    super(NexusTarget, self).__init__()
+
+    self._name = name
+    self._orgId = orgId
+    self._baseurl = baseurl
+    self._jenkinsBaseurl = jenkinsBaseurl
+    self._username = username
+    self._password = password
+
+  def getName(self):
+    return self._name
+
+  def getOrgId(self):
+    return self._orgId
+
+# takes: (1) target name, (2) Jenkins job branch ID
+# returns: app branch ID used as the catalog key; branch IDs are qualified
+#          as "target.branch" for named targets, so that the same job name
+#          under two Jenkins instances doesn't collide
+def getTargetBranchId(target, branchId):
+  if target:
+    return f"{target}.{branchId}"
+  return branchId
+
 class NexusApp:
 
-  def __init__(self, name, appId, branchId, reportId=None):
+  def __init__(self, name, appId, branchId, reportId=None, target=""):
     super(NexusApp, self).__init__()
 
     self._name = name
     self._appId = appId
     self._branchId = branchId
     self._reportId = reportId
+    # name of the NexusTarget this app came from, or "" if the run has
+    # only the one unnamed target
+    self._target = target
     self._dependencies = []
+    # one of the FETCH_STATUS_ values, or None if not fetched in this run
+    self._fetchStatus = None
 
   def getAppId(self):
     return self._appId
@@ -39,14 +83,34 @@ class NexusApp:
   def getReportId(self):
     return self._reportId
 
+  def getTarget(self):
+    return self._target
+
   def setReportId(self, reportId):
     self._reportId = reportId
 
+  def getFetchStatus(self):
+    return self._fetchStatus
+
+  def setFetchStatus(self, fetchStatus):
+    self._fetchStatus = fetchStatus
+
   def addDependency(self, depString):
     # FIXME should this be a set? can depstrings not be unique?
     # FIXME should we check first whether the dependency is present?
     self._dependencies.append(depString)
 
+  def toDict(self):
+    return {
+      "name": self._name,
+      "appId": self._appId,
+      "branchId": self._branchId,
+      "reportId": self._reportId,
+      "fetchStatus": self._fetchStatus,
+      "target": self._target,
+      "dependencies": self._dependencies,
+    }
+
 class NexusAppCatalog:
 
   def __init__(self, orgId):
@@ -55,15 +119,35 @@ class NexusAppCatalog:
     self._apps = {}
     self._orgId = orgId
 
-  def addApp(self, name, appId="", branchId="", reportId=""):
-    app = NexusApp(name, appId, branchId, reportId)
+  def addApp(self, name, appId="", branchId="", reportId="", target=""):
+    app = NexusApp(name, appId, branchId, reportId, target)
     self._apps[branchId] = app
 
+  def removeApp(self, branchId):
+    self._apps.pop(branchId, None)
+
   def getApp(self, branchId):
     return self._apps.get(branchId, None)
 
   def getAllAppBranches(self):
     return sorted(list(self._apps.keys()))
 
+  # returns: list of app branches whose license data is stale or missing
+  def getIncompleteAppBranches(self):
+    return [b for b in self.getAllAppBranches()
+      if self._apps[b].getFetchStatus() in [FETCH_STATUS_STALE, FETCH_STATUS_MISSING]]
+
+  # returns: sorted list of app branches that came from the given target
+  def getAppBranchesForTarget(self, target):
+    return [b for b in self.getAllAppBranches() if self._apps[b]._target == target]
+
+  # returns: new NexusAppCatalog for the given target's org, sharing this
+  #          catalog's NexusApp objects for that target's apps
+  def getCatalogForTarget(self, target, orgId):
+    catalog = NexusAppCatalog(orgId)
+    for branchId in self.getAppBranchesForTarget(target):
+      catalog._apps[branchId] = self._apps[branchId]
+    return catalog
+
   def __len__(self):
     return len(self._apps)
@@ -0,0 +1,97 @@
+# bench.py
+#
+# This module contains functions for timing the offline stages of a run
+# (loading the catalogs, categorizing, writing reports and querying)
+# several times over, to compare performance between versions.
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import statistics
+import tempfile
+import time
+
+from reports import collectAllLicenses, createExcelReportAllLicenses, createRedReport
+
+BENCH_PHASES = ["load", "categorization", "report-writing", "query"]
+
+# run the same queries as a typical script would: red findings, each
+# category, and each app
+def _runQueries(nd):
+  depCatalog = nd._depCatalog
+  depCatalog.queryDependencies(minThreat=8)
+  for category in depCatalog.getCategories():
+    depCatalog.queryDependencies(category=category)
+  if nd._appCatalog:
+    for appBranch in nd._appCatalog.getAllAppBranches():
+      depCatalog.queryDependencies(appName=appBranch)
+
+# Time each offline phase, repeatedly. Reports are written to a temporary
+# directory that is removed afterwards.
+# arguments:
+#   1) function returning a newly loaded NexusData, or None if it couldn't
+#      be loaded
+#   2) number of times to repeat
+# returns: dict of {phase => list of seconds, one per repeat}, or None if
+#          the catalogs couldn't be loaded or repeat is less than 1
+def runBenchmark(loadNexusData, repeat=5):
+  if repeat < 1:
+    print(f"Invalid repeat count {repeat}; expected at least 1")
+    return None
+  timings = {phase: [] for phase in BENCH_PHASES}
+  with tempfile.TemporaryDirectory() as tmpDir:
+    for i in range(repeat):
+      start = time.perf_counter()
+      nd = loadNexusData()
+      if nd is None:
+        return None
+      timings["load"].append(time.perf_counter() - start)
+
+      start = time.perf_counter()
+      collected = collectAllLicenses(nd)
+      timings["categorization"].append(time.perf_counter() - start)
+
+      nd._reportsDir = tmpDir
+      start = time.perf_counter()
+      createExcelReportAllLicenses(nd, f"{tmpDir}/report.xlsx", collected)
+      createRedReport(nd)
+      timings["report-writing"].append(time.perf_counter() - start)
+
+      start = time.perf_counter()
+      _runQueries(nd)
+      timings["query"].append(time.perf_counter() - start)
+  return timings
+
+# returns: text table of the first, minimum and median time for each phase;
+#          the first repeat is shown separately since later ones run with
+#          warm caches
+def formatBenchmark(timings):
+  lines = [f"{'phase':<16} {'first':>9} {'min':>9} {'median':>9}"]
+  for phase in BENCH_PHASES:
+    times = timings[phase]
+    lines.append(f"{phase:<16} {times[0]:9.4f} {min(times):9.4f} {statistics.median(times):9.4f}")
+  return "\n".join(lines)
+
+def saveBenchmark(timings, filename):
+  try:
+    with open(filename, 'w') as f:
+      json.dump(timings, f, indent=2)
+    return True
+
+  except Exception as e:
+    print(f"Couldn't save benchmark timings to {filename}: {str(e)}")
+    return False
@@ -0,0 +1,72 @@
+# catalogdiff.py
+#
+# This module contains functions for comparing the catalogs from two runs,
+# e.g. two snapshots, to see which dependencies and licenses changed.
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# fields compared for dependency-versions present in both catalogs, as
+# (name, function of (DependencyCatalog, depString) => value)
+DIFF_FIELDS = [
+  ("license", lambda dc, ds: dc._indexKeys[ds][2]),
+  ("category", lambda dc, ds: dc._indexKeys[ds][1]),
+  ("threat", lambda dc, ds: dc._indexKeys[ds][0]),
+  ("status", lambda dc, ds: dc._dependencies[ds]._status),
+]
+
+# Compare the catalogs of two NexusData objects. Uses the catalogs'
+# secondary indexes, so nothing is recategorized.
+# arguments:
+#   1) older NexusData
+#   2) newer NexusData
+# returns: dict with:
+#   "addedApps", "removedApps"  => sorted lists of app branch IDs
+#   "added", "removed"          => sorted lists of depStrings
+#   "changed"                   => list of (depString, field, old value,
+#                                  new value) for each field in DIFF_FIELDS
+#                                  that differs, sorted by depString
+#   "usage"                     => list of (depString, [apps no longer
+#                                  using it], [apps newly using it])
+def diffCatalogs(oldNd, newNd):
+  oldApps = set(oldNd._appCatalog.getAllAppBranches()) if oldNd._appCatalog else set()
+  newApps = set(newNd._appCatalog.getAllAppBranches()) if newNd._appCatalog else set()
+  oldDeps = oldNd._depCatalog
+  newDeps = newNd._depCatalog
+  oldKeys = set(oldDeps._dependencies.keys())
+  newKeys = set(newDeps._dependencies.keys())
+
+  changed = []
+  usage = []
+  for ds in sorted(oldKeys & newKeys):
+    for field, getValue in DIFF_FIELDS:
+      oldValue = getValue(oldDeps, ds)
+      newValue = getValue(newDeps, ds)
+      if oldValue != newValue:
+        changed.append((ds, field, oldValue, newValue))
+    oldUsers = set(oldDeps._dependencies[ds]._appNames)
+    newUsers = set(newDeps._dependencies[ds]._appNames)
+    if oldUsers != newUsers:
+      usage.append((ds, sorted(oldUsers - newUsers), sorted(newUsers - oldUsers)))
+
+  return {
+    "addedApps": sorted(newApps - oldApps),
+    "removedApps": sorted(oldApps - newApps),
+    "added": sorted(newKeys - oldKeys),
+    "removed": sorted(oldKeys - newKeys),
+    "changed": changed,
+    "usage": usage,
+  }
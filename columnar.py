@@ -0,0 +1,203 @@
+# columnar.py
+#
+# This module contains functions for exporting the dependency catalog and
+# app membership to Apache Arrow IPC or Parquet files, and for loading a
+# catalog back from them.
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+from pathlib import Path
+
+# pyarrow is optional, and only needed for this module
+try:
+  import pyarrow as pa
+  import pyarrow.feather
+  import pyarrow.parquet
+except ImportError:
+  pa = None
+
+from apps import NexusAppCatalog
+from deps import Dependency, DependencyCatalog
+
+COLUMNAR_FORMAT_VERSION = 1
+
+# One row per dependency-version. The status, license and category columns
+# (and the app names inside the apps lists) are dictionary-encoded, since a
+# few hundred distinct values repeat across many thousands of rows. App
+# details that aren't per-dependency (app ID, report ID) are kept as JSON
+# in the schema metadata under "nexusDeps.apps". "appStatuses" lists the
+# clearing status each app in "apps" reported for the dependency.
+
+LICENSE_KINDS = [
+  ("final", "overriddenLicenses"),
+  ("effective", "effectiveLicenses"),
+  ("observed", "observedLicenses"),
+  ("declared", "declaredLicenses"),
+]
+
+def _requirePyarrow():
+  if pa is None:
+    raise ImportError("pyarrow is required for Arrow / Parquet export; install it with `pip install pyarrow`")
+
+def _isParquet(filename):
+  return filename.endswith(".parquet")
+
+# Build an Arrow table for the given NexusData's catalogs.
+# returns: pyarrow.Table
+def buildCatalogTable(nd):
+  _requirePyarrow()
+  depCatalog = nd._depCatalog
+  depStrings = sorted(depCatalog._dependencies.keys())
+  deps = [depCatalog._dependencies[ds] for ds in depStrings]
+
+  threats = []
+  licStrings = []
+  categories = []
+  for ds in depStrings:
+    threat, category, licString = depCatalog._indexKeys[ds]
+    threats.append(threat)
+    licStrings.append(licString)
+    categories.append(category)
+
+  dictString = pa.dictionary(pa.int32(), pa.string())
+  columns = {
+    "depString": pa.array(depStrings, pa.string()),
+    "groupId": pa.array([d._groupId for d in deps], pa.string()),
+    "artifactId": pa.array([d._artifactId for d in deps], pa.string()),
+    "version": pa.array([d._version for d in deps], pa.string()),
+    "status": pa.array([d._status for d in deps], pa.string()).dictionary_encode(),
+    "threat": pa.array(threats, pa.int8()),
+    "license": pa.array(licStrings, pa.string()).dictionary_encode(),
+    "category": pa.array(categories, pa.string()).dictionary_encode(),
+    "overriddenLicenseThreat": pa.array([d._overriddenLicenseThreat for d in deps], pa.int8()),
+    "effectiveLicenseThreat": pa.array([d._effectiveLicenseThreat for d in deps], pa.int8()),
+  }
+  for kind, column in LICENSE_KINDS:
+    columns[column] = pa.array([d._licenses[kind] or [] for d in deps],
+      pa.list_(pa.string()))
+  columns["apps"] = pa.array([d._appNames for d in deps],
+    pa.list_(dictString))
+  appStatuses = depCatalog._appStatuses
+  columns["appStatuses"] = pa.array([[appStatuses.get(ds, {}).get(a, d._status)
+    for a in d._appNames] for ds, d in zip(depStrings, deps)],
+    pa.list_(dictString))
+
+  apps = []
+  if nd._appCatalog:
+    for appBranch in nd._appCatalog.getAllAppBranches():
+      appDict = nd._appCatalog.getApp(appBranch).toDict()
+      del appDict["dependencies"]
+      apps.append(appDict)
+  metadata = {
+    "nexusDeps.version": str(COLUMNAR_FORMAT_VERSION),
+    "nexusDeps.organizationId": (nd._appCatalog._orgId if nd._appCatalog else nd._orgId) or "",
+    "nexusDeps.apps": json.dumps(apps),
+  }
+  return pa.table(columns).replace_schema_metadata(metadata)
+
+# Export the catalogs to a Parquet file (if the filename ends in .parquet)
+# or an Arrow IPC / Feather v2 file (otherwise).
+# returns: filename if successfully written, or None if error.
+def exportCatalog(nd, filename):
+  _requirePyarrow()
+  table = buildCatalogTable(nd)
+  try:
+    Path(filename).parent.mkdir(parents=True, exist_ok=True)
+    tmpFilename = f"{filename}.tmp"
+    if _isParquet(filename):
+      pyarrow.parquet.write_table(table, tmpFilename, compression="zstd")
+    else:
+      pyarrow.feather.write_feather(table, tmpFilename, compression="zstd")
+    os.replace(tmpFilename, filename)
+    return filename
+
+  except Exception as e:
+    print(f"Couldn't output columnar catalog to {filename}: {str(e)}")
+    return None
+
+# Load catalogs previously written by exportCatalog into the given
+# NexusData, replacing its catalogs, e.g. for offline reporting.
+# returns: True if successfully loaded, False otherwise.
+def importCatalog(nd, filename):
+  _requirePyarrow()
+  try:
+    if _isParquet(filename):
+      table = pyarrow.parquet.read_table(filename)
+    else:
+      table = pyarrow.feather.read_table(filename)
+  except Exception as e:
+    print(f"Couldn't load columnar catalog from {filename}: {str(e)}")
+    return False
+
+  metadata = table.schema.metadata or {}
+  version = metadata.get(b"nexusDeps.version", b"").decode("utf-8")
+  if version != str(COLUMNAR_FORMAT_VERSION):
+    print(f"{filename} has unsupported nexusDeps columnar version {version!r}")
+    return False
+
+  columnNames = ["depString", "groupId", "artifactId", "version",
+    "status", "overriddenLicenseThreat", "effectiveLicenseThreat",
+    "overriddenLicenses", "effectiveLicenses", "observedLicenses",
+    "declaredLicenses", "apps"]
+  # exports from before per-app statuses were kept have no appStatuses
+  # column; each app then gets the dependency's status
+  hasAppStatuses = "appStatuses" in table.column_names
+  if hasAppStatuses:
+    columnNames.append("appStatuses")
+  rows = table.select(columnNames).to_pydict()
+
+  depCatalog = DependencyCatalog()
+  appDeps = {}
+  for i, ds in enumerate(rows["depString"]):
+    dep = Dependency()
+    dep._groupId = rows["groupId"][i]
+    dep._artifactId = rows["artifactId"][i]
+    dep._version = rows["version"][i]
+    dep._status = rows["status"][i]
+    dep._overriddenLicenseThreat = rows["overriddenLicenseThreat"][i]
+    dep._effectiveLicenseThreat = rows["effectiveLicenseThreat"][i]
+    for kind, column in LICENSE_KINDS:
+      dep._licenses[kind] = rows[column][i]
+    dep._appNames = rows["apps"][i]
+    depCatalog._dependencies[ds] = dep
+    if hasAppStatuses:
+      depCatalog._appStatuses[ds] = dict(zip(dep._appNames, rows["appStatuses"][i]))
+    elif dep._appNames:
+      depCatalog._appStatuses[ds] = {a: dep._status for a in dep._appNames}
+    for appName in dep._appNames:
+      appDeps.setdefault(appName, []).append(ds)
+  depCatalog.rebuildIndexes()
+
+  orgId = metadata.get(b"nexusDeps.organizationId", b"").decode("utf-8")
+  appCatalog = NexusAppCatalog(orgId)
+  apps = json.loads(metadata.get(b"nexusDeps.apps", b"[]"))
+  for appDict in apps:
+    appCatalog.addApp(appDict["name"], appDict["appId"], appDict["branchId"],
+      appDict["reportId"], appDict.get("target", ""))
+    appCatalog.getApp(appDict["branchId"]).setFetchStatus(appDict.get("fetchStatus", None))
+  for appName, dss in appDeps.items():
+    app = appCatalog.getApp(appName)
+    if not app:
+      appCatalog.addApp("", "", appName, "")
+      app = appCatalog.getApp(appName)
+    app._dependencies = dss
+
+  nd._depCatalog = depCatalog
+  nd._appCatalog = appCatalog
+  return True
@@ -19,6 +19,10 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import functools
+
+# whole-string conversions; these are checked first, and take precedence
+# over the term-level rules below
 CONVERSIONS = {
     "EDL-1.0 AND EPL-1.0": "EPL-1.0 AND BSD-3-Clause",
     "BSD-3-Clause AND EDL-1.0": "BSD-3-Clause",
@@ -27,9 +31,105 @@ CONVERSIONS = {
     "Apache-2.0 AND BSD-3-Clause AND Generic-Open-Source-Clause": "Apache-2.0 AND BSD-3-Clause",
 }
 
+# term-level rules, applied to each license term within any combination of
+# terms joined by " AND ".
+
+# terms to replace with another term wherever they appear
+REPLACE_TERMS = {
+    "EDL-1.0": "BSD-3-Clause",
+}
+
+# terms to drop from a combination, as long as at least one other term remains
+DROP_TERMS = [
+    "Generic-Liberal-Clause",
+    "Generic-Open-Source-Clause",
+]
+
+# (trigger term, term, replacement): if the trigger term is present in a
+# combination, it implies that the term should be read as the replacement
+IMPLIES_TERMS = [
+    ("Generic-Liberal-Clause", "BSD", "BSD-3-Clause"),
+]
+
+# takes: (1) license string
+# returns: list of top-level license terms that were joined by " AND ",
+#          leaving anything inside parentheses intact
+def splitLicenseTerms(licString):
+    terms = []
+    depth = 0
+    start = 0
+    i = 0
+    while i < len(licString):
+        c = licString[i]
+        if c == "(":
+            depth = depth + 1
+        elif c == ")":
+            depth = depth - 1
+        elif depth == 0 and licString.startswith(" AND ", i):
+            terms.append(licString[start:i])
+            i = i + len(" AND ")
+            start = i
+            continue
+        i = i + 1
+    terms.append(licString[start:])
+    return [t for t in terms if t != ""]
+
+_compiledRules = None
+
+# Compile the term-level rules into a single lookup table of
+# term => [(action, trigger, replacement), ...], so each term in a license
+# string costs one dict lookup. Called automatically on first use; call it
+# again (which also clears the memoized results) after changing the rules.
+def compileConversionRules():
+    global _compiledRules
+    rules = {}
+    for term, replacement in REPLACE_TERMS.items():
+        rules.setdefault(term, []).append(("replace", None, replacement))
+    for trigger, term, replacement in IMPLIES_TERMS:
+        rules.setdefault(term, []).append(("implies", trigger, replacement))
+    for term in DROP_TERMS:
+        rules.setdefault(term, []).append(("drop", None, None))
+    _compiledRules = rules
+    getConvertedLicenseString.cache_clear()
+    return rules
+
 # takes: (1) license string
 # returns: converted string if contains conversion, or same string otherwise
+@functools.lru_cache(maxsize=None)
 def getConvertedLicenseString(licString):
-    if licString not in CONVERSIONS:
+    if licString in CONVERSIONS:
+        return CONVERSIONS[licString]
+
+    rules = _compiledRules
+    if rules is None:
+        rules = compileConversionRules()
+
+    terms = splitLicenseTerms(licString)
+    if not any(term in rules for term in terms):
         return licString
-    return CONVERSIONS[licString]
+
+    present = set(terms)
+    converted = []
+    dropped = []
+    for term in terms:
+        newTerm = term
+        for action, trigger, replacement in rules.get(term, []):
+            if action == "replace":
+                newTerm = replacement
+                break
+            if action == "implies" and trigger in present:
+                newTerm = replacement
+                break
+            if action == "drop":
+                newTerm = None
+                break
+        if newTerm is None:
+            dropped.append(term)
+        elif newTerm not in converted:
+            converted.append(newTerm)
+
+    # don't drop everything; if nothing else is left, keep the dropped terms
+    if len(converted) == 0:
+        converted = dropped
+
+    return " AND ".join(sorted(converted))
@@ -19,8 +19,13 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import copy
 from collections import namedtuple
 
+from categories import getCategoryForLicenseString
+from conversions import getConvertedLicenseString
+from licenseregistry import registry
+
 # helper function for dependency references
 def depString(groupId, artifactId, version):
   if groupId:
@@ -28,6 +33,16 @@ def depString(groupId, artifactId, version):
   else:
     return f"{artifactId} : {version}"
 
+# takes: dependency reference typed by a user, e.g. "g:a:v" or "g : a : v"
+# returns: depString in the catalog's form
+def normalizeDepString(s):
+  parts = [p.strip() for p in s.split(":")]
+  if len(parts) == 3:
+    return depString(parts[0], parts[1], parts[2])
+  if len(parts) == 2:
+    return depString(None, parts[0], parts[1])
+  return s.strip()
+
 def parseCoords(depData):
     gId = depData.get("groupId", None)
     aId = depData.get("artifactId", None)
@@ -41,6 +56,19 @@ def parseCoords(depData):
       ver = coordinates.get("version", None)
     return (gId, aId, ver)
 
+# FIXME temp fix; this is NOT the right way to do this
+# FIXME trying to work around the fact that Nexus sometimes returns a
+# FIXME threat level of "null" for unsupported components.
+# FIXME temporarily swapping to 7 so that this can be reconsidered.
+# takes: threat from a component record, or -1 if it had none
+# returns: threat as stored in a Dependency
+def normalizeThreat(threat):
+  if threat == None:
+    return 7
+  elif threat == -1:
+    return None
+  return threat
+
 
 LicenseInfo = namedtuple("LicenseInfo", ["licenses", "threat", "status"])
 # "licenses": list of applicable license strings
@@ -75,6 +103,10 @@ class Dependency:
     self._overriddenLicenseThreat = -1
     self._effectiveLicenseThreat = -1
     self._appNames = []
+    # cached best license info and bitmask of best license IDs; reset
+    # whenever values change
+    self._bestLicenseInfo = None
+    self._licenseMask = None
 
   def __repr__(self):
     return f"Dependency {self.depString()}"
@@ -91,21 +123,10 @@ class Dependency:
     self._licenses["effective"] = depData.get("effectiveLicenses", [])
     self._licenses["observed"] = depData.get("observedLicenses", [])
     self._licenses["declared"] = depData.get("declaredLicenses", [])
-    self._overriddenLicenseThreat = depData.get("overriddenLicenseThreat", -1)
-    self._effectiveLicenseThreat = depData.get("effectiveLicenseThreat", -1)
-
-    # FIXME temp fix; this is NOT the right way to do this
-    # FIXME trying to work around the fact that Nexus sometimes returns a
-    # FIXME threat level of "null" for unsupported components.
-    # FIXME temporarily swapping to 7 so that this can be reconsidered.
-    if self._overriddenLicenseThreat == None:
-      self._overriddenLicenseThreat = 7
-    elif self._overriddenLicenseThreat == -1:
-      self._overriddenLicenseThreat = None
-    if self._effectiveLicenseThreat == None:
-      self._effectiveLicenseThreat = 7
-    elif self._effectiveLicenseThreat == -1:
-      self._effectiveLicenseThreat = None
+    self._overriddenLicenseThreat = normalizeThreat(depData.get("overriddenLicenseThreat", -1))
+    self._effectiveLicenseThreat = normalizeThreat(depData.get("effectiveLicenseThreat", -1))
+    self._bestLicenseInfo = None
+    self._licenseMask = None
 
     # FIXME temp fix; this is NOT the right way to do this
     if self._artifactId == None:
@@ -114,7 +135,48 @@ class Dependency:
       self._artifactId = coordinates.get("name", None)
       self._version = coordinates.get("version", None)
 
+  # returns: True if setValuesWithDict(depData) would leave this
+  #          Dependency's status, licenses and threats as they are; the
+  #          coordinates are assumed to match already
+  def matchesDict(self, depData):
+    licenses = self._licenses
+    return (self._status == depData.get("status", None)
+      and licenses["final"] == depData.get("overriddenLicenses", [])
+      and licenses["effective"] == depData.get("effectiveLicenses", [])
+      and licenses["observed"] == depData.get("observedLicenses", [])
+      and licenses["declared"] == depData.get("declaredLicenses", [])
+      and self._overriddenLicenseThreat == normalizeThreat(depData.get("overriddenLicenseThreat", -1))
+      and self._effectiveLicenseThreat == normalizeThreat(depData.get("effectiveLicenseThreat", -1)))
+
+  # returns: dict in the same form as a component record from a Nexus IQ
+  #          licenses.json aaData list, such that passing it to
+  #          setValuesWithDict recreates this Dependency
+  def toDict(self):
+    overriddenThreat = self._overriddenLicenseThreat
+    if overriddenThreat is None:
+      overriddenThreat = -1
+    effectiveThreat = self._effectiveLicenseThreat
+    if effectiveThreat is None:
+      effectiveThreat = -1
+    return {
+      "groupId": self._groupId,
+      "artifactId": self._artifactId,
+      "version": self._version,
+      "status": self._status,
+      "overriddenLicenses": self._licenses["final"],
+      "effectiveLicenses": self._licenses["effective"],
+      "observedLicenses": self._licenses["observed"],
+      "declaredLicenses": self._licenses["declared"],
+      "overriddenLicenseThreat": overriddenThreat,
+      "effectiveLicenseThreat": effectiveThreat,
+    }
+
   def getBestLicenseInfo(self):
+    if self._bestLicenseInfo is None:
+      self._bestLicenseInfo = self._computeBestLicenseInfo()
+    return self._bestLicenseInfo
+
+  def _computeBestLicenseInfo(self):
     # pull out appropriate info based on status
     status = self._status
     if status in ["Overridden", "Selected"]:
@@ -131,6 +193,19 @@ class Dependency:
       licenses = []
     return LicenseInfo(licenses, threat, status)
 
+  # returns: best license string for this dependency, after conversions;
+  #          this is the string used for categorization and reporting
+  def getLicenseString(self):
+    licString = " AND ".join(self.getBestLicenseInfo().licenses)
+    return getConvertedLicenseString(licString)
+
+  # returns: bitmask (see licenseregistry) of the license terms in the
+  #          converted best license string for this dependency
+  def getLicenseMask(self):
+    if self._licenseMask is None:
+      self._licenseMask = registry.getMaskForLicenseString(self.getLicenseString())
+    return self._licenseMask
+
   def getAppNames(self):
     return self._appNames
 
@@ -141,6 +216,79 @@ class DependencyCatalog:
     super(DependencyCatalog, self).__init__()
 
     self._dependencies = {}
+    # depStrings whose raw record differed between apps
+    self._changedDeps = set()
+    # depString => {app name => clearing status reported in that app}
+    self._appStatuses = {}
+
+    # secondary indexes, maintained as dependencies are added and removed:
+    #   threat => set of depStrings
+    self._byThreat = {}
+    #   category => set of depStrings
+    self._byCategory = {}
+    #   converted best license string => set of depStrings
+    self._byLicense = {}
+    #   app name => set of depStrings
+    self._byApp = {}
+    #   depString => (threat, category, license string) it is indexed under
+    self._indexKeys = {}
+
+    # functions called as listener(depString, Dependency, app name,
+    # index keys) each time a dependency is added for an app
+    self._listeners = []
+
+  # takes: (1) function to call after each dependency is added
+  def addListener(self, listener):
+    self._listeners.append(listener)
+
+  def _notifyListeners(self, ds, dep, appName):
+    for listener in self._listeners:
+      listener(ds, dep, appName, self._indexKeys[ds])
+
+  ##### secondary index maintenance #####
+
+  def _indexDependency(self, ds, dep):
+    threat = dep.getBestLicenseInfo().threat
+    licString = dep.getLicenseString()
+    category = getCategoryForLicenseString(licString)
+    self._byThreat.setdefault(threat, set()).add(ds)
+    self._byCategory.setdefault(category, set()).add(ds)
+    self._byLicense.setdefault(licString, set()).add(ds)
+    self._indexKeys[ds] = (threat, category, licString)
+    for appName in dep._appNames:
+      self._byApp.setdefault(appName, set()).add(ds)
+
+  def _unindexDependency(self, ds, appNames):
+    keys = self._indexKeys.pop(ds, None)
+    if keys:
+      threat, category, licString = keys
+      for index, key in [(self._byThreat, threat),
+        (self._byCategory, category), (self._byLicense, licString)]:
+        dss = index.get(key, None)
+        if dss is not None:
+          dss.discard(ds)
+          if not dss:
+            del index[key]
+    for appName in appNames:
+      self._unindexApp(ds, appName)
+
+  def _unindexApp(self, ds, appName):
+    dss = self._byApp.get(appName, None)
+    if dss is not None:
+      dss.discard(ds)
+      if not dss:
+        del self._byApp[appName]
+
+  # rebuild all secondary indexes from scratch, e.g. after loading the
+  # catalog contents directly from a snapshot
+  def rebuildIndexes(self):
+    self._byThreat = {}
+    self._byCategory = {}
+    self._byLicense = {}
+    self._byApp = {}
+    self._indexKeys = {}
+    for ds, dep in self._dependencies.items():
+      self._indexDependency(ds, dep)
 
   def getDependency(self, groupId, artifactId, version):
     ds = depString(groupId, artifactId, version)
@@ -159,12 +307,26 @@ class DependencyCatalog:
     groupId, artifactId, version = parseCoords(depData)
     ds = depString(groupId, artifactId, version)
     
-    dep = self.getDependency(groupId, artifactId, version)
+    dep = self._dependencies.get(ds, None)
     if dep:
+      if update and dep.matchesDict(depData):
+        # identical record already extracted (e.g., seen in another app);
+        # just record the app membership
+        if appName:
+          dep._appNames.append(appName)
+          self._byApp.setdefault(appName, set()).add(ds)
+          self._appStatuses.setdefault(ds, {})[appName] = dep._status
+        if self._listeners:
+          self._notifyListeners(ds, dep, appName)
+        return ds
       if update:
+        # record that this dependency's data changed between occurrences
+        self._changedDeps.add(ds)
         # remove it from the dict before we update; we will need to
         # reinsert it if the key changes
+        appStatuses = self._appStatuses.get(ds, {})
         self.delDependency(groupId, artifactId, version)
+        self._appStatuses[ds] = appStatuses
       else:
         raise DependencyError("Dependency already in catalog")
     else:
@@ -175,18 +337,171 @@ class DependencyCatalog:
     dep.setValuesWithDict(depData)
     if appName:
       dep._appNames.append(appName)
+      self._appStatuses.setdefault(ds, {})[appName] = dep._status
     self._dependencies[ds] = dep
+    self._indexDependency(ds, dep)
+    if self._listeners:
+      self._notifyListeners(ds, dep, appName)
 
     # return dependency string to caller
     return ds
 
   def delDependency(self, groupId, artifactId, version):
     ds = depString(groupId, artifactId, version)
-    del self._dependencies[ds]
+    dep = self._dependencies.pop(ds)
+    self._appStatuses.pop(ds, None)
+    self._unindexDependency(ds, dep._appNames)
+
+  # remove the given app from the dependencies it uses, deleting any
+  # dependency that is then no longer used by any app
+  # takes: (1) app name, (2) list of depStrings used by that app
+  def removeAppFromDependencies(self, appName, depStrings):
+    for ds in set(depStrings):
+      dep = self._dependencies.get(ds, None)
+      if not dep:
+        continue
+      dep._appNames = [a for a in dep._appNames if a != appName]
+      self._unindexApp(ds, appName)
+      self._appStatuses.get(ds, {}).pop(appName, None)
+      if not dep._appNames:
+        del self._dependencies[ds]
+        self._appStatuses.pop(ds, None)
+        self._changedDeps.discard(ds)
+        self._unindexDependency(ds, [])
+
+  # returns: new DependencyCatalog with just the dependencies used by the
+  #          given apps, each listing only those apps; e.g. for reporting
+  #          on one organization out of a multi-organization run
+  def getCatalogForApps(self, appNames):
+    appNames = set(appNames)
+    catalog = DependencyCatalog()
+    for ds, dep in self._dependencies.items():
+      names = [a for a in dep._appNames if a in appNames]
+      if not names:
+        continue
+      subDep = copy.copy(dep)
+      subDep._appNames = names
+      catalog._dependencies[ds] = subDep
+      statuses = {a: st for a, st in self._appStatuses.get(ds, {}).items() if a in appNames}
+      if statuses:
+        catalog._appStatuses[ds] = statuses
+    catalog._changedDeps = set(ds for ds in self._changedDeps if ds in catalog._dependencies)
+    catalog.rebuildIndexes()
+    return catalog
 
   def getDependencyList(self):
     return self._dependencies.values()
 
+  # returns list of depStrings whose component data (e.g., license data or
+  # clearing status) differed between the apps in which they were seen
+  def getChangedDependencies(self):
+    return sorted(self._changedDeps)
+
+  # returns: dict of {app name => clearing status} for the apps using the
+  #          given dependency, as reported by each app's own report
+  def getAppStatuses(self, ds):
+    return dict(self._appStatuses.get(ds, {}))
+
+  # returns list of depStrings whose clearing status differs between the
+  # apps in which they were seen, meaning that some of those apps' reports
+  # haven't been re-evaluated since the dependency was cleared
+  def getDependenciesNeedingRefresh(self):
+    return sorted(ds for ds, statuses in self._appStatuses.items()
+      if len(set(statuses.values())) > 1)
+
+  # takes: (1) iterable of license identifiers
+  # returns: list of Dependencies whose best licenses include any of them
+  def getDependenciesWithAnyLicense(self, licenses):
+    mask = registry.getMask(licenses)
+    return [dep for dep in self.getDependencyList() if dep.getLicenseMask() & mask]
+
+  # takes: (1) iterable of license identifiers
+  # returns: list of Dependencies whose best licenses are all among them
+  def getDependenciesWithOnlyLicenses(self, licenses):
+    mask = registry.getMask(licenses)
+    return [dep for dep in self.getDependencyList() if dep.getLicenseMask() & ~mask == 0]
+
+  ##### indexed queries #####
+
+  def _getDependenciesForDepStrings(self, dss):
+    return [self._dependencies[ds] for ds in sorted(dss)]
+
+  # takes: (1) minimum threat level, (2) optional: maximum threat level
+  # returns: list of Dependencies with threat in that range, sorted by
+  #          depString; dependencies with no threat level are never included
+  def getDependenciesByThreat(self, minThreat, maxThreat=None):
+    return self.queryDependencies(minThreat=minThreat, maxThreat=maxThreat)
+
+  def getDependenciesByCategory(self, category):
+    return self._getDependenciesForDepStrings(self._byCategory.get(category, set()))
+
+  # takes: (1) converted best license string, as used in reports
+  def getDependenciesByLicense(self, licString):
+    return self._getDependenciesForDepStrings(self._byLicense.get(licString, set()))
+
+  def getDependenciesForApp(self, appName):
+    return self._getDependenciesForDepStrings(self._byApp.get(appName, set()))
+
+  def getCategories(self):
+    return list(self._byCategory.keys())
+
+  # returns: dict of {converted best license string => set of depStrings};
+  #          callers must not modify it
+  def getLicenseIndex(self):
+    return self._byLicense
+
+  # Query by any combination of criteria; each given criterion narrows the
+  # result. Starts from the smallest matching index entry, so the cost is
+  # proportional to the result size rather than the catalog size.
+  # returns: list of Dependencies, sorted by depString
+  def queryDependencies(self, minThreat=None, maxThreat=None, category=None,
+    licString=None, appName=None):
+    candidates = []
+    if category is not None:
+      candidates.append(self._byCategory.get(category, set()))
+    if licString is not None:
+      candidates.append(self._byLicense.get(licString, set()))
+    if appName is not None:
+      candidates.append(self._byApp.get(appName, set()))
+    if minThreat is not None or maxThreat is not None:
+      threatDss = set()
+      for threat, dss in self._byThreat.items():
+        if threat is None:
+          continue
+        if minThreat is not None and threat < minThreat:
+          continue
+        if maxThreat is not None and threat > maxThreat:
+          continue
+        threatDss.update(dss)
+      candidates.append(threatDss)
+    if not candidates:
+      return self._getDependenciesForDepStrings(self._dependencies.keys())
+
+    candidates.sort(key=len)
+    dss = set(candidates[0])
+    for other in candidates[1:]:
+      dss.intersection_update(other)
+    return self._getDependenciesForDepStrings(dss)
+
+  # returns: dict describing the given dependency-version, for JSON output,
+  #          or None if it isn't in the catalog
+  def describeDependency(self, ds):
+    dep = self._dependencies.get(ds, None)
+    if not dep:
+      return None
+    threat, category, licString = self._indexKeys[ds]
+    return {
+      "depString": ds,
+      "groupId": dep._groupId,
+      "artifactId": dep._artifactId,
+      "version": dep._version,
+      "threat": threat,
+      "category": category,
+      "license": licString,
+      "status": dep._status,
+      "apps": list(dep._appNames),
+    }
+
   # returns best license info based on clearing status:
   #  - if overridden: returns overridden licenses / threat
   #  - if confirmed or open: returns effective licenses / threat
@@ -200,12 +515,11 @@ class DependencyCatalog:
   # they come from.
   # return list of tuple in form [(Dependency, LicenseInfo), ...]
   def getRedDependencies(self):
+    for ds in sorted(self._byThreat.get(None, set())):
+      dep = self._dependencies[ds]
+      print(f"Error for {dep}: {dep.getBestLicenseInfo()}")
     redDeps = []
-    for dep in self.getDependencyList():
-      licenseInfo = dep.getBestLicenseInfo()
-      if licenseInfo is None or licenseInfo.threat is None:
-        print(f"Error for {dep}: {licenseInfo}")
-      if licenseInfo.threat >= 8:
-        t = (dep, licenseInfo)
-        redDeps.append(t)
+    for dep in self.getDependenciesByThreat(8):
+      t = (dep, dep.getBestLicenseInfo())
+      redDeps.append(t)
     return redDeps
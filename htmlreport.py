@@ -0,0 +1,372 @@
+# htmlreport.py
+#
+# This module contains functions for writing the license report as a static
+# HTML site, with paginated category and app pages and a sharded search
+# index, for hosting as plain files.
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import hashlib
+import itertools
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from html import escape
+from pathlib import Path
+
+from reports import collectAllLicenses, getIncompleteApps
+
+# Site layout:
+#   index.html                         => categories, apps and search box
+#   category/[slug]/page-[n].html      => license / dependency / apps rows
+#   app/[slug]/page-[n].html           => one app's dependencies
+#   search/manifest.json               => lists of shard keys, and of
+#                                         keys that were split
+#   search/[key].json                  => search entries for tokens
+#                                         starting with that key
+#   search.js                          => client-side search
+# where [slug] is the name with unsafe characters replaced, plus a short
+# hash of the name.
+# Each search entry is [display text, URL, space-separated tokens]. Entries
+# are sharded by the first SEARCH_KEY_LENGTH characters of each token, so
+# the browser only fetches the shard for what has been typed. A shard with
+# more than MAX_SEARCH_SHARD_ENTRIES entries (e.g. "or", for every "org.*"
+# group) is split into shards keyed by one more character, up to
+# MAX_SEARCH_KEY_LENGTH; the split shard itself keeps just the first
+# SEARCH_RESULTS_SHOWN entries, enough to show results until another
+# character is typed.
+#
+# Pages are written as their rows are produced, one row at a time, so the
+# rows of a category or app are never all held in memory at once.
+
+DEFAULT_PAGE_SIZE = 500
+SEARCH_KEY_LENGTH = 2
+MAX_SEARCH_KEY_LENGTH = 5
+MAX_SEARCH_SHARD_ENTRIES = 5000
+SEARCH_RESULTS_SHOWN = 200
+
+_unsafeChars = re.compile(r"[^A-Za-z0-9._-]")
+_tokenSeparators = re.compile(r"[^a-z0-9]+")
+
+# returns: directory-safe version of name, with a short hash of the
+#          original name appended so that names which only differ in
+#          unsafe characters or case (e.g. "a/b" and "a_b") get their own
+#          directories
+def _slug(name):
+  nameHash = hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+  return f"{_unsafeChars.sub('_', name)}-{nameHash}"
+
+def _pageFilename(kind, slug, pageNum):
+  return f"{kind}/{slug}/page-{pageNum}.html"
+
+def _numPages(numRows, pageSize):
+  return max(1, (numRows + pageSize - 1) // pageSize)
+
+def _searchTokens(text):
+  return [t for t in _tokenSeparators.split(text.lower()) if t]
+
+SEARCH_JS = """// client-side search for the nexusDeps HTML report
+(function() {
+  var KEY_LENGTH = %d;
+  var RESULTS_SHOWN = %d;
+  var shards = {};
+  var manifest = null;
+  var split = {};
+  var input = document.getElementById("search");
+  var results = document.getElementById("results");
+
+  function getShard(key) {
+    if (!manifest || manifest.indexOf(key) < 0) {
+      return Promise.resolve([]);
+    }
+    if (!shards[key]) {
+      shards[key] = fetch("search/" + key + ".json").then(function(r) { return r.json(); });
+    }
+    return shards[key];
+  }
+
+  function show(entries, words) {
+    results.innerHTML = "";
+    var shown = 0;
+    entries.forEach(function(e) {
+      var tokens = e[2].split(" ");
+      var match = words.every(function(w) {
+        return tokens.some(function(t) { return t.indexOf(w) === 0; });
+      });
+      if (match && shown < RESULTS_SHOWN) {
+        var li = document.createElement("li");
+        var a = document.createElement("a");
+        a.href = e[1];
+        a.textContent = e[0];
+        li.appendChild(a);
+        results.appendChild(li);
+        shown++;
+      }
+    });
+  }
+
+  // the longest key that the word starts with, following split shards
+  function shardKey(word) {
+    var key = word.substring(0, KEY_LENGTH);
+    while (split[key] && word.length > key.length) {
+      key = word.substring(0, key.length + 1);
+    }
+    return key;
+  }
+
+  input.addEventListener("input", function() {
+    var words = input.value.toLowerCase().split(/[^a-z0-9]+/).filter(Boolean);
+    // look up the longest word, whose shard is the smallest
+    var longest = words.reduce(function(a, w) { return w.length > a.length ? w : a; }, "");
+    if (longest.length < KEY_LENGTH) {
+      results.innerHTML = "";
+      return;
+    }
+    getShard(shardKey(longest)).then(function(entries) {
+      show(entries, words);
+    });
+  });
+
+  fetch("search/manifest.json").then(function(r) { return r.json(); }).then(function(m) {
+    manifest = m.shards;
+    (m.split || []).forEach(function(key) { split[key] = true; });
+  });
+})();
+""" % (SEARCH_KEY_LENGTH, SEARCH_RESULTS_SHOWN)
+
+def _writeHeader(f, title, root):
+  f.write("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">")
+  f.write(f"<title>{escape(title)}</title>")
+  f.write("<style>body{font-family:sans-serif}table{border-collapse:collapse}"
+    "td,th{border:1px solid #ccc;padding:2px 6px;text-align:left;vertical-align:top}"
+    ".warning{color:#b00;font-weight:bold}</style>")
+  f.write(f"</head><body><p><a href=\"{root}index.html\">All categories and apps</a></p>")
+  f.write(f"<h1>{escape(title)}</h1>\n")
+
+def _writePageNav(f, kind, slug, pageNum, numPages):
+  if numPages <= 1:
+    return
+  f.write("<p>")
+  if pageNum > 1:
+    f.write(f"<a href=\"page-{pageNum - 1}.html\">&laquo; previous</a> ")
+  f.write(f"page {pageNum} of {numPages}")
+  if pageNum < numPages:
+    f.write(f" <a href=\"page-{pageNum + 1}.html\">next &raquo;</a>")
+  f.write("</p>\n")
+
+# Write all pages for one category or app, one row at a time, as the rows
+# are produced.
+# arguments:
+#   1) output directory
+#   2) "category" or "app"
+#   3) title for the pages
+#   4) column headings
+#   5) number of rows
+#   6) iterable of rows, each a list of (text, relative URL or None) cells
+#   7) rows per page
+# returns: number of pages written
+def _writePages(outputDir, kind, title, headings, numRows, rows, pageSize):
+  slug = _slug(title)
+  numPages = _numPages(numRows, pageSize)
+  rows = iter(rows)
+  Path(outputDir, kind, slug).mkdir(parents=True, exist_ok=True)
+  for pageNum in range(1, numPages + 1):
+    filename = os.path.join(outputDir, _pageFilename(kind, slug, pageNum))
+    with open(filename, 'w', encoding='utf-8') as f:
+      _writeHeader(f, title, "../../")
+      _writePageNav(f, kind, slug, pageNum, numPages)
+      f.write("<table><tr>")
+      for heading in headings:
+        f.write(f"<th>{escape(heading)}</th>")
+      f.write("</tr>\n")
+      for row in itertools.islice(rows, pageSize):
+        f.write("<tr>")
+        for cell in row:
+          f.write("<td>")
+          first = True
+          for text, url in cell:
+            if not first:
+              f.write(", ")
+            first = False
+            if url:
+              f.write(f"<a href=\"../../{escape(url)}\">{escape(text)}</a>")
+            else:
+              f.write(escape(str(text)))
+          f.write("</td>")
+        f.write("</tr>\n")
+      f.write("</table>\n")
+      _writePageNav(f, kind, slug, pageNum, numPages)
+      f.write("</body></html>\n")
+  return numPages
+
+def _appCell(appNames):
+  return [(a, _pageFilename("app", _slug(a), 1)) for a in appNames]
+
+# Produce one category's rows, sorted by license string and dependency,
+# adding a search entry for each dependency pointing at its page.
+# arguments:
+#   1) category
+#   2) dict of {license string => list of Dependencies}, from
+#      collectAllLicenses
+#   3) rows per page
+#   4) list to add search entries to
+def _categoryRows(category, licDict, pageSize, searchEntries):
+  categorySlug = _slug(category)
+  i = 0
+  for licString, deps in sorted(licDict.items()):
+    for dep in sorted(deps, key=lambda d: d.depString()):
+      ds = dep.depString()
+      url = _pageFilename("category", categorySlug, i // pageSize + 1)
+      searchEntries.append((ds, url, _searchTokens(ds)))
+      i = i + 1
+      yield [[(licString, None)], [(ds, None)], _appCell(dep.getAppNames())]
+
+# Produce one app's rows, sorted by dependency.
+def _appRows(depCatalog, appBranch):
+  for ds in sorted(depCatalog._byApp.get(appBranch, [])):
+    threat, category, licString = depCatalog._indexKeys[ds]
+    dep = depCatalog._dependencies[ds]
+    yield [[("" if threat is None else threat, None)],
+      [(licString, None)],
+      [(category, _pageFilename("category", _slug(category), 1))],
+      [(dep._status or "", None)], [(ds, None)]]
+
+# Write the HTML report site.
+# arguments:
+#   1) NexusData
+#   2) output directory
+#   3) optional: results from collectAllLicenses, if already collected
+#   4) optional: number of threads writing pages
+#   5) optional: rows per page
+# returns: True if successfully created, False otherwise
+def createHTMLReport(nd, outputDir, collected=None, workers=4,
+  pageSize=DEFAULT_PAGE_SIZE):
+  if collected is None:
+    collected = collectAllLicenses(nd)
+  licCatalog, licCount = collected
+  depCatalog = nd._depCatalog
+
+  # each category's rows are produced by the thread writing its pages,
+  # which also adds the category's search entries to its own list
+  searchEntryLists = []
+  categoryCounts = []
+  appBranches = nd._appCatalog.getAllAppBranches() if nd._appCatalog else []
+  try:
+    Path(outputDir).mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+      futures = []
+      for category, licDict in sorted(licCatalog.items()):
+        numRows = sum(len(deps) for deps in licDict.values())
+        categoryCounts.append((category, numRows))
+        searchEntries = []
+        searchEntryLists.append(searchEntries)
+        futures.append(executor.submit(_writePages, outputDir, "category",
+          category, ["License", "Dependency", "Apps"], numRows,
+          _categoryRows(category, licDict, pageSize, searchEntries), pageSize))
+
+      appEntries = []
+      searchEntryLists.append(appEntries)
+      for appBranch in appBranches:
+        appEntries.append((f"App: {appBranch}",
+          _pageFilename("app", _slug(appBranch), 1), _searchTokens(appBranch)))
+        futures.append(executor.submit(_writePages, outputDir, "app",
+          appBranch, ["Threat", "License", "Category", "Status", "Dependency"],
+          len(depCatalog._byApp.get(appBranch, [])),
+          _appRows(depCatalog, appBranch), pageSize))
+      for future in futures:
+        future.result()
+
+    _writeSearchIndex(outputDir, itertools.chain.from_iterable(searchEntryLists))
+    _writeIndexPage(nd, outputDir, categoryCounts, appBranches)
+    return True
+
+  except Exception as e:
+    print(f"Couldn't output HTML report to {outputDir}: {str(e)}")
+    return False
+
+# takes: (1) iterable of search entries (display text, URL, list of tokens)
+# returns: tuple (dict of {shard key => list of [display text, URL,
+#          space-separated tokens] entries}, sorted list of split keys)
+def _shardSearchEntries(searchEntries):
+  # shard key => list of (entry, tokens)
+  shards = {}
+  for text, url, tokens in searchEntries:
+    entry = [text, url, " ".join(tokens)]
+    for key in set(t[:SEARCH_KEY_LENGTH] for t in tokens):
+      shards.setdefault(key, []).append((entry, tokens))
+
+  split = []
+  todo = list(shards.keys())
+  while todo:
+    key = todo.pop()
+    items = shards[key]
+    if len(items) <= MAX_SEARCH_SHARD_ENTRIES or len(key) >= MAX_SEARCH_KEY_LENGTH:
+      continue
+    children = {}
+    for entry, tokens in items:
+      for childKey in set(t[:len(key) + 1] for t in tokens
+        if len(t) > len(key) and t.startswith(key)):
+        children.setdefault(childKey, []).append((entry, tokens))
+    if not children:
+      # every token is just the key, so there is nothing to split by
+      continue
+    # keep the entries with a token that is just the key, then whichever
+    # come first, for showing until another character is typed
+    exact = [item for item in items if key in item[1]]
+    rest = [item for item in items if key not in item[1]]
+    shards[key] = (exact + rest)[:SEARCH_RESULTS_SHOWN]
+    split.append(key)
+    for childKey, childItems in children.items():
+      shards[childKey] = childItems
+      todo.append(childKey)
+
+  return ({key: [entry for entry, tokens in items] for key, items in shards.items()},
+    sorted(split))
+
+def _writeSearchIndex(outputDir, searchEntries):
+  shards, split = _shardSearchEntries(searchEntries)
+
+  searchDir = os.path.join(outputDir, "search")
+  Path(searchDir).mkdir(parents=True, exist_ok=True)
+  for key, entries in shards.items():
+    with open(os.path.join(searchDir, f"{key}.json"), 'w', encoding='utf-8') as f:
+      json.dump(entries, f, separators=(",", ":"))
+  with open(os.path.join(searchDir, "manifest.json"), 'w', encoding='utf-8') as f:
+    json.dump({"shards": sorted(shards.keys()), "split": split}, f)
+  with open(os.path.join(outputDir, "search.js"), 'w', encoding='utf-8') as f:
+    f.write(SEARCH_JS)
+
+def _writeIndexPage(nd, outputDir, categoryCounts, appBranches):
+  with open(os.path.join(outputDir, "index.html"), 'w', encoding='utf-8') as f:
+    _writeHeader(f, "License report", "")
+    stale, missing = getIncompleteApps(nd)
+    if stale or missing:
+      f.write(f"<p class=\"warning\">PARTIAL REPORT: {len(stale)} apps stale, {len(missing)} apps missing.</p>\n")
+    f.write("<p><input id=\"search\" size=\"60\" placeholder=\"Search dependencies and apps\"></p>")
+    f.write("<ul id=\"results\"></ul>\n")
+    f.write("<h2>Categories</h2>\n<table><tr><th>Category</th><th># of dependencies</th></tr>\n")
+    for category, count in categoryCounts:
+      url = _pageFilename("category", _slug(category), 1)
+      f.write(f"<tr><td><a href=\"{escape(url)}\">{escape(category)}</a></td><td>{count}</td></tr>\n")
+    f.write("</table>\n<h2>Apps</h2>\n<table><tr><th>App</th><th>Report ID</th><th>Status</th></tr>\n")
+    for appBranch in appBranches:
+      app = nd._appCatalog.getApp(appBranch)
+      url = _pageFilename("app", _slug(appBranch), 1)
+      f.write(f"<tr><td><a href=\"{escape(url)}\">{escape(appBranch)}</a></td>"
+        f"<td>{escape(app.getReportId() or '')}</td><td>{escape(app.getFetchStatus() or '')}</td></tr>\n")
+    f.write("</table>\n<script src=\"search.js\"></script>\n</body></html>\n")
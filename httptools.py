@@ -0,0 +1,583 @@
+# httptools.py
+#
+# This module contains the HTTP layer used by jenkinstools and nexustools,
+# including an optional persistent cache that revalidates stored responses
+# with conditional requests.
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+import zipfile
+from http.cookiejar import DefaultCookiePolicy
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+########## HTTP CACHE ##########
+
+# Layout inside the cache directory:
+#   index.json     => {key: {"url", "etag", "lastModified", "contentType",
+#                            "size", "lastAccess"}}
+#   [key].body     => response body
+# where key is the SHA-256 of the URL. Only responses that carry an ETag or
+# Last-Modified validator are stored.
+
+CACHE_INDEX_FILENAME = "index.json"
+
+class HTTPCache:
+
+  def __init__(self, cacheDir, maxBytes):
+    super(HTTPCache, self).__init__()
+
+    self._cacheDir = cacheDir
+    self._maxBytes = maxBytes
+    self._index = {}
+    self._lock = threading.Lock()
+    self._dirty = False
+    self._stats = {
+      "requests": 0,
+      "notModified": 0,
+      "stored": 0,
+      "uncacheable": 0,
+      "evicted": 0,
+    }
+    Path(cacheDir).mkdir(parents=True, exist_ok=True)
+    self._loadIndex()
+
+  def _indexFilename(self):
+    return os.path.join(self._cacheDir, CACHE_INDEX_FILENAME)
+
+  def _bodyFilename(self, key):
+    return os.path.join(self._cacheDir, f"{key}.body")
+
+  def _loadIndex(self):
+    try:
+      with open(self._indexFilename(), 'r') as f:
+        self._index = json.load(f)
+    except FileNotFoundError:
+      self._index = {}
+    except json.decoder.JSONDecodeError as e:
+      print(f"Error parsing HTTP cache index {self._indexFilename()}: {str(e)}; starting with an empty cache")
+      self._index = {}
+
+  def save(self):
+    with self._lock:
+      if not self._dirty:
+        return
+      tmpFilename = f"{self._indexFilename()}.tmp"
+      with open(tmpFilename, 'w') as f:
+        json.dump(self._index, f)
+      os.replace(tmpFilename, self._indexFilename())
+      self._dirty = False
+
+  def _evict(self):
+    # caller must hold self._lock
+    total = sum(entry["size"] for entry in self._index.values())
+    if total <= self._maxBytes:
+      return
+    for key, entry in sorted(self._index.items(), key=lambda kv: kv[1]["lastAccess"]):
+      if total <= self._maxBytes:
+        break
+      try:
+        os.remove(self._bodyFilename(key))
+      except FileNotFoundError:
+        pass
+      del self._index[key]
+      total = total - entry["size"]
+      self._stats["evicted"] = self._stats["evicted"] + 1
+
+  def _responseFromDisk(self, url, key, entry):
+    try:
+      with open(self._bodyFilename(key), 'rb') as f:
+        body = f.read()
+    except FileNotFoundError:
+      return None
+    r = requests.models.Response()
+    r.status_code = 200
+    r.url = url
+    r._content = body
+    r.headers = CaseInsensitiveDict()
+    if entry.get("contentType", None):
+      r.headers["Content-Type"] = entry["contentType"]
+    r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+    return r
+
+  def _store(self, url, key, r):
+    etag = r.headers.get("ETag", None)
+    lastModified = r.headers.get("Last-Modified", None)
+    if not etag and not lastModified:
+      with self._lock:
+        self._stats["uncacheable"] = self._stats["uncacheable"] + 1
+      return
+
+    tmpFilename = f"{self._bodyFilename(key)}.{threading.get_ident()}.tmp"
+    with open(tmpFilename, 'wb') as f:
+      f.write(r.content)
+    os.replace(tmpFilename, self._bodyFilename(key))
+
+    with self._lock:
+      self._index[key] = {
+        "url": url,
+        "etag": etag,
+        "lastModified": lastModified,
+        "contentType": r.headers.get("Content-Type", None),
+        "size": len(r.content),
+        "lastAccess": time.time(),
+      }
+      self._stats["stored"] = self._stats["stored"] + 1
+      self._evict()
+      self._dirty = True
+
+  # Perform a GET, revalidating any stored copy with If-None-Match /
+  # If-Modified-Since and serving it from disk on a 304.
+  # returns: requests.Response
+  def get(self, url, **kwargs):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    with self._lock:
+      self._stats["requests"] = self._stats["requests"] + 1
+      entry = self._index.get(key, None)
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    if entry:
+      if entry.get("etag", None):
+        headers["If-None-Match"] = entry["etag"]
+      if entry.get("lastModified", None):
+        headers["If-Modified-Since"] = entry["lastModified"]
+
+    r = _send("GET", url, headers=headers, **kwargs)
+    if r.status_code == 304 and entry:
+      cached = self._responseFromDisk(url, key, entry)
+      if cached is not None:
+        with self._lock:
+          entry["lastAccess"] = time.time()
+          self._stats["notModified"] = self._stats["notModified"] + 1
+          self._dirty = True
+        return cached
+      # body went missing; fetch it again unconditionally
+      headers.pop("If-None-Match", None)
+      headers.pop("If-Modified-Since", None)
+      r = _send("GET", url, headers=headers, **kwargs)
+
+    if r.status_code == 200:
+      self._store(url, key, r)
+    return r
+
+  def getStats(self):
+    with self._lock:
+      stats = dict(self._stats)
+      stats["entries"] = len(self._index)
+      stats["bytes"] = sum(entry["size"] for entry in self._index.values())
+    return stats
+
+########## TIMEOUTS AND RUN DEADLINE ##########
+
+# Raised by get() once the run deadline has passed, so that callers stop
+# starting new requests.
+class DeadlineExceeded(requests.exceptions.Timeout):
+  pass
+
+# default per-request (connect and read) timeout, in seconds
+DEFAULT_REQUEST_TIMEOUT = 60
+
+_requestTimeout = DEFAULT_REQUEST_TIMEOUT
+# time.monotonic() value at which the run deadline passes, or None
+_deadline = None
+
+# Set the per-request timeout, in seconds.
+def configureTimeouts(requestTimeout):
+  global _requestTimeout
+  _requestTimeout = requestTimeout
+
+# Set an overall deadline for the run. Requests made close to the deadline
+# get a timeout of only the time remaining, responses still arriving when
+# it passes are cut off with DeadlineExceeded, so nothing outstanding runs
+# past it, and requests made after it raise DeadlineExceeded.
+# arguments:
+#   1) seconds from now until the deadline; None for no deadline
+def configureDeadline(deadlineSeconds):
+  global _deadline
+  if deadlineSeconds is None:
+    _deadline = None
+  else:
+    _deadline = time.monotonic() + deadlineSeconds
+
+# returns: seconds until the run deadline, or None if there is no deadline
+def getRemainingTime():
+  if _deadline is None:
+    return None
+  return _deadline - time.monotonic()
+
+def deadlinePassed():
+  remaining = getRemainingTime()
+  return remaining is not None and remaining <= 0
+
+# Raise DeadlineExceeded if the run deadline has passed; long-running
+# transfers call this between chunks.
+def checkDeadline():
+  if deadlinePassed():
+    raise DeadlineExceeded("run deadline reached")
+
+def _getTimeout():
+  remaining = getRemainingTime()
+  if remaining is None:
+    return _requestTimeout
+  if remaining <= 0:
+    raise DeadlineExceeded("run deadline reached")
+  return min(_requestTimeout, remaining)
+
+# size of the chunks a response body is read in while there is a deadline
+DEADLINE_CHUNK_SIZE = 64 * 1024
+
+# Read the whole body of a streamed response, stopping at the run deadline.
+# The requests timeout only limits each connect and each read, so a server
+# trickling data could otherwise keep a response going past the deadline;
+# besides checking the deadline between chunks, a timer shuts the
+# connection down when the deadline passes, to interrupt a read that is
+# still waiting for data.
+# returns: the response, with its body read
+# raises: DeadlineExceeded if the deadline passes before the whole body
+#         is read
+def _readBeforeDeadline(r):
+  interrupted = threading.Event()
+  def interrupt():
+    interrupted.set()
+    try:
+      r.raw.shutdown()
+    except Exception:
+      r.close()
+
+  timer = threading.Timer(max(0.0, getRemainingTime()), interrupt)
+  timer.daemon = True
+  timer.start()
+  chunks = []
+  try:
+    for chunk in r.iter_content(DEADLINE_CHUNK_SIZE):
+      checkDeadline()
+      chunks.append(chunk)
+  except Exception as e:
+    r.close()
+    if interrupted.is_set():
+      raise DeadlineExceeded(f"run deadline reached while reading {r.url}") from e
+    raise
+  finally:
+    timer.cancel()
+  if interrupted.is_set():
+    # the shutdown can look like the end of the body
+    r.close()
+    raise DeadlineExceeded(f"run deadline reached while reading {r.url}")
+  r._content = b"".join(chunks)
+  r._content_consumed = True
+  return r
+
+########## RATE LIMITING ##########
+
+# Spaces out requests from any number of threads so that no more than the
+# given number start per second, with short bursts allowed.
+class RateLimiter:
+
+  def __init__(self, ratePerSecond, burst=1):
+    super(RateLimiter, self).__init__()
+
+    self._rate = ratePerSecond
+    self._burst = burst
+    self._tokens = burst
+    self._updated = time.monotonic()
+    self._lock = threading.Lock()
+
+  # Block until a request may be made.
+  def wait(self):
+    while True:
+      with self._lock:
+        now = time.monotonic()
+        self._tokens = min(self._burst,
+          self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+        if self._tokens >= 1:
+          self._tokens = self._tokens - 1
+          return
+        delay = (1 - self._tokens) / self._rate
+      time.sleep(delay)
+
+_rateLimiter = None
+
+# Limit all later requests made through this module to the given number
+# per second; None to remove the limit.
+def configureRateLimit(ratePerSecond, burst=1):
+  global _rateLimiter
+  if ratePerSecond:
+    _rateLimiter = RateLimiter(ratePerSecond, burst)
+  else:
+    _rateLimiter = None
+
+########## RECORD AND REPLAY ##########
+
+# Fixture archive layout (a zip file):
+#   index.json         => {"version": 1, "responses": [{"method", "url",
+#                          "status", "headers", "seconds", "body"}, ...]}
+#   bodies/[sha256]    => response body, stored once per distinct body
+# URLs are stored without any user:password part, and only the response
+# headers in RECORDED_HEADERS are kept; request headers (including the
+# Authorization header) are never recorded. "seconds" is the time taken
+# to receive the whole response.
+
+FIXTURE_FORMAT_VERSION = 1
+RECORDED_HEADERS = ["Content-Type", "ETag", "Last-Modified"]
+
+def _sanitizeURL(url):
+  parts = urlsplit(url)
+  netloc = parts.netloc.rsplit("@", maxsplit=1)[-1]
+  return urlunsplit((parts.scheme, netloc, parts.path, parts.query, ""))
+
+def _makeResponse(url, status, headers, body):
+  r = requests.models.Response()
+  r.status_code = status
+  r.url = url
+  r._content = body
+  # mark the body as already read, so iter_content() serves it from memory
+  r._content_consumed = True
+  r.headers = CaseInsensitiveDict(headers)
+  r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+  return r
+
+class HTTPRecorder:
+
+  def __init__(self, filename):
+    super(HTTPRecorder, self).__init__()
+
+    self._filename = filename
+    self._responses = []
+    # body hash => body
+    self._bodies = {}
+    self._lock = threading.Lock()
+
+  # Record a response, reading its whole body first if it was streamed.
+  # arguments:
+  #   1) HTTP method
+  #   2) request URL
+  #   3) requests.Response
+  #   4) time.perf_counter() value when the request was started
+  def record(self, method, url, r, start):
+    body = r.content
+    seconds = time.perf_counter() - start
+    bodyHash = hashlib.sha256(body).hexdigest()
+    headers = {h: r.headers[h] for h in RECORDED_HEADERS if h in r.headers}
+    with self._lock:
+      self._bodies[bodyHash] = body
+      self._responses.append({
+        "method": method,
+        "url": _sanitizeURL(url),
+        "status": r.status_code,
+        "headers": headers,
+        "seconds": seconds,
+        "body": bodyHash,
+      })
+
+  def save(self):
+    with self._lock:
+      Path(self._filename).parent.mkdir(parents=True, exist_ok=True)
+      tmpFilename = f"{self._filename}.tmp"
+      with zipfile.ZipFile(tmpFilename, 'w', compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("index.json", json.dumps({
+          "version": FIXTURE_FORMAT_VERSION,
+          "responses": self._responses,
+        }))
+        for bodyHash, body in self._bodies.items():
+          z.writestr(f"bodies/{bodyHash}", body)
+      os.replace(tmpFilename, self._filename)
+      print(f"recorded {len(self._responses)} responses to {self._filename}")
+
+class HTTPReplayer:
+
+  # arguments:
+  #   1) fixture archive filename
+  #   2) optional: multiplier for the recorded latencies; 1.0 replays the
+  #      original latency profile, 0.0 replays with no latency
+  def __init__(self, filename, latencyScale=1.0):
+    super(HTTPReplayer, self).__init__()
+
+    self._latencyScale = latencyScale
+    # (method, URL) => list of recorded responses, in recorded order
+    self._responses = {}
+    # (method, URL) => index of the next response to replay
+    self._next = {}
+    self._bodies = {}
+    self._lock = threading.Lock()
+    with zipfile.ZipFile(filename, 'r') as z:
+      index = json.loads(z.read("index.json"))
+      if index.get("version", None) != FIXTURE_FORMAT_VERSION:
+        raise ValueError(f"{filename} has unsupported fixture version {index.get('version', None)}")
+      for entry in index["responses"]:
+        self._responses.setdefault((entry["method"], entry["url"]), []).append(entry)
+        if entry["body"] not in self._bodies:
+          self._bodies[entry["body"]] = z.read(f"bodies/{entry['body']}")
+
+  # Replay the next recorded response for this request. Repeated requests
+  # for the same URL get the recorded responses in order, and then the last
+  # one again. Sleeps for the (scaled) recorded latency, or raises a
+  # timeout if that is longer than the request's timeout.
+  # returns: requests.Response
+  def send(self, method, url, **kwargs):
+    key = (method, _sanitizeURL(url))
+    with self._lock:
+      entries = self._responses.get(key, None)
+      if not entries:
+        print(f"Warning: no recorded response for {method} {key[1]}")
+        return _makeResponse(url, 404, {}, b"")
+      i = self._next.get(key, 0)
+      self._next[key] = i + 1
+      entry = entries[min(i, len(entries) - 1)]
+
+    delay = entry["seconds"] * self._latencyScale
+    timeout = kwargs.get("timeout", None)
+    if isinstance(timeout, tuple):
+      timeout = sum(t for t in timeout if t is not None)
+    if timeout is not None and delay > timeout:
+      time.sleep(timeout)
+      raise requests.exceptions.ReadTimeout(f"replayed response for {key[1]} took {delay:.1f}s (timeout {timeout:.1f}s)")
+    if delay > 0:
+      time.sleep(delay)
+    return _makeResponse(url, entry["status"], entry["headers"],
+      self._bodies[entry["body"]])
+
+########## SHARED CONNECTION POOL ##########
+
+# One session for every Jenkins and Nexus IQ request in the process, so
+# that all fetch threads and all targets reuse the same pooled
+# connections. Cookies are never kept, so each request is sent just as it
+# would be on its own.
+DEFAULT_POOL_SIZE = 10
+
+def _createSession(poolSize):
+  session = requests.Session()
+  session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+  adapter = requests.adapters.HTTPAdapter(pool_connections=poolSize,
+    pool_maxsize=poolSize)
+  session.mount("http://", adapter)
+  session.mount("https://", adapter)
+  return session
+
+_session = _createSession(DEFAULT_POOL_SIZE)
+
+# takes: (1) maximum number of pooled connections kept open to each host
+def configurePool(poolSize):
+  global _session
+  _session = _createSession(poolSize)
+
+_recorder = None
+_replayer = None
+
+# Record every response received from now on into a fixture archive, which
+# is written out when the process exits.
+def configureRecording(filename):
+  global _recorder
+  _recorder = HTTPRecorder(filename)
+  atexit.register(_recorder.save)
+  return _recorder
+
+# Serve every request from now on from a fixture archive instead of the
+# network.
+# arguments:
+#   1) fixture archive filename
+#   2) optional: multiplier for the recorded latencies (0.0 for none)
+def configureReplay(filename, latencyScale=1.0):
+  global _replayer
+  _replayer = HTTPReplayer(filename, latencyScale)
+  return _replayer
+
+# Send a request over the network. With a run deadline, the response body
+# is read before returning, and the request fails with DeadlineExceeded if
+# it isn't all there by the deadline; callers streaming a body themselves
+# check the deadline between chunks instead.
+# returns: requests.Response
+def _send(method, url, **kwargs):
+  if _deadline is None or kwargs.get("stream", False):
+    return _session.request(method, url, **kwargs)
+  kwargs["stream"] = True
+  return _readBeforeDeadline(_session.request(method, url, **kwargs))
+
+# Send a request from the replayer if one is configured, otherwise over the
+# network, through the HTTP cache if one is configured and useCache is
+# True; every request made by this module goes through here. Responses
+# are recorded as the caller sees them, i.e. after the cache has answered
+# a 304 with its stored copy, so a fixture archive replays the same way
+# whatever the state of the cache it was recorded with. Replayed requests
+# bypass the cache, so that replayed responses are never stored in it.
+# returns: requests.Response
+def _request(method, url, useCache=False, **kwargs):
+  if _replayer:
+    return _replayer.send(method, url, **kwargs)
+  start = time.perf_counter()
+  if useCache and _cache:
+    r = _cache.get(url, **kwargs)
+  else:
+    r = _send(method, url, **kwargs)
+  if _recorder:
+    _recorder.record(method, url, r, start)
+  return r
+
+########## MODULE-LEVEL HTTP FUNCTIONS ##########
+
+_cache = None
+
+# Enable the persistent HTTP cache for all later calls to get().
+# arguments:
+#   1) cache directory
+#   2) maximum total size of stored bodies, in bytes
+def configureCache(cacheDir, maxBytes):
+  global _cache
+  _cache = HTTPCache(cacheDir, maxBytes)
+  atexit.register(_cache.save)
+  return _cache
+
+def getCache():
+  return _cache
+
+# Perform a GET through the cache, if one is configured. Streaming requests
+# always bypass the cache. Unless a timeout is given, the configured
+# per-request timeout applies, cut short by the run deadline.
+# returns: requests.Response
+def get(url, **kwargs):
+  if _rateLimiter:
+    _rateLimiter.wait()
+  if "timeout" not in kwargs:
+    kwargs["timeout"] = _getTimeout()
+  return _request("GET", url, useCache=not kwargs.get("stream", False),
+    **kwargs)
+
+# Perform a POST, with the same timeouts and rate limit as get(). POSTs are
+# never cached.
+# returns: requests.Response
+def post(url, **kwargs):
+  if _rateLimiter:
+    _rateLimiter.wait()
+  if "timeout" not in kwargs:
+    kwargs["timeout"] = _getTimeout()
+  return _request("POST", url, **kwargs)
+
+def printCacheStats():
+  if not _cache:
+    return
+  _cache.save()
+  stats = _cache.getStats()
+  print(f"HTTP cache: {stats['requests']} requests, {stats['notModified']} served from cache after 304, {stats['stored']} stored, {stats['uncacheable']} uncacheable, {stats['evicted']} evicted; {stats['entries']} entries / {stats['bytes']} bytes on disk")
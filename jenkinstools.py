@@ -23,10 +23,11 @@ import os
 import time
 
 import bs4
-import requests
+
+import httptools
 
 def getMainUrlList(jenkinsbaseurl):
-  r = requests.get(jenkinsbaseurl)
+  r = httptools.get(jenkinsbaseurl)
 
   soup = bs4.BeautifulSoup(r.content, "lxml")
   elt = soup.find(id="projectstatus")
@@ -48,7 +49,7 @@ def getMainUrlList(jenkinsbaseurl):
 
 def getReportIDs(job_url):
   # try main report link
-  r = requests.get(job_url)
+  r = httptools.get(job_url)
 
   soup = bs4.BeautifulSoup(r.content, "lxml")
   t = soup.find(class_="iq-block")
@@ -63,7 +64,7 @@ def getReportIDs(job_url):
         return (report_id, job_app_id)
 
   # couldn't get it from main screen; try last successful build, if there is one
-  r = requests.get(f"{job_url}/lastSuccessfulBuild")
+  r = httptools.get(f"{job_url}/lastSuccessfulBuild")
   if r.status_code != 200:
     return "", ""
 
@@ -81,6 +82,20 @@ def getReportIDs(job_url):
 
   return "", ""
 
+# Get the number of the last successful build for a job, as a cheap check
+# for whether anything has changed since the last poll.
+# arguments:
+#   1) job URL
+# returns: build number as int, or None if no successful build or error.
+def getLastBuildNumber(job_url):
+  r = httptools.get(f"{job_url}/lastSuccessfulBuild/buildNumber")
+  if r.status_code != 200:
+    return None
+  try:
+    return int(r.text.strip())
+  except ValueError:
+    return None
+
 ######## OLD JENKINS FUNCTIONS BELOW HERE ########
 
 # OLD ######### JENKINS URL HELPER FUNCTIONS ##########
@@ -101,7 +116,7 @@ def getJenkinsMainURL(baseurl):
 # returns: dict with JSON from Jenkins server API call, or None if error.
 def getJenkinsAllApplications(baseurl):
   url = getJenkinsMainURL(baseurl)
-  r = requests.get(url)
+  r = httptools.get(url)
   if r.status_code != 200:
     print(f"Error: Got invalid status code {r.status_code} from {url}")
     return None
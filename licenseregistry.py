@@ -0,0 +1,85 @@
+# licenseregistry.py
+#
+# This module contains the LicenseRegistry class, which assigns an integer ID
+# to each license identifier so that sets of licenses can be stored and
+# compared as bitmasks.
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+
+from conversions import splitLicenseTerms
+
+class LicenseRegistry:
+
+  def __init__(self):
+    super(LicenseRegistry, self).__init__()
+
+    # license identifier => integer ID
+    self._ids = {}
+    # integer ID => license identifier
+    self._licenses = []
+    self._lock = threading.Lock()
+
+  # returns: integer ID for this license identifier, assigning a new one if
+  #          it hasn't been seen before
+  def getId(self, lic):
+    licId = self._ids.get(lic, None)
+    if licId is not None:
+      return licId
+    with self._lock:
+      licId = self._ids.get(lic, None)
+      if licId is None:
+        licId = len(self._licenses)
+        self._licenses.append(lic)
+        self._ids[lic] = licId
+    return licId
+
+  def getLicense(self, licId):
+    return self._licenses[licId]
+
+  # takes: (1) iterable of license identifiers
+  # returns: bitmask with the bit set for each license's ID
+  def getMask(self, licenses):
+    mask = 0
+    for lic in licenses:
+      mask |= 1 << self.getId(lic)
+    return mask
+
+  # takes: (1) license string with terms joined by " AND "
+  # returns: bitmask for the terms in that string
+  def getMaskForLicenseString(self, licString):
+    return self.getMask(splitLicenseTerms(licString))
+
+  # takes: (1) bitmask
+  # returns: sorted list of license identifiers in that mask
+  def getLicenses(self, mask):
+    licenses = []
+    licId = 0
+    while mask:
+      if mask & 1:
+        licenses.append(self._licenses[licId])
+      mask >>= 1
+      licId = licId + 1
+    return sorted(licenses)
+
+  def __len__(self):
+    return len(self._licenses)
+
+# shared registry used by categories and the dependency catalog, so that
+# masks built in different places can be compared with each other
+registry = LicenseRegistry()
@@ -19,16 +19,29 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import os
+import re
 import sys
 import time
 import json
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 from pathlib import Path
 
-from apps import NexusApp, NexusAppCatalog
-from deps import Dependency, DependencyCatalog
-from reports import createCSVReport, createRedReport, createExcelReportAllLicenses
-import jenkinstools
-import nexustools
+from apps import NexusAppCatalog, NexusTarget, getTargetBranchId, FETCH_STATUS_CURRENT, FETCH_STATUS_STALE, FETCH_STATUS_MISSING
+from deps import DependencyCatalog, normalizeDepString
+from reports import createRedReport, createExcelReportAllLicenses, collectAllLicenses, createOtherLicensesReviewReport, getIncompleteApps
+from storage import JSONStore
+import shards
+import snapshot
+from profiling import PhaseProfiler
+from scheduler import FetchHistory
+from pipeline import LicensePipeline
+
+# httptools, jenkinstools, nexustools and requests (and through them bs4)
+# are only imported by the methods and commands that talk to Jenkins or
+# Nexus IQ, so that offline commands start quickly.
 
 class NexusData:
 
@@ -37,6 +50,9 @@ class NexusData:
 
     self._appCatalog = None
     self._depCatalog = DependencyCatalog()
+    # target name => NexusTarget; just one target, named "", unless the
+    # config file lists several
+    self._targets = {}
 
     self._username = ""
     self._password = ""
@@ -47,6 +63,23 @@ class NexusData:
     self._pdfReportsDir = ""
     self._reportsDir = ""
     self._statusJSON = ""
+    self._jsonStorage = "raw"
+    self._store = None
+    self._shardsDir = ""
+    self._htmlReportsDir = ""
+    # HTTP settings from the config file, applied by configureHTTP
+    self._httpCacheDir = ""
+    self._httpCacheMaxMB = 512
+    self._requestTimeout = None
+    self._httpPoolSize = None
+    # job branch ID => last successful build number seen by watch mode
+    self._buildNumbers = {}
+    # optional PhaseProfiler for --profile / --trace-memory
+    self._profiler = None
+    # FetchHistory of report sizes and fetch times from earlier runs
+    self._history = None
+    # optional NDJSONWriter for --ndjson
+    self._events = None
 
   def configure(self, configFilename):
     try:
@@ -63,22 +96,29 @@ class NexusData:
         self._pdfReportsDir = js.get('pdfReportsDir', "")
         self._reportsDir = js.get('reportsDir', "")
         self._statusJSON = js.get('statusJSON', "")
+        # optional: "raw" (default) writes [branch].orig.json files;
+        # "compressed" writes deduplicated blobs into a JSONStore
+        self._jsonStorage = js.get('jsonStorage', "raw")
+        # optional: shared directory for sharded runs
+        self._shardsDir = js.get('shardsDir', "")
+        # optional: directory for the static HTML report site
+        self._htmlReportsDir = js.get('htmlReportsDir', "")
+        # optional: persistent HTTP cache for Jenkins and Nexus GETs
+        self._httpCacheDir = js.get('httpCacheDir', "")
+        self._httpCacheMaxMB = js.get('httpCacheMaxMB', 512)
+        # optional: where to record report sizes and fetch times
+        fetchHistoryFile = js.get('fetchHistoryFile', "")
+        # optional: timeout in seconds for each Jenkins / Nexus request
+        self._requestTimeout = js.get('requestTimeout', None)
+        # optional: pooled connections kept open to each host
+        self._httpPoolSize = js.get('httpPoolSize', None)
+        # optional: several organizations / Jenkins instances to cover in
+        # one run; see parseTargets
+        targetsJS = js.get('targets', [])
 
         isValid = True
-        if self._username == "":
-          print(f"No username found in config file.")
-          isValid = False
-        if self._password == "":
-          print(f"No password found in config file.")
-          isValid = False
-        if self._baseurl == "":
-          print(f"No baseurl found in config file.")
-          isValid = False
-        if self._jenkinsbaseurl == "":
-          print(f"No jenkinsBaseurl found in config file.")
-          isValid = False
-        if self._orgId == "":
-          print(f"No organizationId found in config file.")
+        self._targets = self.parseTargets(targetsJS)
+        if self._targets is None:
           isValid = False
         if self._jsonDir == "":
           print(f"No jsonDir found in config file.")
@@ -92,45 +132,183 @@ class NexusData:
         if self._statusJSON == "":
           print(f"No statusJSON found in config file.")
           isValid = False
+        if self._jsonStorage not in ["raw", "compressed"]:
+          print(f"Invalid jsonStorage value {self._jsonStorage} in config file; expected \"raw\" or \"compressed\".")
+          isValid = False
 
         if not isValid:
           return False
 
-        # configure the app catalog with the org ID
-        self._appCatalog = NexusAppCatalog(self._orgId)
+        # configure the app catalog with the org ID(s)
+        self._appCatalog = NexusAppCatalog(",".join(t._orgId for t in self._targets.values()))
+        if self._shardsDir == "":
+          self._shardsDir = f"{self._reportsDir}/shards"
+        if self._jsonStorage == "compressed":
+          self._store = JSONStore(self._jsonDir)
+        if fetchHistoryFile == "":
+          fetchHistoryFile = f"{self._reportsDir}/fetch-history.json"
+        self._history = FetchHistory(fetchHistoryFile)
         return True
 
-    except json.decoder.JSONDecodeError as e:
+    except (OSError, json.decoder.JSONDecodeError) as e:
       print(f'Error loading or parsing {configFilename}: {str(e)}')
       return False
 
+  # Apply the config file's HTTP settings (cache, timeouts and connection
+  # pool). Call after configure, before talking to Jenkins or Nexus IQ.
+  def configureHTTP(self):
+    import httptools
+    if self._httpCacheDir != "":
+      httptools.configureCache(self._httpCacheDir, self._httpCacheMaxMB * 1024 * 1024)
+    httptools.configureTimeouts(self._requestTimeout or httptools.DEFAULT_REQUEST_TIMEOUT)
+    httptools.configurePool(self._httpPoolSize or httptools.DEFAULT_POOL_SIZE)
+
+  # Build the targets from the config file's "targets" list, each entry a
+  # dict with "name", "organizationId" and "jenkinsBaseurl", and optionally
+  # "baseurl", "username" and "password"; values missing from an entry are
+  # taken from the top level of the config file. With no "targets" list,
+  # the top-level values make up the one unnamed target.
+  # returns: dict of {target name => NexusTarget}, or None if invalid
+  def parseTargets(self, targetsJS):
+    if not targetsJS:
+      targetsJS = [{"name": ""}]
+    targets = {}
+    isValid = True
+    for t in targetsJS:
+      name = t.get("name", "")
+      target = NexusTarget(
+        name,
+        t.get("organizationId", self._orgId),
+        t.get("baseurl", self._baseurl),
+        t.get("jenkinsBaseurl", self._jenkinsbaseurl),
+        t.get("username", self._username),
+        t.get("password", self._password),
+      )
+      where = f" for target {name}" if name else ""
+      if len(targetsJS) > 1 or name:
+        # target names are used in app branch IDs and report directories
+        if not re.fullmatch(r"[A-Za-z0-9_-]+", name):
+          print(f"Invalid target name \"{name}\" in config file; use letters, digits, _ and -.")
+          isValid = False
+        elif name in targets:
+          print(f"Duplicate target name {name} in config file.")
+          isValid = False
+      for value, key in [(target._username, "username"),
+        (target._password, "password"), (target._baseurl, "baseurl"),
+        (target._jenkinsBaseurl, "jenkinsBaseurl"),
+        (target._orgId, "organizationId")]:
+        if value == "":
+          print(f"No {key} found in config file{where}.")
+          isValid = False
+      targets[name] = target
+    if not isValid:
+      return None
+    return targets
+
+  # returns: NexusTarget for the given app branch, or None if not known
+  def getTargetForApp(self, appBranch):
+    app = self._appCatalog.getApp(appBranch)
+    if not app:
+      return None
+    return self._targets.get(app._target, None)
+
+  # Stream dependency records and run events to an NDJSONWriter.
+  def setEventWriter(self, writer):
+    self._events = writer
+    self._depCatalog.addListener(writer.dependencyAdded)
+
+  def emitEvent(self, event, **fields):
+    if self._events:
+      self._events.writeEvent(event, **fields)
+
+  # returns: context manager that profiles the named phase of the run, if
+  # profiling is enabled
+  def phase(self, name):
+    if self._profiler:
+      return self._profiler.phase(name)
+    return nullcontext()
+
   def loadAppInitialData(self):
-    # get list of all Nexus applications and app IDs
-    apps_rj = nexustools.getNexusApplications(
-      self._baseurl,
-      self._username,
-      self._password
-    )
+    import nexustools
+    for target in self._targets.values():
+      # get list of all Nexus applications and app IDs
+      apps_rj = nexustools.getNexusApplications(
+        target._baseurl,
+        target._username,
+        target._password
+      )
+
+      # parse it for the given org ID and get app (name, id) tuples
+      apps = nexustools.parseNexusApplicationsJSON(target._orgId, apps_rj)
 
-    # parse it for the given org ID and get app (name, id) tuples
-    apps = nexustools.parseNexusApplicationsJSON(self._orgId, apps_rj)
+      # create apps in catalog
+      # don't get report IDs yet (don't want to keep pinging the server)
+      for name, appId in apps:
+        self._appCatalog.addApp(name, appId, target=target._name)
 
-    # create apps in catalog
-    # don't get report IDs yet (don't want to keep pinging the server)
-    for name, appId in apps:
-      self._appCatalog.addApp(name, appId)
+  # shard: optional tuple (shardIndex, shardCount); if given, only the
+  # branches in this worker's partition are looked up
+  def loadAppInitialDataFromJenkins(self, shard=None):
+    targets = list(self._targets.values())
+    if len(targets) == 1:
+      self.loadTargetAppsFromJenkins(targets[0], shard)
+      return
 
-  def loadAppInitialDataFromJenkins(self):
-    print(f"getting main URLs list from Jenkins...")
-    job_url_branch_ts = jenkinstools.getMainUrlList(self._jenkinsbaseurl)
+    # look up every target's apps at once, so that this takes about as
+    # long as the slowest target rather than all of them added up; this is
+    # profiled as one phase, since a phase can't be profiled from several
+    # threads at once
+    print(f"getting apps from {len(targets)} targets...")
+    with self.phase("jenkins-discovery"):
+      with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        futures = [executor.submit(self.loadTargetAppsFromJenkins, target,
+          shard, False) for target in targets]
+        for future in futures:
+          future.result()
 
-    job_report_urls = []
-    print(f"getting report IDs from Jenkins...")
+  # Add the apps built by one target's Jenkins instance to the catalog.
+  # arguments:
+  #   1) NexusTarget
+  #   2) optional: tuple (shardIndex, shardCount)
+  #   3) optional: False to skip profiling the phases
+  def loadTargetAppsFromJenkins(self, target, shard=None, profile=True):
+    import requests
+    import jenkinstools
+    phase = self.phase if profile else (lambda name: nullcontext())
+    prefix = f"{target._name}: " if target._name else ""
+    print(f"{prefix}getting main URLs list from Jenkins...")
+    with phase("jenkins-discovery"):
+      try:
+        job_url_branch_ts = jenkinstools.getMainUrlList(target._jenkinsBaseurl)
+      except requests.exceptions.RequestException as e:
+        print(f"{prefix}Couldn't get main URLs list from Jenkins: {str(e)}")
+        return
+    job_url_branch_ts = [
+      (job_url, getTargetBranchId(target._name, job_branch_id))
+      for (job_url, job_branch_id) in job_url_branch_ts
+    ]
+    if shard:
+      shardIndex, shardCount = shard
+      job_url_branch_ts = [
+        (job_url, job_branch_id) for (job_url, job_branch_id) in job_url_branch_ts
+        if shards.shardForBranch(job_branch_id, shardCount) == shardIndex
+      ]
+      print(f"{prefix}shard {shardIndex}/{shardCount}: {len(job_url_branch_ts)} branches")
+
+    print(f"{prefix}getting report IDs from Jenkins...")
     for (job_url, job_branch_id) in job_url_branch_ts:
-      report_id, job_app_id = jenkinstools.getReportIDs(job_url)
+      with phase("report-id-resolution"):
+        try:
+          report_id, job_app_id = jenkinstools.getReportIDs(job_url)
+        except requests.exceptions.RequestException as e:
+          # keep the branch without a report ID, so that it is reported
+          # as stale or missing rather than silently left out
+          print(f"  => Couldn't get report ID for branch {job_branch_id}: {str(e)}")
+          self._appCatalog.addApp(job_branch_id, "", job_branch_id, "", target._name)
+          continue
       if report_id:
         # don't have the hash appID yet, just the short app id (publicID)
-        self._appCatalog.addApp(job_app_id, "", job_branch_id, report_id)
+        self._appCatalog.addApp(job_app_id, "", job_branch_id, report_id, target._name)
         print(f"  => Added app {job_app_id} with branch {job_branch_id}")
       else:
         print(f"  => Couldn't get report ID for branch {job_branch_id}; skipping")
@@ -150,11 +328,16 @@ class NexusData:
       return reportId
 
     # get Nexus JSON data for this app
+    import nexustools
+    target = self._targets.get(app._target, None)
+    if not target:
+      print(f"Unknown target for app {appName}.")
+      return False
     appId = app.getAppId()
     app_rj = nexustools.getNexusApplicationJSON(
-      self._baseurl,
-      self._username,
-      self._password,
+      target._baseurl,
+      target._username,
+      target._password,
       appId
     )
     if not app_rj:
@@ -178,24 +361,136 @@ class NexusData:
       print(f"Couldn't load app branch {appBranch} from internal app catalog; skipping.")
       return False
 
-    # make sure report ID was obtained
+    with self.phase("license-fetch"):
+      content, fetchStatus = self.fetchLicenseContent(appBranch)
+      lic_rj = self.parseLicenseContent(appBranch, content)
+    with self.phase("catalog-build"):
+      return self.foldLicenseData(appBranch, lic_rj, fetchStatus)
+
+  # Get the raw license JSON for an app: the stored copy if we already have
+  # it for this same report, otherwise from Nexus IQ, otherwise whatever
+  # copy an earlier run left behind. Doesn't touch the catalogs, so it can
+  # run in several fetch threads at once.
+  # force: True to skip the stored copy, e.g. after the report was
+  # re-evaluated in place
+  # returns: tuple (bytes or None, one of the FETCH_STATUS_ values)
+  def fetchLicenseContent(self, appBranch, force=False):
+    import requests
+    import nexustools
+    app = self._appCatalog.getApp(appBranch)
     if not app._reportId:
-      print(f"No report ID for {appBranch}; skipping.")
-      return False
+      print(f"No report ID for {appBranch}.")
+    elif force:
+      pass
+    elif self._store and self._store.getReportId(appBranch) == app._reportId:
+      content = self._store.loadContent(appBranch)
+      if content is not None:
+        return content, FETCH_STATUS_CURRENT
 
-    # get the license JSON data
-    lic_rj = nexustools.getNexusLicenseJSON(
-      self._baseurl,
-      self._username,
-      self._password,
-      app._name,
-      app._reportId,
-      f"{self._jsonDir}/{appBranch}.orig.json"
-    )
+    target = self._targets.get(app._target, None)
+    if app._reportId and not target:
+      print(f"{appBranch}: unknown target {app._target}; can't get license data.")
+    elif app._reportId:
+      if self._store:
+        filename = None
+      else:
+        filename = f"{self._jsonDir}/{appBranch}.orig.json"
+      content = None
+      start = time.perf_counter()
+      try:
+        content = nexustools.getNexusLicenseJSONContent(
+          target._baseurl,
+          target._username,
+          target._password,
+          app._name,
+          app._reportId
+        )
+      except requests.exceptions.RequestException as e:
+        print(f"{appBranch}: couldn't get license data: {str(e)}")
+      if content is not None:
+        if self._history:
+          self._history.record(appBranch, len(content),
+            time.perf_counter() - start, app._reportId)
+        nexustools.saveNexusLicenseJSONContent(content, app._name,
+          app._reportId, filename, self._store, appBranch)
+        return content, FETCH_STATUS_CURRENT
+
+    # fall back to whatever copy an earlier run left behind
+    content = self.loadStaleLicenseContent(appBranch)
+    if content is not None:
+      print(f"{appBranch}: using stale license data from an earlier run.")
+      return content, FETCH_STATUS_STALE
+    return None, FETCH_STATUS_MISSING
+
+  # returns: license JSON bytes for the app from an earlier run (from the
+  #          store, or the raw JSON file), or None if there isn't one
+  def loadStaleLicenseContent(self, appBranch):
+    if self._store:
+      return self._store.loadContent(appBranch)
+    filename = f"{self._jsonDir}/{appBranch}.orig.json"
+    try:
+      with open(filename, 'rb') as f:
+        return f.read()
+    except FileNotFoundError:
+      return None
+    except OSError as e:
+      print(f"Couldn't load stale license data from {filename}: {str(e)}")
+      return None
+
+  # returns: dict with license JSON, or None if no content or not parseable
+  def parseLicenseContent(self, appBranch, content):
+    if content is None:
+      return None
+    try:
+      return json.loads(content)
+    except ValueError as e:
+      # JSONDecodeError, or UnicodeDecodeError for a body that isn't UTF-8
+      print(f"Error parsing license data for {appBranch}: {str(e)}")
+      return None
+
+  # Add parsed license JSON for an app to the catalogs, and record how
+  # current it is.
+  # returns: True if license data was added, False otherwise
+  def foldLicenseData(self, appBranch, lic_rj, fetchStatus):
+    app = self._appCatalog.getApp(appBranch)
     if not lic_rj:
       print(f"Couldn't get data from report for {appBranch}; skipping.")
+      app.setFetchStatus(FETCH_STATUS_MISSING)
+      self.emitEvent("app_skipped", app=appBranch, reportId=app._reportId,
+        fetchStatus=FETCH_STATUS_MISSING)
       return False
 
+    self.addLicenseData(appBranch, lic_rj)
+    app.setFetchStatus(fetchStatus)
+    self.emitEvent("app_fetched", app=appBranch, reportId=app._reportId,
+      fetchStatus=fetchStatus, dependencies=len(app._dependencies))
+    return True
+
+  # write a run_summary event, if streaming events
+  def emitRunSummary(self, elapsed):
+    if not self._events:
+      return
+    stale, missing = getIncompleteApps(self)
+    self.emitEvent("run_summary",
+      apps=len(self._appCatalog),
+      dependencies=len(self._depCatalog._dependencies),
+      staleApps=stale,
+      missingApps=missing,
+      seconds=elapsed)
+
+  # returns: expected size in bytes of an app's license report, from an
+  #          earlier stored copy, or None if unknown
+  def getLicenseSizeHint(self, appBranch):
+    if self._store:
+      return self._store.getSize(appBranch)
+    try:
+      return os.path.getsize(f"{self._jsonDir}/{appBranch}.orig.json")
+    except OSError:
+      return None
+
+  def addLicenseData(self, appBranch, lic_rj):
+    app = self._appCatalog.getApp(appBranch)
+
     # don't parse it using nexustools
     # just extract the list from aaData key and start parsing for dependencies
     components = lic_rj.get("aaData", [])
@@ -207,41 +502,892 @@ class NexusData:
       )
       app.addDependency(ds)
 
-  def getAllLicensesAndReports(self):
+  # workers: number of concurrent fetches; with more than one, apps are
+  # fetched longest expected fetch first, and fetching, parsing and adding
+  # to the catalogs overlap in a LicensePipeline
+  # parseWorkers: number of parser threads in the pipeline
+  def getAllLicensesAndReports(self, workers=1, parseWorkers=1):
+    import httptools
+    appBranches = self._appCatalog.getAllAppBranches()
+    if workers <= 1:
+      for appBranch in appBranches:
+        print(f"{appBranch}: getting license data...")
+        self.getLicenses(appBranch)
+        # once past the deadline, no more requests are made, so there is no
+        # need to pace the remaining apps
+        if not httptools.deadlinePassed():
+          time.sleep(0.25)
+    else:
+      fetchOrder = None
+      if self._history:
+        fetchOrder = self._history.orderForFetch(appBranches,
+          self.getLicenseSizeHint)
+      print(f"getting license data for {len(appBranches)} apps with {workers} fetch workers and {parseWorkers} parse workers...")
+      # folded in the same order as a serial fetch, so both give the
+      # same catalogs
+      LicensePipeline(self, workers, parseWorkers).run(appBranches, fetchOrder)
+
+    self.saveFetchState()
+
+  # save the fetch history and the store index, once a batch of fetches
+  # is done
+  def saveFetchState(self):
+    if self._history:
+      self._history.save()
+    if self._store:
+      self._store.saveIndex()
+
+  # drop an app's current dependencies from the catalog, so that its
+  # license data can be re-added from a newer report
+  def clearAppLicenses(self, appBranch):
+    app = self._appCatalog.getApp(appBranch)
+    if not app:
+      return
+    self._depCatalog.removeAppFromDependencies(appBranch, app._dependencies)
+    app._dependencies = []
+
+  # re-fetch license data for one app from the given report, updating the
+  # dependency catalog incrementally. The app's current data is only
+  # replaced once the new report's data has been fetched and parsed; if
+  # that fails, the app is left as it was (or not added, if it's new).
+  # returns: True if the app now reflects the given report, False otherwise
+  def refreshApp(self, appBranch, appName, reportId, target=""):
+    app = self._appCatalog.getApp(appBranch)
+    oldReportId = None
+    if app:
+      oldReportId = app.getReportId()
+      app.setReportId(reportId)
+    else:
+      self._appCatalog.addApp(appName, "", appBranch, reportId, target)
+
+    with self.phase("license-fetch"):
+      content, fetchStatus = self.fetchLicenseContent(appBranch)
+      lic_rj = self.parseLicenseContent(appBranch, content)
+    # stale data from an earlier run is for the old report, so it doesn't
+    # count as a refresh
+    if fetchStatus != FETCH_STATUS_CURRENT or not lic_rj:
+      if app:
+        app.setReportId(oldReportId)
+      else:
+        self._appCatalog.removeApp(appBranch)
+      return False
+
+    with self.phase("catalog-build"):
+      return self.replaceLicenseData(appBranch, lic_rj, fetchStatus)
+
+  # Replace an app's license data with newly fetched data. The app's
+  # current data is only dropped once the new data is here; stale data
+  # from an earlier run, or no data, leaves the app as it was.
+  # returns: True if the app's license data was replaced, False otherwise
+  def replaceLicenseData(self, appBranch, lic_rj, fetchStatus):
+    if fetchStatus != FETCH_STATUS_CURRENT or not lic_rj:
+      print(f"{appBranch}: couldn't get updated license data; keeping the current data.")
+      return False
+    self.clearAppLicenses(appBranch)
+    return self.foldLicenseData(appBranch, lic_rj, fetchStatus)
+
+  # returns: sorted list of app branches whose reports contain any of the
+  #          given dependency-versions
+  def getAppsUsingDependencies(self, depStrings):
+    appBranches = set()
+    for ds in depStrings:
+      dep = self._depCatalog._dependencies.get(ds, None)
+      if not dep:
+        print(f"{ds}: not found in any report; skipping")
+        continue
+      appBranches.update(dep.getAppNames())
+    return sorted(appBranches)
+
+  # Ask Nexus IQ to re-evaluate each app's current report, several at once
+  # (subject to any rate limit configured in httptools).
+  # returns: list of app branches whose re-evaluation was accepted
+  def reevaluateReports(self, appBranches, workers=4):
+    import requests
+    import nexustools
+
+    def reevaluate(appBranch):
+      app = self._appCatalog.getApp(appBranch)
+      if not app or not app._reportId:
+        print(f"{appBranch}: no report ID; can't re-evaluate")
+        return False
+      target = self._targets.get(app._target, None)
+      if not target:
+        print(f"{appBranch}: unknown target {app._target}; can't re-evaluate")
+        return False
+      return nexustools.reevaluateNexusReport(target._baseurl, target._username,
+        target._password, app._name, app._reportId)
+
+    reevaluated = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+      futures = {executor.submit(reevaluate, b): b for b in appBranches}
+      for future in as_completed(futures):
+        appBranch = futures[future]
+        try:
+          ok = future.result()
+        except requests.exceptions.RequestException as e:
+          print(f"{appBranch}: couldn't re-evaluate report: {str(e)}")
+          ok = False
+        if ok:
+          print(f"{appBranch}: re-evaluated report")
+          reevaluated.append(appBranch)
+    return sorted(reevaluated)
+
+  # Fetch the given apps' license data again from Nexus IQ, bypassing any
+  # stored copy, and replace each app's data as its new data arrives; apps
+  # that can't be fetched keep their current data.
+  # returns: number of apps whose license data was replaced
+  def refreshApps(self, appBranches, workers=4):
+    pipeline = LicensePipeline(self, workers, 1, force=True, replace=True)
+    refreshed = pipeline.run(appBranches)
+    self.saveFetchState()
+    return refreshed
+
+  # Poll Jenkins once, and refresh only the apps whose report ID changed.
+  # Only the Jenkins root page and each job's last successful build number
+  # are requested, unless a job has a new build.
+  # returns: list of app branches that were added, refreshed or removed
+  def pollJenkinsForChanges(self):
+    import jenkinstools
+    changed = []
+    job_url_branch_ts = []
+    for target in self._targets.values():
+      job_url_branch_ts.extend(
+        (job_url, getTargetBranchId(target._name, job_branch_id), target._name)
+        for (job_url, job_branch_id) in jenkinstools.getMainUrlList(target._jenkinsBaseurl)
+      )
+    seen = set()
+    for (job_url, job_branch_id, targetName) in job_url_branch_ts:
+      seen.add(job_branch_id)
+      buildNumber = jenkinstools.getLastBuildNumber(job_url)
+      if buildNumber is not None and buildNumber == self._buildNumbers.get(job_branch_id, None):
+        continue
+
+      # the build number is only recorded once this build's report is in
+      # the catalogs, so that anything that fails is retried next poll
+      report_id, job_app_id = jenkinstools.getReportIDs(job_url)
+      if not report_id:
+        print(f"  => Couldn't get report ID for branch {job_branch_id}; skipping")
+        continue
+      app = self._appCatalog.getApp(job_branch_id)
+      if app and app.getReportId() == report_id:
+        self._buildNumbers[job_branch_id] = buildNumber
+        continue
+
+      print(f"{job_branch_id}: new report {report_id}; getting license data...")
+      if not self.refreshApp(job_branch_id, job_app_id, report_id, targetName):
+        print(f"{job_branch_id}: couldn't refresh; will retry on the next poll")
+        continue
+      self._buildNumbers[job_branch_id] = buildNumber
+      changed.append(job_branch_id)
+
+    # drop apps whose jobs are gone from Jenkins
     for appBranch in self._appCatalog.getAllAppBranches():
-      print(f"{appBranch}: getting license data...")
-      self.getLicenses(appBranch)
-      time.sleep(0.25)
+      if appBranch not in seen:
+        print(f"{appBranch}: no longer listed in Jenkins; removing")
+        self.clearAppLicenses(appBranch)
+        self._appCatalog.removeApp(appBranch)
+        self._buildNumbers.pop(appBranch, None)
+        changed.append(appBranch)
+
+    self.saveFetchState()
+    return changed
+
+  # returns: path where the PDF report for this app and report ID is archived
+  def getPDFReportFilename(self, appBranch, reportId):
+    return f"{self._pdfReportsDir}/{appBranch}.{reportId}.pdf"
 
+  # Download the PDF reports for every app in the catalog, using a bounded
+  # pool of concurrent downloads. Reports whose report ID is already
+  # archived are skipped.
+  # returns: tuple (downloaded, skipped, failed) counts
+  def archivePDFReports(self, workers=4):
+    import nexustools
+    Path(self._pdfReportsDir).mkdir(parents=True, exist_ok=True)
+
+    todo = []
+    skipped = 0
+    for appBranch in self._appCatalog.getAllAppBranches():
+      app = self._appCatalog.getApp(appBranch)
+      if not app._reportId:
+        print(f"No report ID for {appBranch}; skipping PDF.")
+        continue
+      target = self._targets.get(app._target, None)
+      if not target:
+        print(f"Unknown target {app._target} for {appBranch}; skipping PDF.")
+        continue
+      filename = self.getPDFReportFilename(appBranch, app._reportId)
+      if os.path.exists(filename):
+        skipped = skipped + 1
+        continue
+      todo.append((appBranch, target, app._name, app._reportId, filename))
+
+    downloaded = 0
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+      futures = {
+        executor.submit(nexustools.getNexusReportPDF, target._baseurl,
+          target._username, target._password, appName, reportId, filename): appBranch
+        for (appBranch, target, appName, reportId, filename) in todo
+      }
+      for future in as_completed(futures):
+        appBranch = futures[future]
+        try:
+          result = future.result()
+        except Exception as e:
+          print(f"{appBranch}: couldn't download PDF report: {str(e)}")
+          result = None
+        if result:
+          print(f"{appBranch}: saved PDF report")
+          downloaded = downloaded + 1
+        else:
+          failed = failed + 1
+
+    return downloaded, skipped, failed
+
+  # returns: name of the target that a stored app branch ID came from,
+  #          from its "target." prefix, or "" if it has none
+  def getTargetNameForBranch(self, appBranch):
+    prefix = appBranch.split(".", maxsplit=1)[0]
+    if "." in appBranch and prefix in self._targets:
+      return prefix
+    return ""
+
+  # returns: NexusData with just the given target's apps and the
+  #          dependencies they use, whose reports go in a subdirectory of
+  #          the reports directory named for the target
+  def getTargetView(self, targetName):
+    target = self._targets[targetName]
+    view = NexusData()
+    view._targets = {targetName: target}
+    view._orgId = target._orgId
+    view._reportsDir = f"{self._reportsDir}/{targetName}"
+    if self._htmlReportsDir:
+      view._htmlReportsDir = f"{self._htmlReportsDir}/{targetName}"
+    view._appCatalog = self._appCatalog.getCatalogForTarget(targetName, target._orgId)
+    view._depCatalog = self._depCatalog.getCatalogForApps(view._appCatalog.getAllAppBranches())
+    return view
+
+  def saveSnapshot(self, filename):
+    return snapshot.saveSnapshot(self, filename)
+
+  def loadSnapshot(self, filename):
+    return snapshot.loadSnapshot(self, filename)
+
+  def loadAllLicensesFromStore(self):
+    # offline: rebuild the catalogs from the compressed store only,
+    # without contacting Jenkins or Nexus
+    if not self._store:
+      print(f"No compressed JSON store configured; set jsonStorage to \"compressed\".")
+      return False
+
+    for appBranch in self._store.getAllBranches():
+      lic_rj = self._store.loadJSON(appBranch)
+      if not lic_rj:
+        print(f"{appBranch}: couldn't load stored license data; skipping.")
+        continue
+      if not self._appCatalog.getApp(appBranch):
+        self._appCatalog.addApp(self._store.getAppName(appBranch) or "", "",
+          appBranch, self._store.getReportId(appBranch),
+          self.getTargetNameForBranch(appBranch))
+      self.addLicenseData(appBranch, lic_rj)
+    return True
+
+
+########## command helpers ##########
+
+DEFAULT_CONFIG_FILENAME = str(Path.home() / ".nexusiq" / "config.json")
+
+# Types for numeric options, so that argparse reports bad values as usage
+# errors instead of the command failing part-way through.
+def positiveInt(value):
+  import argparse
+  try:
+    n = int(value)
+  except ValueError:
+    n = 0
+  if n < 1:
+    raise argparse.ArgumentTypeError(f"expected a whole number of at least 1, got {value!r}")
+  return n
+
+def positiveFloat(value):
+  import argparse
+  try:
+    n = float(value)
+  except ValueError:
+    n = 0.0
+  if not n > 0:
+    raise argparse.ArgumentTypeError(f"expected a number greater than 0, got {value!r}")
+  return n
+
+# returns: latency scale for replayed responses, from "original", "none" or
+#          a factor
+def replayLatency(value):
+  import argparse
+  if value == "original":
+    return 1.0
+  if value == "none":
+    return 0.0
+  try:
+    n = float(value)
+  except ValueError:
+    n = -1.0
+  if not n >= 0:
+    raise argparse.ArgumentTypeError(f"expected original, none or a factor of at least 0, got {value!r}")
+  return n
+
+# Command-line options, as (option, metavar, help), or (option, metavar,
+# help, type) for options that aren't plain strings. Options whose metavar
+# is None are flags, and are set to "true" when given; options not starting
+# with "--" are positional arguments.
+CONFIG_OPTIONS = [
+  ("--config", "FILE", f"config file (default {DEFAULT_CONFIG_FILENAME})"),
+]
+# for commands that talk to Jenkins or Nexus IQ
+NETWORK_OPTIONS = [
+  ("--record", "FILE", "record every HTTP response to a fixture archive"),
+  ("--replay", "FILE", "serve HTTP responses from a recorded fixture archive instead of the network"),
+  ("--replay-latency", "original|none|FACTOR", "latency of replayed responses (default original)", replayLatency),
+]
+# for commands that work from catalogs built by an earlier run
+CATALOG_OPTIONS = [
+  ("--load-snapshot", "FILE", "use a snapshot instead of the compressed JSON store"),
+  ("--load-columnar", "FILE", "use a .parquet or .arrow export instead of the compressed JSON store"),
+]
+PROFILE_OPTIONS = [
+  ("--profile", None, "write cProfile stats for each phase of the run"),
+  ("--trace-memory", None, "write top allocation sites for each phase of the run"),
+  ("--profile-dir", "DIR", "where to write profiling output (default REPORTS-DIR/reports/profile)"),
+]
+SAVE_SNAPSHOT_OPTION = ("--save-snapshot", "FILE", "save a snapshot of the catalogs")
+
+# (command, aliases, help, whether it talks to Jenkins or Nexus IQ, options)
+COMMANDS = [
+  ("fetch", ["licenses"], "Get licenses for all dependencies from Jenkins and Nexus IQ, and create reports", True, [
+    ("--shard", "i/N", "only handle shard i of N, and write a shard file"),
+    ("--deadline", "MINUTES", "stop fetching after this long, and report on what was collected", positiveFloat),
+    ("--fetch-workers", "N", "number of concurrent license fetches, longest first (default 1)", positiveInt),
+    ("--parse-workers", "N", "number of threads parsing fetched license data (default 1)", positiveInt),
+    ("--ndjson", "FILE", "stream dependency records and run events to FILE as they happen"),
+    ("--export", "FILE", "also export the catalogs to a .parquet or .arrow file"),
+    SAVE_SNAPSHOT_OPTION,
+  ] + PROFILE_OPTIONS),
+  ("render", ["offline"], "Create reports from catalogs built by an earlier run, without contacting any server", False,
+    CATALOG_OPTIONS + [SAVE_SNAPSHOT_OPTION]),
+  ("query", [], "List dependencies matching all of the given criteria", False, CATALOG_OPTIONS + [
+    ("--min-threat", "N", "minimum threat level", int),
+    ("--max-threat", "N", "maximum threat level", int),
+    ("--category", "CATEGORY", "license category, e.g. \"Other\""),
+    ("--license", "LICENSE", "converted license string, e.g. \"Apache-2.0\""),
+    ("--app", "BRANCH", "app branch ID"),
+    ("--json", None, "print the results as JSON"),
+  ]),
+  ("search", [], "Find dependency-versions by group, artifact or component name prefixes, tolerating typos", False, CATALOG_OPTIONS + [
+    ("text", "TEXT", "search text, e.g. \"log4j-core 2.14\" or \"org.apache.commons:commons-text\""),
+    ("--limit", "N", "maximum number of results (default 20)", positiveInt),
+    ("--json", None, "print the results as JSON"),
+  ]),
+  ("diff", [], "Compare the catalogs in two snapshots or columnar exports", False, [
+    ("old", "OLD", "older snapshot, .parquet or .arrow file"),
+    ("new", "NEW", "newer snapshot, .parquet or .arrow file"),
+    ("--json", None, "print the differences as JSON"),
+  ]),
+  ("bench", [], "Time loading, categorizing, report writing and queries, repeatedly", False, CATALOG_OPTIONS + [
+    ("--repeat", "N", "number of times to repeat (default 5)", positiveInt),
+    ("--output", "FILE", "also save the timings as JSON"),
+  ]),
+  ("serve", [], "Keep the catalogs in memory and answer queries over local HTTP, reloading after each run", False, CATALOG_OPTIONS + [
+    ("--host", "HOST", "address to listen on (default 127.0.0.1)"),
+    ("--port", "N", "port to listen on (default 8765)", int),
+    ("--socket", "PATH", "listen on a Unix socket instead of a port"),
+    ("--poll", "SECONDS", "how often to check the snapshot or export for changes (default 5)", positiveFloat),
+  ]),
+  ("merge", [], "Merge shard files and create reports", False, [
+    ("--shards", "N", "number of shards to merge", positiveInt),
+    SAVE_SNAPSHOT_OPTION,
+  ]),
+  ("sharded", [], "Run N local shard workers, then merge", False, [
+    ("--shards", "N", "number of shards", positiveInt),
+    ("--deadline", "MINUTES", "passed on to each shard worker", positiveFloat),
+  ]),
+  ("watch", [], "Keep polling Jenkins, and refresh apps and reports as they change", True, [
+    ("--interval", "SECONDS", "time between polls (default 300)", positiveFloat),
+    ("--load-snapshot", "FILE", "start from a snapshot of the catalogs"),
+    ("--save-snapshot", "FILE", "save a snapshot after each change"),
+  ]),
+  ("matrix", [], "Export the app x dependency incidence matrix and show red findings impact", False, CATALOG_OPTIONS + [
+    ("--output", "FILE", ".npz file to write (default REPORTS-DIR/reports/incidence.npz)"),
+  ]),
+  ("pdfs", [], "Download PDF reports for all apps into pdfReportsDir", True, [
+    ("--workers", "N", "number of concurrent downloads (default 4)", positiveInt),
+    ("--load-snapshot", "FILE", "take apps and report IDs from a snapshot"),
+  ]),
+  ("reevaluate", [], "Re-evaluate every report containing the given dependencies, then refresh their data", True, CATALOG_OPTIONS + [
+    ("--dep", "DEPSTRING", "dependency-version that was cleared, e.g. group:artifact:version"),
+    ("--deps-file", "FILE", "file with one cleared dependency-version per line"),
+    ("--needing-refresh", None, "also include dependencies whose status differs between reports"),
+    ("--workers", "N", "number of concurrent requests (default 4)", positiveInt),
+    ("--rate", "N", "maximum requests per second (default 5)", positiveFloat),
+  ]),
+  ("review-other", [], "Cluster license strings in Other and suggest categories, in a review sheet", False, CATALOG_OPTIONS + [
+    ("--threshold", "N", "minimum similarity (0 to 1) for clustering (default 0.5)", float),
+    ("--output", "FILE", ".xlsx file to write (default REPORTS-DIR/reports/other-review.xlsx)"),
+  ]),
+  ("export", [], "Export the catalogs to Parquet or Arrow for other analysis tools", False, CATALOG_OPTIONS + [
+    ("--output", "FILE", ".parquet or .arrow file to write (default REPORTS-DIR/reports/catalog.parquet)"),
+  ]),
+  ("import-json", [], "Import existing .orig.json files into the compressed JSON store", False, []),
+  ("prune-store", [], "Delete compressed JSON data no longer referenced by the store index, e.g. older reports", False, []),
+]
+
+def buildArgumentParser():
+  import argparse
+  parser = argparse.ArgumentParser(prog=sys.argv[0],
+    description="Retrieve license data from Nexus IQ and create reports.")
+  subparsers = parser.add_subparsers(dest="commandName", metavar="COMMAND")
+  subparsers.required = True
+  for name, aliases, helpText, network, commandOptions in COMMANDS:
+    subparser = subparsers.add_parser(name, aliases=aliases, help=helpText,
+      description=helpText)
+    subparser.set_defaults(command=name)
+    allOptions = CONFIG_OPTIONS + commandOptions
+    if network:
+      allOptions = allOptions + NETWORK_OPTIONS
+    for optionSpec in allOptions:
+      option, metavar, optionHelp = optionSpec[:3]
+      optionType = optionSpec[3] if len(optionSpec) > 3 else None
+      if not option.startswith("--"):
+        subparser.add_argument(option, metavar=metavar, help=optionHelp)
+      elif metavar is None:
+        subparser.add_argument(option, dest=option[2:], action="store_const",
+          const="true", help=optionHelp)
+      else:
+        subparser.add_argument(option, dest=option[2:], metavar=metavar,
+          type=optionType, help=optionHelp)
+  return parser
+
+# takes: (1) list of command-line arguments, starting with the command
+# returns: tuple (command, dict of {option name => value} for the options
+#          that were given, with "true" as the value for flags); exits with
+#          a usage message if the arguments are invalid
+def parseCommandLine(args):
+  parsed = vars(buildArgumentParser().parse_args(args))
+  command = parsed.pop("command")
+  parsed.pop("commandName")
+  options = {k: v for k, v in parsed.items() if v is not None}
+  return command, options
+
+# Create a NexusData from the config file given in the options; exits if it
+# can't be loaded, unless exitOnError is False, in which case returns None.
+# network: True if the command will talk to Jenkins or Nexus IQ, to apply
+# the HTTP settings and any --record / --replay option
+def loadNexusData(options, network=False, exitOnError=True):
+  nd = NexusData()
+  configFilename = options.get("config", DEFAULT_CONFIG_FILENAME)
+  if not nd.configure(configFilename):
+    print(f"Couldn't load configuration from {configFilename}.")
+    if not exitOnError:
+      return None
+    sys.exit(1)
+  if network:
+    nd.configureHTTP()
+    configureTransport(options)
+  return nd
+
+# returns: number of shards from --shards; exits if missing
+def getShardCount(options):
+  if "shards" not in options:
+    print(f"Missing --shards value")
+    sys.exit(1)
+  return options["shards"]
+
+# Load catalogs from a snapshot file, or from a .parquet / .arrow export.
+# returns: True if loaded, False otherwise
+def loadCatalogFile(nd, filename):
+  if os.path.splitext(filename)[1].lower() in [".parquet", ".arrow", ".feather"]:
+    import columnar
+    return columnar.importCatalog(nd, filename)
+  return nd.loadSnapshot(filename)
+
+# Load the catalogs built by an earlier run, from --load-snapshot or
+# --load-columnar if given, otherwise from the compressed JSON store.
+# returns: True if loaded, False otherwise
+def loadCatalogs(nd, options):
+  if "load-snapshot" in options:
+    return nd.loadSnapshot(options["load-snapshot"])
+  if "load-columnar" in options:
+    import columnar
+    return columnar.importCatalog(nd, options["load-columnar"])
+  return nd.loadAllLicensesFromStore()
+
+def createReports(nd):
+  with nd.phase("categorization"):
+    collected = collectAllLicenses(nd)
+  with nd.phase("report-writing"):
+    xlsx_filename = f"{nd._reportsDir}/report.xlsx"
+    print(f"creating report at {xlsx_filename}...")
+    createExcelReportAllLicenses(nd, xlsx_filename, collected)
+    print(f"creating red report...")
+    createRedReport(nd)
+    if nd._htmlReportsDir:
+      import htmlreport
+      print(f"creating HTML report in {nd._htmlReportsDir}...")
+      htmlreport.createHTMLReport(nd, nd._htmlReportsDir, collected)
+
+  # with several targets, the reports above cover all of them; also write
+  # each target's own reports into REPORTS-DIR/[target]/
+  if len(nd._targets) > 1:
+    for targetName in nd._targets:
+      view = nd.getTargetView(targetName)
+      Path(view._reportsDir).mkdir(parents=True, exist_ok=True)
+      print(f"creating reports for target {targetName}...")
+      createReports(view)
+
+# enable profiling on the NexusData if asked to by the command options
+def configureProfiling(nd, options):
+  profile = "profile" in options
+  traceMemory = "trace-memory" in options
+  if profile or traceMemory:
+    outputDir = options.get("profile-dir", f"{nd._reportsDir}/profile")
+    nd._profiler = PhaseProfiler(outputDir, profile, traceMemory)
+
+# record or replay HTTP traffic if asked to by the command options
+def configureTransport(options):
+  import httptools
+  if "replay" in options:
+    httptools.configureReplay(options["replay"],
+      options.get("replay-latency", 1.0))
+    print(f"replaying HTTP responses from {options['replay']}")
+  elif "record" in options:
+    httptools.configureRecording(options["record"])
+    print(f"recording HTTP responses to {options['record']}")
+
+def finishProfiling(nd):
+  if nd._profiler:
+    print(nd._profiler.finish())
+    print(f"profiling output written to {nd._profiler._outputDir}")
 
 ########## initial entry point ##########
 
 if __name__ == "__main__":
-  ran_command = False
-  
-  if len(sys.argv) == 2:
-    command = sys.argv[1]
-    if command == "licenses":
-      ran_command = True
-
-      nd = NexusData()
-      # FIXME let config file be user-definable
-      homedir = str(Path.home())
-      nd.configure(f"{homedir}/.nexusiq/config.json")
-      nd.loadAppInitialDataFromJenkins()
-      time.sleep(0.5)
+  command, options = parseCommandLine(sys.argv[1:])
+
+  if command == "fetch":
+    import httptools
+
+    shard = None
+    if "shard" in options:
+      shard = shards.parseShardSpec(options["shard"])
+      if not shard:
+        print(f"Invalid shard {options['shard']}; expected e.g. 2/8")
+        sys.exit(1)
 
-      nd.getAllLicensesAndReports()
-      xlsx_filename = f"{nd._reportsDir}/report.xlsx"
-      print(f"creating report at {xlsx_filename}...")
-      createExcelReportAllLicenses(nd, xlsx_filename)
-      print(f"creating red report...")
-      createRedReport(nd)
+    nd = loadNexusData(options, network=True)
+    configureProfiling(nd, options)
+    if shard:
+      # the merge step needs each app's own records, not just the merged
+      # catalog
+      shardRecorder = shards.ShardRecorder()
+      nd._depCatalog.addListener(shardRecorder.dependencyAdded)
+    if "deadline" in options:
+      # stop fetching once the deadline passes, and report on whatever
+      # has been collected by then
+      deadlineMinutes = options["deadline"]
+      httptools.configureDeadline(deadlineMinutes * 60)
+    if "ndjson" in options:
+      from ndjsonwriter import NDJSONWriter
+      nd.setEventWriter(NDJSONWriter(options["ndjson"]))
+    runStart = time.perf_counter()
+    nd.loadAppInitialDataFromJenkins(shard)
+    time.sleep(0.5)
 
+    nd.getAllLicensesAndReports(options.get("fetch-workers", 1),
+      options.get("parse-workers", 1))
+    nd.emitRunSummary(time.perf_counter() - runStart)
+    incomplete = nd._appCatalog.getIncompleteAppBranches()
+    if incomplete:
+      print(f"Warning: license data is stale or missing for {len(incomplete)} apps: {incomplete}")
+    if shard:
+      # sharded worker: leave the reports to the merge step
+      shardIndex, shardCount = shard
+      shard_filename = shards.getShardFilename(nd._shardsDir, shardIndex, shardCount)
+      print(f"writing shard to {shard_filename}...")
+      shards.writeShard(nd, shardRecorder, shard_filename, shardIndex, shardCount)
+    else:
+      createReports(nd)
+    if "save-snapshot" in options:
+      print(f"saving snapshot to {options['save-snapshot']}...")
+      nd.saveSnapshot(options["save-snapshot"])
+    if "export" in options:
+      import columnar
+      print(f"exporting catalog to {options['export']}...")
+      columnar.exportCatalog(nd, options["export"])
+
+    if nd._events:
+      nd._events.close()
+    httptools.printCacheStats()
+    finishProfiling(nd)
+    print("Exiting.")
+
+  if command == "merge":
+    shardCount = getShardCount(options)
+    nd = loadNexusData(options)
+    filenames = shards.findShardFiles(nd._shardsDir, shardCount)
+    if len(filenames) != shardCount:
+      print(f"Warning: expected {shardCount} shards in {nd._shardsDir}, found {len(filenames)}")
+    merged = shards.mergeShards(nd, filenames)
+    # don't overwrite the reports with empty ones
+    if merged == 0:
+      print(f"No shards merged from {nd._shardsDir}; not creating reports.")
+      sys.exit(1)
+    print(f"merged {merged} shards with {len(nd._appCatalog)} apps")
+    createReports(nd)
+    if "save-snapshot" in options:
+      print(f"saving snapshot to {options['save-snapshot']}...")
+      nd.saveSnapshot(options["save-snapshot"])
+
+    print("Exiting.")
+
+  if command == "sharded":
+    # run one local worker process per shard, then merge
+    shardCount = getShardCount(options)
+    configOptions = ["--config", options.get("config", DEFAULT_CONFIG_FILENAME)]
+    workerOptions = []
+    if "deadline" in options:
+      workerOptions = ["--deadline", str(options["deadline"])]
+    workers = [
+      subprocess.Popen([sys.executable, sys.argv[0], "fetch", "--shard", f"{i}/{shardCount}"] + configOptions + workerOptions)
+      for i in range(shardCount)
+    ]
+    failed = [i for i, w in enumerate(workers) if w.wait() != 0]
+    if failed:
+      print(f"Warning: shard workers {failed} failed")
+    subprocess.run([sys.executable, sys.argv[0], "merge", "--shards", f"{shardCount}"] + configOptions)
+
+  if command == "watch":
+    import httptools
+
+    interval = options.get("interval", 300.0)
+    nd = loadNexusData(options, network=True)
+    if "load-snapshot" in options:
+      nd.loadSnapshot(options["load-snapshot"])
+
+    try:
+      while True:
+        print(f"polling Jenkins for changes...")
+        try:
+          changed = nd.pollJenkinsForChanges()
+        except Exception as e:
+          print(f"Error polling Jenkins: {str(e)}; will retry")
+          changed = []
+        if changed:
+          print(f"{len(changed)} apps changed; regenerating reports...")
+          createReports(nd)
+          if "save-snapshot" in options:
+            nd.saveSnapshot(options["save-snapshot"])
+        httptools.printCacheStats()
+        time.sleep(interval)
+    except KeyboardInterrupt:
       print("Exiting.")
-  
-  if ran_command == False:
-    print(f"Usage: {sys.argv[0]} <command>")
-    print(f"Commands:")
-    print(f"  licenses:       Get licenses for all dependencies")
-    print(f"")
+
+  if command == "matrix":
+    import analytics
+    nd = loadNexusData(options)
+    if loadCatalogs(nd, options):
+      m = analytics.buildIncidenceMatrix(nd)
+      print(f"incidence matrix: {m.shape[0]} apps x {m.shape[1]} dependency-versions, {len(m.indices)} entries")
+      matrix_filename = options.get("output", f"{nd._reportsDir}/incidence.npz")
+      analytics.saveIncidenceMatrix(m, matrix_filename)
+      print(f"saved to {matrix_filename}")
+      print(f"dependencies that would clear the most red findings:")
+      for ds, threat, numApps in analytics.getRedClearanceImpact(m):
+        print(f"  {numApps:5d} apps  (threat {threat})  {ds}")
+
+  if command == "pdfs":
+    import httptools
+
+    nd = loadNexusData(options, network=True)
+    if "load-snapshot" in options:
+      nd.loadSnapshot(options["load-snapshot"])
+    else:
+      nd.loadAppInitialDataFromJenkins()
+    workers = options.get("workers", 4)
+    downloaded, skipped, failed = nd.archivePDFReports(workers)
+    print(f"PDF reports: {downloaded} downloaded, {skipped} already archived, {failed} failed")
+    httptools.printCacheStats()
+    print("Exiting.")
+
+  if command == "render":
+    nd = loadNexusData(options)
+    if loadCatalogs(nd, options):
+      createReports(nd)
+      if "save-snapshot" in options:
+        print(f"saving snapshot to {options['save-snapshot']}...")
+        nd.saveSnapshot(options["save-snapshot"])
+
+    print("Exiting.")
+
+  if command == "query":
+    nd = loadNexusData(options)
+    if loadCatalogs(nd, options):
+      minThreat = options.get("min-threat", None)
+      maxThreat = options.get("max-threat", None)
+      depCatalog = nd._depCatalog
+      deps = depCatalog.queryDependencies(minThreat, maxThreat,
+        options.get("category", None), options.get("license", None),
+        options.get("app", None))
+      if "json" in options:
+        results = [depCatalog.describeDependency(dep.depString()) for dep in deps]
+        print(json.dumps(results, indent=2))
+      else:
+        for dep in deps:
+          ds = dep.depString()
+          threat, category, licString = depCatalog._indexKeys[ds]
+          print(f"{threat}\t{category}\t{licString}\t{ds}\t{', '.join(dep.getAppNames())}")
+        print(f"{len(deps)} dependencies")
+
+  if command == "search":
+    import search
+    nd = loadNexusData(options)
+    if loadCatalogs(nd, options):
+      index = search.DependencySearchIndex(nd._depCatalog)
+      records = index.searchRecords(options["text"], options.get("limit", 20))
+      if "json" in options:
+        print(json.dumps(records, indent=2))
+      else:
+        for record in records:
+          print(f"{record['score']:.2f}\t{record['threat']}\t{record['depString']}\t{', '.join(record['apps'])}")
+        print(f"{len(records)} matches")
+
+  if command == "diff":
+    import catalogdiff
+    oldNd = loadNexusData(options)
+    newNd = loadNexusData(options)
+    if loadCatalogFile(oldNd, options["old"]) and loadCatalogFile(newNd, options["new"]):
+      diff = catalogdiff.diffCatalogs(oldNd, newNd)
+      if "json" in options:
+        print(json.dumps(diff, indent=2))
+      else:
+        for appBranch in diff["addedApps"]:
+          print(f"+ app {appBranch}")
+        for appBranch in diff["removedApps"]:
+          print(f"- app {appBranch}")
+        for ds in diff["added"]:
+          print(f"+ {ds}")
+        for ds in diff["removed"]:
+          print(f"- {ds}")
+        for ds, field, oldValue, newValue in diff["changed"]:
+          print(f"~ {ds}: {field} {oldValue} => {newValue}")
+        for ds, removedApps, addedApps in diff["usage"]:
+          print(f"~ {ds}: apps -{removedApps} +{addedApps}")
+        print(f"{len(diff['addedApps'])} apps added, {len(diff['removedApps'])} apps removed, "
+          f"{len(diff['added'])} dependencies added, {len(diff['removed'])} removed, "
+          f"{len(diff['changed'])} changes, {len(diff['usage'])} with different apps")
+
+  if command == "bench":
+    import bench
+
+    def loadForBench():
+      nd = loadNexusData(options)
+      if not loadCatalogs(nd, options):
+        return None
+      return nd
+
+    timings = bench.runBenchmark(loadForBench, options.get("repeat", 5))
+    if timings:
+      print(bench.formatBenchmark(timings))
+      if "output" in options:
+        bench.saveBenchmark(timings, options["output"])
+
+  if command == "serve":
+    import server
+
+    # a reload mustn't exit the server, e.g. if the config file is being
+    # edited; the previous catalogs are kept instead
+    def loadForServer():
+      nd = loadNexusData(options, exitOnError=False)
+      if nd is None or not loadCatalogs(nd, options):
+        return None
+      return nd
+
+    # a new run replaces the snapshot or export; the compressed store is
+    # only reloaded on SIGHUP or POST /reload, since it changes throughout
+    # a run
+    watchFilename = options.get("load-snapshot", options.get("load-columnar", None))
+    catalogServer = server.CatalogServer(loadForServer, watchFilename,
+      options.get("poll", server.DEFAULT_POLL_SECONDS))
+    catalogServer.serve(options.get("host", "127.0.0.1"),
+      options.get("port", server.DEFAULT_PORT), options.get("socket", None))
+
+  if command == "reevaluate":
+    import httptools
+
+    nd = loadNexusData(options, network=True)
+    workers = options.get("workers", 4)
+    # start from the catalogs built by the last run; only the affected
+    # reports are fetched again
+    if not loadCatalogs(nd, options):
+      print(f"Couldn't load the catalogs from an earlier run; run fetch first.")
+      sys.exit(1)
+
+    depStrings = []
+    if "dep" in options:
+      depStrings.append(normalizeDepString(options["dep"]))
+    if "deps-file" in options:
+      with open(options["deps-file"], 'r') as f:
+        depStrings.extend(normalizeDepString(l) for l in f if l.strip())
+    if "needing-refresh" in options:
+      needing = nd._depCatalog.getDependenciesNeedingRefresh()
+      for ds in needing:
+        print(f"{ds}: status differs between reports: {nd._depCatalog.getAppStatuses(ds)}")
+      depStrings.extend(needing)
+
+    # only rate-limit the re-evaluations and the re-fetches that follow
+    httptools.configureRateLimit(options.get("rate", 5.0))
+    appBranches = nd.getAppsUsingDependencies(depStrings)
+    print(f"{len(appBranches)} reports contain the {len(depStrings)} given dependencies; re-evaluating...")
+    reevaluated = nd.reevaluateReports(appBranches, workers)
+    print(f"re-evaluated {len(reevaluated)} of {len(appBranches)} reports; getting updated license data...")
+    nd.refreshApps(reevaluated, workers)
+    createReports(nd)
+    remaining = nd._depCatalog.getDependenciesNeedingRefresh()
+    if remaining:
+      print(f"Warning: {len(remaining)} dependencies still have different statuses between reports: {remaining}")
+    httptools.printCacheStats()
+    print("Exiting.")
+
+  if command == "review-other":
+    import similarity
+    nd = loadNexusData(options)
+    if loadCatalogs(nd, options):
+      threshold = options.get("threshold", 0.5)
+      rows = similarity.reviewOtherLicenses(nd, threshold)
+      numClusters = len(set(r[0] for r in rows))
+      review_filename = options.get("output", f"{nd._reportsDir}/other-review.xlsx")
+      print(f"{len(rows)} license strings in Other, in {numClusters} clusters; writing review sheet to {review_filename}...")
+      createOtherLicensesReviewReport(review_filename, rows)
+
+  if command == "export":
+    import columnar
+    nd = loadNexusData(options)
+    if loadCatalogs(nd, options):
+      export_filename = options.get("output", f"{nd._reportsDir}/catalog.parquet")
+      if columnar.exportCatalog(nd, export_filename):
+        print(f"exported {len(nd._depCatalog._dependencies)} dependencies for {len(nd._appCatalog)} apps to {export_filename}")
+
+  if command == "import-json":
+    nd = loadNexusData(options)
+    if nd._store:
+      count = nd._store.importRawFiles(nd._jsonDir)
+      numBlobs, totalBytes = nd._store.getDiskUsage()
+      print(f"Imported {count} raw JSON files into {numBlobs} blobs ({totalBytes} bytes).")
+    else:
+      print(f"No compressed JSON store configured; set jsonStorage to \"compressed\".")
+
+  if command == "prune-store":
+    nd = loadNexusData(options)
+    if nd._store:
+      deleted, freedBytes = nd._store.prune()
+      numBlobs, totalBytes = nd._store.getDiskUsage()
+      print(f"Deleted {deleted} unreferenced blobs ({freedBytes} bytes); {numBlobs} blobs ({totalBytes} bytes) remain.")
+    else:
+      print(f"No compressed JSON store configured; set jsonStorage to \"compressed\".")
@@ -0,0 +1,94 @@
+# ndjsonwriter.py
+#
+# This module contains the NDJSONWriter class, which streams dependency
+# records and run events as newline-delimited JSON while a run is in
+# progress.
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import threading
+import time
+from pathlib import Path
+
+# One JSON object per line, each with an "event" key:
+#   dependency   => a dependency-version as it is folded into the catalog
+#                   for an app; written once per app using it, with that
+#                   app in "app", so consumers collect the full list of
+#                   apps from all the records for a depString
+#   app_fetched  => an app's license data was added to the catalog
+#   app_skipped  => an app had no license data
+#   run_summary  => totals at the end of the run
+# Every record also has a "time" key, in seconds since the epoch. The file
+# is flushed after each app_ or run_ record, i.e. once per app rather than
+# once per line, so consumers tailing it see each app's records together.
+
+# events after which the file is flushed
+FLUSH_EVENTS = {"app_fetched", "app_skipped", "run_summary"}
+
+class NDJSONWriter:
+
+  # arguments:
+  #   1) output filename
+  def __init__(self, filename):
+    super(NDJSONWriter, self).__init__()
+
+    self._filename = filename
+    self._lock = threading.Lock()
+    self._count = 0
+    Path(filename).parent.mkdir(parents=True, exist_ok=True)
+    self._f = open(filename, 'w', encoding='utf-8')
+
+  def writeEvent(self, event, **fields):
+    record = {"event": event, "time": time.time()}
+    record.update(fields)
+    line = json.dumps(record, separators=(",", ":"))
+    with self._lock:
+      self._f.write(line + "\n")
+      if event in FLUSH_EVENTS:
+        self._f.flush()
+      self._count = self._count + 1
+
+  # DependencyCatalog listener: write a record for a dependency-version
+  # that was just folded into the catalog.
+  # arguments:
+  #   1) depString
+  #   2) Dependency
+  #   3) name of the app that added it, or None
+  #   4) tuple (threat, category, license string) it is indexed under
+  def dependencyAdded(self, ds, dep, appName, indexKeys):
+    threat, category, licString = indexKeys
+    licenseInfo = dep.getBestLicenseInfo()
+    self.writeEvent("dependency",
+      depString=ds,
+      groupId=dep._groupId,
+      artifactId=dep._artifactId,
+      version=dep._version,
+      status=licenseInfo.status,
+      licenses=list(licenseInfo.licenses),
+      license=licString,
+      threat=threat,
+      category=category,
+      app=appName,
+    )
+
+  def getCount(self):
+    return self._count
+
+  def close(self):
+    with self._lock:
+      self._f.close()
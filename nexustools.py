@@ -19,10 +19,14 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import os
-import time
 
 import requests
 
+import httptools
+
+# size of chunks to write when streaming PDF reports to disk
+PDF_CHUNK_SIZE = 64 * 1024
+
 ########## NEXUS URL HELPER FUNCTIONS ##########
 
 # Build URL for retrieving a PDF report, without actually calling it.
@@ -43,6 +47,16 @@ def getNexusReportPDFURL(baseurl, appName, reportId):
 def getNexusLicenseJSONURL(baseurl, appPublicId, reportId):
   return f"{baseurl}/rest/report/{appPublicId}/{reportId}/browseReport/licenses.json"
 
+# Build URL for re-evaluating policies for an existing report, without
+# actually calling it.
+# arguments:
+#   1) base URL for Nexus IQ server
+#   2) application public ID
+#   3) report ID for this application
+# returns: URL for re-evaluating the report, or None if error.
+def getNexusReevaluateURL(baseurl, appPublicId, reportId):
+  return f"{baseurl}/rest/report/{appPublicId}/{reportId}/reevaluatePolicy"
+
 ########## NEXUS RETRIEVAL FUNCTIONS ##########
 
 # Logs into NexusIQ server, retrieves details about all applications on that
@@ -55,7 +69,7 @@ def getNexusLicenseJSONURL(baseurl, appPublicId, reportId):
 #   if error.
 def getNexusApplications(baseurl, username, password):
   auth = requests.auth.HTTPBasicAuth(username, password)
-  r = requests.get(f"{baseurl}/api/v2/applications", auth=auth)
+  r = httptools.get(f"{baseurl}/api/v2/applications", auth=auth)
   if r.status_code != 200:
     print(f"Error: Got invalid status code {r.status_code} from /applications call")
     return None
@@ -75,7 +89,7 @@ def getNexusApplications(baseurl, username, password):
 def getNexusApplicationJSON(baseurl, username, password, appId):
   auth = requests.auth.HTTPBasicAuth(username, password)
   url = f"{baseurl}/api/v2/reports/applications/{appId}"
-  r = requests.get(url, auth=auth)
+  r = httptools.get(url, auth=auth)
   if r.status_code != 200:
     print(f"Error: Got invalid status code {r.status_code} from /reports/applications/{appId} call")
     return None
@@ -83,7 +97,8 @@ def getNexusApplicationJSON(baseurl, username, password, appId):
   rj = r.json()
   return rj
 
-# Retrieve a Nexus IQ PDF report and write it out to disk.
+# Retrieve a Nexus IQ PDF report and write it out to disk, streaming it in
+# chunks rather than holding the whole report in memory.
 # arguments:
 #   1) base URL for Nexus IQ server
 #   2) user name
@@ -101,33 +116,39 @@ def getNexusReportPDF(baseurl, username, password, appName, reportId,
 
   # make API call
   auth = requests.auth.HTTPBasicAuth(username, password)
-  r = requests.get(url, auth=auth)
-  if r.status_code != 200:
-    print(f"Error: Got invalid status code {r.status_code} from PDF report retrieval call for {appName}")
-    return None
-
+  r = httptools.get(url, auth=auth, stream=True)
   try:
-    # write report data out to disk
-    with open(filename, 'wb') as f:
-      f.write(r.content)
+    if r.status_code != 200:
+      print(f"Error: Got invalid status code {r.status_code} from PDF report retrieval call for {appName}")
+      return None
+
+    # write report data out to a temp file, and only rename it into place
+    # once it is complete
+    tmpFilename = f"{filename}.part"
+    with open(tmpFilename, 'wb') as f:
+      for chunk in r.iter_content(chunk_size=PDF_CHUNK_SIZE):
+        httptools.checkDeadline()
+        f.write(chunk)
+    os.replace(tmpFilename, filename)
     return filename
 
   except Exception as e:
     print(f"Couldn't output PDF report to {filename}: {str(e)}")
     return None
 
-# Retrieve a Nexus IQ JSON license report and return it, optionally writing
-# it out to disk.
+  finally:
+    r.close()
+
+# Retrieve a Nexus IQ JSON license report as raw bytes, without parsing it.
 # arguments:
 #   1) base URL for Nexus IQ server
 #   2) user name
 #   3) user password
 #   4) appplication public ID
 #   5) report ID for this application
-#   6) optional: report filename path; None to skip writing to disk
-# returns: dict with JSON from NexusIQ server licenses.json call, or
-#   None if error.
-def getNexusLicenseJSON(baseurl, username, password, appPublicId, reportId, filename=None):
+# returns: bytes with the licenses.json payload, or None if error.
+def getNexusLicenseJSONContent(baseurl, username, password, appPublicId,
+  reportId):
   # get license JSON URL from helper
   url = getNexusLicenseJSONURL(baseurl, appPublicId, reportId)
   if not url:
@@ -135,25 +156,66 @@ def getNexusLicenseJSON(baseurl, username, password, appPublicId, reportId, file
 
   # make API call
   auth = requests.auth.HTTPBasicAuth(username, password)
-  r = requests.get(url, auth=auth)
+  r = httptools.get(url, auth=auth)
   if r.status_code != 200:
     print(f"Error: Got invalid status code {r.status_code} from JSON license data retrieval call for {appPublicId}")
     return None
 
+  return r.content
+
+# Save a raw Nexus IQ JSON license report to disk and/or into a JSONStore.
+# arguments:
+#   1) bytes with the licenses.json payload
+#   2) appplication public ID
+#   3) report ID for this application
+#   4) optional: report filename path; None to skip writing to disk
+#   5) optional: JSONStore to save the compressed data into; None to skip
+#   6) optional: key (branch ID) to use in the JSONStore
+# returns: True if successfully saved (or nothing to do), False if error.
+def saveNexusLicenseJSONContent(content, appPublicId, reportId,
+  filename=None, store=None, storeKey=None):
   # write the JSON data to disk if asked to do so
   if filename:
     try:
       # write report data out to disk
       with open(filename, 'wb') as f:
-        f.write(r.content)
+        f.write(content)
 
     except Exception as e:
       print(f"Couldn't output JSON license data to {filename}: {str(e)}")
-      return None
+      return False
 
-  # finally, return the JSON data
-  rj = r.json()
-  return rj
+  # or save it into the content-addressed store if asked to do so
+  if store:
+    try:
+      store.put(storeKey or appPublicId, content, reportId, appPublicId)
+
+    except Exception as e:
+      print(f"Couldn't store JSON license data for {appPublicId}: {str(e)}")
+      return False
+
+  return True
+
+# Ask Nexus IQ to re-evaluate an existing report against the current
+# policies and clearings, as the report's "Re-evaluate" button does.
+# arguments:
+#   1) base URL for Nexus IQ server
+#   2) user name
+#   3) user password
+#   4) appplication public ID
+#   5) report ID for this application
+# returns: True if Nexus IQ accepted the request, False if error.
+def reevaluateNexusReport(baseurl, username, password, appPublicId, reportId):
+  url = getNexusReevaluateURL(baseurl, appPublicId, reportId)
+  if not url:
+    return False
+
+  auth = requests.auth.HTTPBasicAuth(username, password)
+  r = httptools.post(url, auth=auth)
+  if r.status_code not in [200, 202, 204]:
+    print(f"Error: Got invalid status code {r.status_code} from re-evaluation call for {appPublicId}")
+    return False
+  return True
 
 ########## NEXUS PARSING FUNCTIONS ##########
 
@@ -212,7 +274,8 @@ def parseNexusApplicationJSONForReportID(appId, rj):
 # corresponding licenses for this application.
 # arguments:
 #   1) dict with JSON from NexusIQ server licenses.json API call
-#      typically obtained from getNexusLicenseJSON
+#      typically obtained by parsing the content returned by
+#      getNexusLicenseJSONContent
 # returns: list of tuples or empty list
 #   tuple format:    (component name, group name, version, licenses dict)
 #   licenses format: { "declared" => [list of license strings],
@@ -0,0 +1,147 @@
+# pipeline.py
+#
+# This module contains the LicensePipeline class, which overlaps fetching,
+# parsing and cataloging of app license data using bounded queues.
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import queue
+import threading
+
+from apps import FETCH_STATUS_MISSING
+
+# Stages:
+#   fetchers (N threads)  => fetched queue => parsers (M threads)
+#                         => parsed queue  => fold (calling thread)
+# The fetched and parsed queues are bounded, so that fetchers block rather
+# than piling up raw payloads when parsing or folding falls behind. Only
+# the calling thread touches the catalogs, and the catalog indexes are
+# kept up to date as each app is folded in, so reports can be created as
+# soon as the last app lands.
+#
+# Every stage passes on exactly one item per app, even when fetching or
+# parsing fails, so the fold stage knows when it has seen every app.
+#
+# Apps finish parsing in whatever order the threads get to them, but are
+# folded in the order given to run(), holding early arrivals until the
+# apps before them have been folded. When two reports disagree about a
+# dependency-version, the same one wins on every run, as with a serial
+# fetch.
+
+class LicensePipeline:
+
+  # arguments:
+  #   1) NexusData, providing fetchLicenseContent, parseLicenseContent,
+  #      foldLicenseData and replaceLicenseData
+  #   2) number of fetcher threads
+  #   3) number of parser threads
+  #   4) optional: maximum number of items waiting in each queue; defaults
+  #      to twice the number of fetchers
+  #   5) optional: True to always fetch from Nexus IQ, even if the stored
+  #      copy is for the same report
+  #   6) optional: True to replace apps' existing license data with
+  #      NexusData.replaceLicenseData, rather than adding to it
+  def __init__(self, nd, fetchWorkers, parseWorkers, queueSize=None,
+    force=False, replace=False):
+    super(LicensePipeline, self).__init__()
+
+    self._nd = nd
+    self._force = force
+    self._replace = replace
+    self._fetchWorkers = max(1, fetchWorkers)
+    self._parseWorkers = max(1, parseWorkers)
+    if queueSize is None:
+      queueSize = 2 * self._fetchWorkers
+    self._pending = queue.Queue()
+    self._fetched = queue.Queue(maxsize=queueSize)
+    self._parsed = queue.Queue(maxsize=queueSize)
+
+  def _fetch(self):
+    while True:
+      try:
+        index, appBranch = self._pending.get_nowait()
+      except queue.Empty:
+        return
+      try:
+        content, fetchStatus = self._nd.fetchLicenseContent(appBranch, self._force)
+      except Exception as e:
+        print(f"{appBranch}: error getting license data: {str(e)}")
+        content, fetchStatus = None, FETCH_STATUS_MISSING
+      self._fetched.put((index, appBranch, content, fetchStatus))
+
+  def _parse(self):
+    while True:
+      item = self._fetched.get()
+      if item is None:
+        return
+      index, appBranch, content, fetchStatus = item
+      try:
+        lic_rj = self._nd.parseLicenseContent(appBranch, content)
+      except Exception as e:
+        print(f"{appBranch}: error parsing license data: {str(e)}")
+        lic_rj = None
+      # drop the raw payload as soon as it's parsed
+      content = None
+      self._parsed.put((index, appBranch, lic_rj, fetchStatus))
+
+  # Fetch, parse and fold license data for the given apps.
+  # arguments:
+  #   1) list of app branch IDs, in the order to fold them into the catalogs
+  #   2) optional: the same app branch IDs in the order to fetch them, e.g.
+  #      longest expected fetch first; defaults to the fold order
+  # returns: number of apps whose license data was added to the catalogs
+  def run(self, appBranches, fetchOrder=None):
+    foldIndexes = {appBranch: i for i, appBranch in enumerate(appBranches)}
+    if fetchOrder is None:
+      fetchOrder = appBranches
+    for appBranch in fetchOrder:
+      self._pending.put((foldIndexes[appBranch], appBranch))
+
+    # daemon threads, so that an error in the fold stage can't leave the
+    # process waiting on stages blocked on a full queue
+    threads = []
+    for i in range(self._fetchWorkers):
+      threads.append(threading.Thread(target=self._fetch, name=f"fetch-{i}", daemon=True))
+    for i in range(self._parseWorkers):
+      threads.append(threading.Thread(target=self._parse, name=f"parse-{i}", daemon=True))
+    for t in threads:
+      t.start()
+
+    fold = self._nd.foldLicenseData
+    if self._replace:
+      fold = self._nd.replaceLicenseData
+    folded = 0
+    # fold index => parsed item, for apps that arrived before their turn
+    waiting = {}
+    nextIndex = 0
+    while nextIndex < len(appBranches):
+      index, appBranch, lic_rj, fetchStatus = self._parsed.get()
+      print(f"{appBranch}: got license data ({fetchStatus})")
+      waiting[index] = (appBranch, lic_rj, fetchStatus)
+      while nextIndex in waiting:
+        appBranch, lic_rj, fetchStatus = waiting.pop(nextIndex)
+        nextIndex = nextIndex + 1
+        with self._nd.phase("catalog-build"):
+          if fold(appBranch, lic_rj, fetchStatus):
+            folded = folded + 1
+
+    # every fetcher has finished by now; tell the parsers to stop
+    for i in range(self._parseWorkers):
+      self._fetched.put(None)
+    for t in threads:
+      t.join()
+    return folded
@@ -0,0 +1,157 @@
+# profiling.py
+#
+# This module contains the PhaseProfiler class, which optionally profiles
+# each phase of a run with cProfile and tracemalloc.
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import cProfile
+import io
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+# Phases may be entered many times (e.g., once per app); their profiles,
+# times and memory totals accumulate across entries. Phases must not be
+# nested, since only one cProfile profiler can be active at a time.
+#
+# Memory tracing costs a tracemalloc.get_traced_memory() call per entry,
+# for the net change and peak of traced memory. Allocation sites need two
+# full snapshots, so they are only taken for the first entry of each
+# phase; phases entered once per app stay cheap on large runs.
+#
+# Output files, for each phase:
+#   [phase].pstats         => cProfile stats, for use with pstats / snakeviz
+#   [phase].tracemalloc.txt => peak traced memory, net change in traced
+#                              memory across all entries, and top allocation
+#                              sites by net size during the first entry
+# and overall:
+#   summary.txt            => wall time per phase and hottest functions
+
+class PhaseProfiler:
+
+  def __init__(self, outputDir, profile=False, traceMemory=False, topN=25):
+    super(PhaseProfiler, self).__init__()
+
+    self._outputDir = outputDir
+    self._profile = profile
+    self._traceMemory = traceMemory
+    self._topN = topN
+    # phase name => cProfile.Profile
+    self._profiles = {}
+    # phase name => {allocation site => [size diff, count diff]}, for the
+    # phase's first entry
+    self._allocations = {}
+    # phase name => peak traced memory in bytes
+    self._peaks = {}
+    # phase name => tuple (net change in traced memory in bytes, entries)
+    self._netMemory = {}
+    # phase name => total wall time in seconds; kept in order of first entry
+    self._times = {}
+
+    if self._traceMemory and not tracemalloc.is_tracing():
+      tracemalloc.start()
+
+  @contextmanager
+  def phase(self, name):
+    prof = None
+    before = None
+    currentBefore = None
+    if self._traceMemory:
+      if name not in self._allocations:
+        self._allocations[name] = {}
+        before = tracemalloc.take_snapshot()
+      tracemalloc.reset_peak()
+      currentBefore, _ = tracemalloc.get_traced_memory()
+    if self._profile:
+      prof = self._profiles.get(name, None)
+      if prof is None:
+        prof = cProfile.Profile()
+        self._profiles[name] = prof
+      prof.enable()
+    start = time.perf_counter()
+
+    try:
+      yield
+
+    finally:
+      elapsed = time.perf_counter() - start
+      if prof:
+        prof.disable()
+      self._times[name] = self._times.get(name, 0.0) + elapsed
+      if currentBefore is not None:
+        current, peak = tracemalloc.get_traced_memory()
+        self._peaks[name] = max(self._peaks.get(name, 0), peak)
+        net, entries = self._netMemory.get(name, (0, 0))
+        self._netMemory[name] = (net + current - currentBefore, entries + 1)
+      if before is not None:
+        after = tracemalloc.take_snapshot()
+        allocations = self._allocations[name]
+        for stat in after.compare_to(before, "lineno"):
+          if stat.size_diff == 0 and stat.count_diff == 0:
+            continue
+          site = str(stat.traceback)
+          a = allocations.setdefault(site, [0, 0])
+          a[0] = a[0] + stat.size_diff
+          a[1] = a[1] + stat.count_diff
+
+  # Write out pstats and allocation files for each phase, plus a summary.
+  # returns: summary text
+  def finish(self):
+    Path(self._outputDir).mkdir(parents=True, exist_ok=True)
+
+    for name, prof in self._profiles.items():
+      prof.dump_stats(os.path.join(self._outputDir, f"{name}.pstats"))
+
+    for name, allocations in self._allocations.items():
+      top = sorted(allocations.items(), key=lambda kv: kv[1][0], reverse=True)
+      with open(os.path.join(self._outputDir, f"{name}.tracemalloc.txt"), 'w') as f:
+        net, entries = self._netMemory.get(name, (0, 0))
+        f.write(f"Peak traced memory: {self._peaks.get(name, 0) / 1024 / 1024:.1f} MiB\n")
+        f.write(f"Net change in traced memory over {entries} entries: {net / 1024 / 1024:.1f} MiB\n")
+        f.write(f"Top {self._topN} allocation sites by net size, first entry only:\n")
+        for site, (sizeDiff, countDiff) in top[:self._topN]:
+          f.write(f"{sizeDiff / 1024:12.1f} KiB {countDiff:10d} blocks  {site}\n")
+
+    out = io.StringIO()
+    out.write("Wall time per phase:\n")
+    for name, elapsed in self._times.items():
+      line = f"  {name:24s} {elapsed:10.2f} s"
+      if name in self._peaks:
+        line = line + f"  (peak {self._peaks[name] / 1024 / 1024:.1f} MiB)"
+      out.write(line + "\n")
+
+    if self._profiles:
+      # hottest functions by own time, across all phases
+      hottest = []
+      for name, prof in self._profiles.items():
+        stats = pstats.Stats(prof)
+        for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+          hottest.append((tt, ct, nc, name, pstats.func_std_string(func)))
+      hottest.sort(reverse=True)
+      out.write(f"\nTop {self._topN} functions by own time:\n")
+      out.write(f"  {'tottime':>9s} {'cumtime':>9s} {'ncalls':>9s}  phase / function\n")
+      for tt, ct, nc, name, func in hottest[:self._topN]:
+        out.write(f"  {tt:9.3f} {ct:9.3f} {nc:9d}  {name}: {func}\n")
+
+    summary = out.getvalue()
+    with open(os.path.join(self._outputDir, "summary.txt"), 'w') as f:
+      f.write(summary)
+    return summary
@@ -20,8 +20,8 @@
 # SPDX-License-Identifier: Apache-2.0
 
 from operator import itemgetter
-from xlsxwriter.workbook import Workbook
 
+from apps import FETCH_STATUS_STALE
 from categories import getCategoryForLicenseString
 from conversions import getConvertedLicenseString
 
@@ -49,11 +49,32 @@ def createCSVReport(nd, appName):
 def getRedDependencies(nd):
   return nd._depCatalog.getRedDependencies()
 
+# takes: (1) NexusData
+# returns: tuple of lists of app branches: (stale apps, missing apps)
+def getIncompleteApps(nd):
+  stale = []
+  missing = []
+  if nd._appCatalog:
+    for appBranch in nd._appCatalog.getIncompleteAppBranches():
+      if nd._appCatalog.getApp(appBranch).getFetchStatus() == FETCH_STATUS_STALE:
+        stale.append(appBranch)
+      else:
+        missing.append(appBranch)
+  return stale, missing
+
 def createRedReport(nd):
   print(f"Creating red dependency threat report...")
   try:
     filename = f"{nd._reportsDir}/RedDependencies.txt"
     with open (filename, 'w') as fout:
+      stale, missing = getIncompleteApps(nd)
+      if stale or missing:
+        fout.write(f"PARTIAL REPORT: license data for {len(stale) + len(missing)} apps is stale or missing.\n")
+        if stale:
+          fout.write(f"   -- Stale (from an earlier run): {stale}\n")
+        if missing:
+          fout.write(f"   -- Missing: {missing}\n")
+        fout.write("\n")
       redDeps = getRedDependencies(nd)
       for redDep in redDeps:
         (dep, licenseInfo) = redDep
@@ -73,43 +94,33 @@ def collectAllLicenses(nd):
   licCatalog = {}
   licCount = {}
 
-  for ds, dep in nd._depCatalog._dependencies.items():
-    # get license info for this dependency
-    licenseInfo = dep.getBestLicenseInfo()
-    if licenseInfo:
-      licString = " AND ".join(sorted(licenseInfo.licenses))
-      licString = getConvertedLicenseString(licString)
-      category = getCategoryForLicenseString(licString)
-    else:
-      licString = "NOT FOUND"
-      category = "Not found"
-
-    # if we've already seen this threat, check for this license
+  # the dependency catalog already keeps its dependencies indexed by
+  # converted license string, so just group those by category
+  depCatalog = nd._depCatalog
+  for licString, dss in depCatalog.getLicenseIndex().items():
+    category = getCategoryForLicenseString(licString)
     ld = licCatalog.get(category, None)
     if ld is None:
       ld = {}
       licCatalog[category] = ld
-
-    # within this threat, if we've already seen this license, add this dep
-    # to the list
-    dl = ld.get(licString, None)
-    if dl is not None:
-      dl.append(dep)
-    else:
-      ld[licString] = [dep]
-
-    # add to licCount if first instance or increment if already seen
-    licCount[licString] = licCount.get(licString, 0) + 1
+    ld[licString] = [depCatalog._dependencies[ds] for ds in dss]
+    licCount[licString] = len(dss)
 
   return licCatalog, licCount
 
-# takes: (1) NexusData, (2) filename for Excel file to create
+# takes: (1) NexusData, (2) filename for Excel file to create,
+#        (3) optional: results from collectAllLicenses, if already collected
 # returns: True if successfully created report, False otherwise
-def createExcelReportAllLicenses(nd, xlsx_filename):
-  licCatalog, licCount = collectAllLicenses(nd)
+def createExcelReportAllLicenses(nd, xlsx_filename, collected=None):
+  if collected is None:
+    collected = collectAllLicenses(nd)
+  licCatalog, licCount = collected
   #print(f"licCount = {licCount}")
 
   try:
+    # imported here, so that commands not writing Excel files don't pay
+    # for loading xlsxwriter
+    from xlsxwriter.workbook import Workbook
     with Workbook(xlsx_filename) as workbook:
 
       # prepare formats
@@ -158,6 +169,30 @@ def createExcelReportAllLicenses(nd, xlsx_filename):
       statsSheet.write(row, 1, "TOTAL", bold)
       statsSheet.write(row, 2, total, bold)
 
+      ##### APP STATUS PAGE #####
+
+      # flag a partial run on the stats page, and list each app's fetch
+      # status on its own page
+      stale, missing = getIncompleteApps(nd)
+      if stale or missing:
+        statsSheet.write(0, 4, f"PARTIAL REPORT: {len(stale)} apps stale, {len(missing)} apps missing; see App status", bold)
+
+      statusSheet = workbook.add_worksheet("App status")
+      statusSheet.write(0, 0, "App", bold)
+      statusSheet.write(0, 1, "Report ID", bold)
+      statusSheet.write(0, 2, "Status", bold)
+      statusSheet.set_column(0, 0, 58)
+      statusSheet.set_column(1, 1, 40)
+      statusSheet.set_column(2, 2, 14)
+      row = 1
+      if nd._appCatalog:
+        for appBranch in nd._appCatalog.getAllAppBranches():
+          app = nd._appCatalog.getApp(appBranch)
+          statusSheet.write(row, 0, appBranch, normal)
+          statusSheet.write(row, 1, app.getReportId() or "", normal)
+          statusSheet.write(row, 2, app.getFetchStatus() or "", normal)
+          row = row + 1
+
       ##### CATEGORY PAGES #####
 
       for threat, licdict in licCatalog.items():
@@ -199,3 +234,54 @@ def createExcelReportAllLicenses(nd, xlsx_filename):
   except Exception as e:
     print(f"Couldn't output Excel full listing to {xlsx_filename}: {str(e)}")
     return False
+
+# takes: (1) filename for Excel file to create, (2) rows from
+#        similarity.reviewOtherLicenses
+# returns: True if successfully created report, False otherwise
+def createOtherLicensesReviewReport(xlsx_filename, rows):
+  try:
+    from xlsxwriter.workbook import Workbook
+    with Workbook(xlsx_filename) as workbook:
+
+      # prepare formats
+      bold = workbook.add_format({'bold': True})
+      bold.set_font_size(16)
+      normal = workbook.add_format()
+      normal.set_font_size(14)
+      normal.set_text_wrap(True)
+      percent = workbook.add_format({'num_format': '0%'})
+      percent.set_font_size(14)
+
+      reviewSheet = workbook.add_worksheet("Other licenses")
+      headings = ["Cluster", "License", "# of deps", "Suggested category",
+        "Confidence", "Nearest categorized license", "Similarity",
+        "Reviewed category"]
+      for col, heading in enumerate(headings):
+        reviewSheet.write(0, col, heading, bold)
+      # set column widths
+      reviewSheet.set_column(0, 0, 10)
+      reviewSheet.set_column(1, 1, 70)
+      reviewSheet.set_column(2, 2, 10)
+      reviewSheet.set_column(3, 3, 24)
+      reviewSheet.set_column(4, 4, 12)
+      reviewSheet.set_column(5, 5, 70)
+      reviewSheet.set_column(6, 6, 12)
+      reviewSheet.set_column(7, 7, 24)
+      reviewSheet.freeze_panes(1, 0)
+
+      row = 1
+      for clusterNum, licString, numDeps, category, confidence, nearest, similarity in rows:
+        reviewSheet.write(row, 0, clusterNum, normal)
+        reviewSheet.write(row, 1, licString, normal)
+        reviewSheet.write(row, 2, numDeps, normal)
+        reviewSheet.write(row, 3, category, normal)
+        reviewSheet.write(row, 4, confidence, percent)
+        reviewSheet.write(row, 5, nearest, normal)
+        reviewSheet.write(row, 6, similarity, percent)
+        row = row + 1
+
+    return True
+
+  except Exception as e:
+    print(f"Couldn't output Other licenses review to {xlsx_filename}: {str(e)}")
+    return False
@@ -0,0 +1,144 @@
+# scheduler.py
+#
+# This module contains the FetchHistory class, which records how large each
+# app's license report was and how long it took to fetch, and uses that to
+# order the fetches of later runs.
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+import statistics
+import threading
+import time
+from pathlib import Path
+
+# History file layout:
+#   {branch: {"bytes": ..., "seconds": ..., "reportId": ..., "updated": ...}}
+# where "seconds" is smoothed across runs, so that one slow fetch doesn't
+# reorder everything on the next run.
+
+# weight given to the newest fetch time when smoothing
+SMOOTHING = 0.5
+
+class FetchHistory:
+
+  def __init__(self, filename):
+    super(FetchHistory, self).__init__()
+
+    self._filename = filename
+    self._entries = {}
+    self._lock = threading.Lock()
+    self._dirty = False
+    self._load()
+
+  def _load(self):
+    try:
+      with open(self._filename, 'r') as f:
+        self._entries = json.load(f)
+    except FileNotFoundError:
+      self._entries = {}
+    except json.decoder.JSONDecodeError as e:
+      print(f"Error parsing fetch history {self._filename}: {str(e)}; starting with an empty history")
+      self._entries = {}
+
+  def save(self):
+    with self._lock:
+      if not self._dirty:
+        return
+      Path(self._filename).parent.mkdir(parents=True, exist_ok=True)
+      tmpFilename = f"{self._filename}.tmp"
+      with open(tmpFilename, 'w') as f:
+        json.dump(self._entries, f, indent=2, sort_keys=True)
+      os.replace(tmpFilename, self._filename)
+      self._dirty = False
+
+  # Record one fetch of an app's license report. May be called from
+  # several fetch threads at once.
+  # arguments:
+  #   1) app branch ID
+  #   2) size of the report, in bytes
+  #   3) time taken to fetch it, in seconds
+  #   4) optional: report ID that was fetched
+  def record(self, branch, numBytes, seconds, reportId=None):
+    with self._lock:
+      entry = self._entries.get(branch, None)
+      if entry:
+        seconds = SMOOTHING * seconds + (1 - SMOOTHING) * entry["seconds"]
+      self._entries[branch] = {
+        "bytes": numBytes,
+        "seconds": seconds,
+        "reportId": reportId,
+        "updated": time.time(),
+      }
+      self._dirty = True
+
+  def getEntry(self, branch):
+    return self._entries.get(branch, None)
+
+  # returns: median fetch time per byte across all recorded apps, or None
+  #          if nothing has been recorded
+  def getMedianSecondsPerByte(self):
+    rates = [e["seconds"] / e["bytes"] for e in self._entries.values() if e["bytes"] > 0]
+    if not rates:
+      return None
+    return statistics.median(rates)
+
+  # returns: median fetch time across all recorded apps, or 0.0 if nothing
+  #          has been recorded
+  def getMedianSeconds(self):
+    if not self._entries:
+      return 0.0
+    return statistics.median(e["seconds"] for e in self._entries.values())
+
+  def _estimate(self, branch, sizeHint, rate, medianSeconds):
+    entry = self._entries.get(branch, None)
+    if entry:
+      return entry["seconds"]
+    if sizeHint and rate is not None:
+      return sizeHint * rate
+    return medianSeconds
+
+  # Estimate how long fetching an app's report will take: its recorded
+  # time if it has one; otherwise its expected size (e.g., from an earlier
+  # stored copy) times the median fetch rate; otherwise the median time.
+  # arguments:
+  #   1) app branch ID
+  #   2) optional: expected report size in bytes, for apps with no history
+  # returns: estimated fetch time in seconds
+  def estimateSeconds(self, branch, sizeHint=None):
+    return self._estimate(branch, sizeHint, self.getMedianSecondsPerByte(),
+      self.getMedianSeconds())
+
+  # Order app branches longest expected fetch first (LPT scheduling), so
+  # that the largest reports don't start last and stretch the run when
+  # fetching in parallel. Ties are broken by branch name.
+  # arguments:
+  #   1) list of app branch IDs
+  #   2) optional: function mapping branch ID => expected size in bytes or
+  #      None, used for apps with no history
+  # returns: list of app branch IDs in fetch order
+  def orderForFetch(self, branches, getSizeHint=None):
+    rate = self.getMedianSecondsPerByte()
+    medianSeconds = self.getMedianSeconds()
+    estimates = {}
+    for branch in branches:
+      sizeHint = None
+      if getSizeHint and branch not in self._entries:
+        sizeHint = getSizeHint(branch)
+      estimates[branch] = self._estimate(branch, sizeHint, rate, medianSeconds)
+    return sorted(branches, key=lambda b: (-estimates[b], b))
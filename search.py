@@ -0,0 +1,315 @@
+# search.py
+#
+# This module contains the DependencySearchIndex class, which finds
+# dependency-versions by prefixes of, or near misses for, their group,
+# artifact or component names, without scanning the whole catalog.
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import heapq
+import re
+from bisect import bisect_left, bisect_right
+
+# Each dependency-version is indexed under lowercased terms: its groupId,
+# its artifactId (which holds the name for components identified by
+# componentIdentifier rather than Maven coordinates), "groupId:artifactId",
+# and the words in each of those, split on ".", ":", "_", "-" and "/".
+#
+# Prefix queries use a sorted array of the distinct terms, so finding the
+# terms that start with a prefix is a binary search plus a walk over just
+# those terms. Typo-tolerant queries use an index from each trigram to the
+# terms containing it, and score terms by the Dice coefficient of their
+# trigram sets.
+#
+# Query words that start with a digit are taken as version prefixes. Words
+# of the form "group:artifact:version", "group:artifact" or
+# "artifact:version" are split into their parts. Every other word must
+# match each result, by prefix or approximately. Approximate matches are
+# only looked for when prefix matches alone give fewer results than were
+# asked for, and only for words that aren't themselves terms, since they
+# always rank below prefix matches. Each word's matches are intersected in
+# full before ranking, so a broad word like "org" never hides a result.
+#
+# Ranking a broad query like "o" or "2.1" must not cost a Python call per
+# matching dependency. Dependencies are numbered in tie-break order
+# (highest threat first, then by depString), and each word's matches are
+# split into sets by how they score, using sorted arrays of the artifactIds,
+# groupIds, "groupId:artifactId"s and versions. The candidates are then
+# partitioned by total score with set operations, and the results are the
+# lowest numbers in the best-scoring parts.
+
+# scores for how a query word matches a dependency, best first; approximate
+# matches score FUZZY_WEIGHT times their trigram similarity
+SCORE_EXACT_ARTIFACT = 1.0
+SCORE_ARTIFACT_PREFIX = 0.9
+SCORE_GROUP_PREFIX = 0.8
+SCORE_WORD_PREFIX = 0.7
+FUZZY_WEIGHT = 0.6
+
+# minimum trigram similarity for an approximate match
+DEFAULT_MIN_SIMILARITY = 0.4
+
+_wordSeparators = re.compile(r"[.:_\-/]+")
+
+def _trigrams(term):
+  padded = f"  {term} "
+  return set(padded[i:i+3] for i in range(len(padded) - 2))
+
+# takes: (1) list of strings
+# returns: tuple (sorted list of the strings, list of their indexes in the
+#          same order), for _startingWith and _equalTo
+def _sortedColumn(values):
+  order = sorted(range(len(values)), key=values.__getitem__)
+  return [values[i] for i in order], order
+
+# returns: list of indexes of the values in the column starting with prefix
+def _startingWith(column, prefix):
+  values, indexes = column
+  # every string starting with prefix sorts before prefix with its last
+  # character incremented
+  end = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+  return indexes[bisect_left(values, prefix):bisect_left(values, end)]
+
+# returns: list of indexes of the values in the column equal to value
+def _equalTo(column, value):
+  values, indexes = column
+  return indexes[bisect_left(values, value):bisect_right(values, value)]
+
+# takes: (1) Dependency
+# returns: set of lowercased terms it is indexed under
+def getCoordinateTerms(dep):
+  groupId = (dep._groupId or "").lower()
+  artifactId = (dep._artifactId or "").lower()
+  terms = set()
+  for value in [groupId, artifactId]:
+    if value:
+      terms.add(value)
+      terms.update(w for w in _wordSeparators.split(value) if w)
+  if groupId and artifactId:
+    terms.add(f"{groupId}:{artifactId}")
+  return terms
+
+# Split a query into name words and version prefixes.
+# returns: tuple (list of lowercased name words, list of version prefixes)
+def parseSearchQuery(text):
+  words = []
+  versions = []
+  for token in text.lower().split():
+    parts = [p for p in token.split(":") if p]
+    if len(parts) >= 3:
+      # group:artifact:version
+      words.append(f"{parts[0]}:{parts[1]}")
+      versions.append(parts[2])
+      continue
+    if len(parts) == 2 and parts[1][0].isdigit():
+      # artifact:version
+      words.append(parts[0])
+      versions.append(parts[1])
+      continue
+    if len(parts) == 2:
+      # group:artifact
+      words.append(f"{parts[0]}:{parts[1]}")
+      continue
+    if parts and parts[0][0].isdigit():
+      versions.append(parts[0])
+    elif parts:
+      words.append(parts[0])
+  return words, versions
+
+class DependencySearchIndex:
+
+  # arguments:
+  #   1) DependencyCatalog to index; the index doesn't follow later
+  #      changes to it, so build a new one after the catalog changes
+  def __init__(self, depCatalog):
+    super(DependencySearchIndex, self).__init__()
+
+    self._depCatalog = depCatalog
+    # in tie-break order, so that the lower index ranks first among
+    # dependencies with the same score
+    indexKeys = depCatalog._indexKeys
+    def tieBreak(ds):
+      threat = indexKeys[ds][0]
+      return (1 if threat is None else -threat, ds)
+    self._depStrings = sorted(depCatalog._dependencies.keys(), key=tieBreak)
+    groupIds = []
+    artifactIds = []
+    versions = []
+    termDeps = {}
+    for i, ds in enumerate(self._depStrings):
+      dep = depCatalog._dependencies[ds]
+      groupIds.append((dep._groupId or "").lower())
+      artifactIds.append((dep._artifactId or "").lower())
+      versions.append((dep._version or "").lower())
+      for term in getCoordinateTerms(dep):
+        termDeps.setdefault(term, []).append(i)
+    # lowercased names and versions, sorted, with the index of each
+    self._groupIds = _sortedColumn(groupIds)
+    self._artifactIds = _sortedColumn(artifactIds)
+    self._coords = _sortedColumn(
+      [f"{g}:{a}" for g, a in zip(groupIds, artifactIds)])
+    self._versions = _sortedColumn(versions)
+    # sorted distinct terms, and the indexes into _depStrings for each
+    self._terms = sorted(termDeps.keys())
+    self._termDeps = [termDeps[t] for t in self._terms]
+    # trigram => list of indexes into _terms
+    self._trigramTerms = {}
+    self._termTrigramCounts = []
+    for t, term in enumerate(self._terms):
+      trigrams = _trigrams(term)
+      self._termTrigramCounts.append(len(trigrams))
+      for trigram in trigrams:
+        self._trigramTerms.setdefault(trigram, []).append(t)
+
+  def __len__(self):
+    return len(self._depStrings)
+
+  def _isTerm(self, word):
+    t = bisect_left(self._terms, word)
+    return t < len(self._terms) and self._terms[t] == word
+
+  # returns: set of dependency indexes with a term starting with prefix
+  def _prefixMatches(self, prefix):
+    matches = set()
+    t = bisect_left(self._terms, prefix)
+    while t < len(self._terms) and self._terms[t].startswith(prefix):
+      matches.update(self._termDeps[t])
+      t = t + 1
+    return matches
+
+  # returns: dict of {dependency index => best trigram similarity} for
+  #          dependencies with a term at least minSimilarity similar to word;
+  #          if wanted is given, stops after the terms as similar as the one
+  #          that brings the count to wanted
+  def _fuzzyMatches(self, word, minSimilarity, wanted=None):
+    trigrams = _trigrams(word)
+    shared = {}
+    for trigram in trigrams:
+      for t in self._trigramTerms.get(trigram, []):
+        shared[t] = shared.get(t, 0) + 1
+    similarTerms = []
+    for t, n in shared.items():
+      similarity = 2 * n / (len(trigrams) + self._termTrigramCounts[t])
+      if similarity >= minSimilarity:
+        similarTerms.append((similarity, t))
+    similarTerms.sort(reverse=True)
+
+    matches = {}
+    for similarity, t in similarTerms:
+      if wanted is not None and len(matches) >= wanted and similarity < lastSimilarity:
+        break
+      lastSimilarity = similarity
+      for i in self._termDeps[t]:
+        if i not in matches:
+          matches[i] = similarity
+    return matches
+
+  # returns: list of tuples (score, set of dependency indexes) for how the
+  #          word matches, best first; a dependency scores by the first set
+  #          it is in
+  def _scoreTiers(self, word, prefixMatches, fuzzy):
+    exact = set(_equalTo(self._artifactIds, word))
+    exact.update(_equalTo(self._coords, word))
+    groupPrefix = set(_startingWith(self._groupIds, word))
+    groupPrefix.update(_startingWith(self._coords, word))
+    tiers = [
+      (SCORE_EXACT_ARTIFACT, prefixMatches.intersection(exact)),
+      (SCORE_ARTIFACT_PREFIX,
+        prefixMatches.intersection(_startingWith(self._artifactIds, word))),
+      (SCORE_GROUP_PREFIX, prefixMatches.intersection(groupPrefix)),
+      (SCORE_WORD_PREFIX, prefixMatches),
+    ]
+    bySimilarity = {}
+    for i, similarity in fuzzy.items():
+      bySimilarity.setdefault(similarity, set()).add(i)
+    for similarity in sorted(bySimilarity, reverse=True):
+      tiers.append((FUZZY_WEIGHT * similarity, bySimilarity[similarity]))
+    return tiers
+
+  # returns: set of indexes of the dependencies matching every word, by
+  #          prefix or approximately, and starting with every version
+  def _matchAll(self, wordMatches, versions):
+    sets = [prefixMatches.union(fuzzy.keys()) for prefixMatches, fuzzy in wordMatches]
+    sets.extend(set(_startingWith(self._versions, v)) for v in versions)
+    # intersect starting from the smallest set
+    sets.sort(key=len)
+    return sets[0].intersection(*sets[1:])
+
+  # Find the dependency-versions best matching the query.
+  # arguments:
+  #   1) query text, e.g. "log4j-core 2.14", "org.apache.logging",
+  #      "commons-lang3:3.12.0" or "jackson-databnd"
+  #   2) optional: maximum number of results
+  #   3) optional: minimum trigram similarity for approximate matches
+  # returns: list of tuples (score, depString), best first; ties go to the
+  #          higher threat, then by depString
+  def search(self, text, limit=20, minSimilarity=DEFAULT_MIN_SIMILARITY):
+    words, versions = parseSearchQuery(text)
+    if not words and not versions:
+      return []
+
+    # tuple (prefix matches, approximate matches) for each word
+    wordMatches = [(self._prefixMatches(word), {}) for word in words]
+    candidates = self._matchAll(wordMatches, versions)
+    if len(candidates) < limit and not all(self._isTerm(w) for w in words):
+      # a single word's most similar terms give its best results, as long
+      # as no other words or versions narrow them down afterwards
+      wanted = None
+      if len(words) == 1 and not versions:
+        wanted = limit + len(wordMatches[0][0])
+      wordMatches = [(prefixMatches, {} if self._isTerm(word) else
+        self._fuzzyMatches(word, minSimilarity, wanted))
+        for word, (prefixMatches, fuzzy) in zip(words, wordMatches)]
+      candidates = self._matchAll(wordMatches, versions)
+
+    if not words:
+      return [(SCORE_EXACT_ARTIFACT, self._depStrings[i])
+        for i in heapq.nsmallest(limit, candidates)]
+
+    # partition the candidates by their total score over the words so far
+    totals = {0: candidates}
+    for word, (prefixMatches, fuzzy) in zip(words, wordMatches):
+      tiers = self._scoreTiers(word, prefixMatches, fuzzy)
+      nextTotals = {}
+      for total, part in totals.items():
+        for score, tier in tiers:
+          matched = part.intersection(tier)
+          if matched:
+            nextTotals.setdefault(total + score, set()).update(matched)
+            part = part.difference(matched)
+            if not part:
+              break
+      totals = nextTotals
+
+    results = []
+    for total in sorted(totals, reverse=True):
+      if len(results) >= limit:
+        break
+      score = total / len(words)
+      results.extend((score, self._depStrings[i])
+        for i in heapq.nsmallest(limit - len(results), totals[total]))
+    return results
+
+  # Like search, but returns a record for each result with its apps and
+  # threat, from DependencyCatalog.describeDependency plus a "score".
+  def searchRecords(self, text, limit=20, minSimilarity=DEFAULT_MIN_SIMILARITY):
+    records = []
+    for score, ds in self.search(text, limit, minSimilarity):
+      record = self._depCatalog.describeDependency(ds)
+      record["score"] = round(score, 3)
+      records.append(record)
+    return records
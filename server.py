@@ -0,0 +1,315 @@
+# server.py
+#
+# This module contains the CatalogServer class, a long-lived local server
+# that keeps the app and dependency catalogs in memory and answers queries
+# over HTTP, reloading them when a new run finishes.
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+import signal
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from deps import normalizeDepString
+from search import DependencySearchIndex
+
+# API (all responses are JSON):
+#   GET  /status                   => when and from what the catalogs loaded
+#   GET  /dependencies?[criteria]  => dependencies matching all of minThreat,
+#                                     maxThreat, category, license and app
+#   GET  /dependency?dep=g:a:v     => one dependency-version, with the
+#                                     status reported in each app
+#   GET  /apps                     => all apps, with report ID and status
+#   GET  /app?branch=BRANCH        => one app, with its dependencies
+#   GET  /categories               => number of dependencies per category
+#   GET  /search?q=TEXT&limit=N    => dependency-versions best matching TEXT
+#                                     by name prefix or approximately
+#   POST /reload                   => reload the catalogs now
+# Errors are returned as {"error": message} with a 4xx or 5xx status.
+#
+# Each request works on whichever catalogs were current when it started.
+# A reload builds new catalogs on the side and then swaps them in as a
+# single reference, so queries never see a half-loaded catalog.
+
+DEFAULT_PORT = 8765
+DEFAULT_POLL_SECONDS = 5
+
+class QueryError(Exception):
+
+  def __init__(self, status, message):
+    super(QueryError, self).__init__(message)
+    self.status = status
+
+class CatalogServer:
+
+  # arguments:
+  #   1) function returning a newly loaded NexusData, or None if it
+  #      couldn't be loaded
+  #   2) optional: file to watch (e.g. the snapshot written by each run);
+  #      the catalogs are reloaded whenever its modification time changes
+  #   3) optional: how often to check the watched file, in seconds
+  def __init__(self, loadNexusData, watchFilename=None,
+    pollSeconds=DEFAULT_POLL_SECONDS):
+    super(CatalogServer, self).__init__()
+
+    self._loadNexusData = loadNexusData
+    self._watchFilename = watchFilename
+    self._pollSeconds = pollSeconds
+    # tuple (NexusData, load time, watched file's mtime, search index),
+    # swapped as a whole
+    self._state = None
+    self._reloadLock = threading.Lock()
+    self._reloadRequested = threading.Event()
+    self._stopping = threading.Event()
+    self._routes = {
+      ("GET", "/status"): self._getStatus,
+      ("GET", "/dependencies"): self._getDependencies,
+      ("GET", "/dependency"): self._getDependency,
+      ("GET", "/apps"): self._getApps,
+      ("GET", "/app"): self._getApp,
+      ("GET", "/categories"): self._getCategories,
+      ("GET", "/search"): self._getSearch,
+      ("POST", "/reload"): self._postReload,
+    }
+
+  def _getWatchedMtime(self):
+    if not self._watchFilename:
+      return None
+    try:
+      return os.path.getmtime(self._watchFilename)
+    except OSError:
+      return None
+
+  # Load the catalogs and swap them in; on failure, including any error
+  # raised while loading, keep serving the current ones.
+  # returns: True if reloaded, False otherwise
+  def reload(self):
+    with self._reloadLock:
+      mtime = self._getWatchedMtime()
+      start = time.perf_counter()
+      try:
+        nd = self._loadNexusData()
+        if nd is not None:
+          searchIndex = DependencySearchIndex(nd._depCatalog)
+      except Exception as e:
+        print(f"Error loading catalogs: {str(e)}")
+        nd = None
+      if nd is None:
+        print(f"Couldn't load catalogs; still serving the previous ones.")
+        return False
+      self._state = (nd, time.time(), mtime, searchIndex)
+      print(f"loaded {len(nd._depCatalog._dependencies)} dependencies for {len(nd._appCatalog)} apps in {time.perf_counter() - start:.2f}s")
+      return True
+
+  # Ask the watcher thread to reload, e.g. from a SIGHUP handler.
+  def requestReload(self):
+    self._reloadRequested.set()
+
+  def _watch(self):
+    while not self._stopping.is_set():
+      requested = self._reloadRequested.wait(self._pollSeconds)
+      self._reloadRequested.clear()
+      if self._stopping.is_set():
+        return
+      state = self._state
+      mtime = self._getWatchedMtime()
+      changed = mtime is not None and (state is None or mtime != state[2])
+      if requested or changed:
+        self.reload()
+
+  ##### query handlers #####
+  # each takes the current NexusData and a dict of query parameters, and
+  # returns an object to send back as JSON
+
+  def _getStatus(self, nd, params):
+    state = self._state
+    return {
+      "loadedAt": state[1] if state[0] is nd else None,
+      "watchedFile": self._watchFilename,
+      "apps": len(nd._appCatalog),
+      "dependencies": len(nd._depCatalog._dependencies),
+    }
+
+  def _getDependencies(self, nd, params):
+    try:
+      minThreat = int(params["minThreat"]) if "minThreat" in params else None
+      maxThreat = int(params["maxThreat"]) if "maxThreat" in params else None
+    except ValueError:
+      raise QueryError(400, "minThreat and maxThreat must be integers")
+    depCatalog = nd._depCatalog
+    deps = depCatalog.queryDependencies(minThreat, maxThreat,
+      params.get("category", None), params.get("license", None),
+      params.get("app", None))
+    return [depCatalog.describeDependency(dep.depString()) for dep in deps]
+
+  def _getDependency(self, nd, params):
+    if "dep" not in params:
+      raise QueryError(400, "missing dep parameter, e.g. dep=group:artifact:version")
+    ds = normalizeDepString(params["dep"])
+    record = nd._depCatalog.describeDependency(ds)
+    if record is None:
+      raise QueryError(404, f"{ds} not found")
+    record["appStatuses"] = nd._depCatalog.getAppStatuses(ds)
+    return record
+
+  def _describeApp(self, app):
+    return {
+      "branch": app._branchId,
+      "name": app._name,
+      "reportId": app._reportId,
+      "fetchStatus": app._fetchStatus,
+      "target": app._target,
+      "dependencies": len(app._dependencies),
+    }
+
+  def _getApps(self, nd, params):
+    return [self._describeApp(nd._appCatalog.getApp(b))
+      for b in nd._appCatalog.getAllAppBranches()]
+
+  def _getApp(self, nd, params):
+    if "branch" not in params:
+      raise QueryError(400, "missing branch parameter")
+    app = nd._appCatalog.getApp(params["branch"])
+    if not app:
+      raise QueryError(404, f"app {params['branch']} not found")
+    record = self._describeApp(app)
+    depCatalog = nd._depCatalog
+    record["dependencies"] = [depCatalog.describeDependency(dep.depString())
+      for dep in depCatalog.queryDependencies(appName=app._branchId)]
+    return record
+
+  def _getCategories(self, nd, params):
+    return {category: len(nd._depCatalog.getDependenciesByCategory(category))
+      for category in nd._depCatalog.getCategories()}
+
+  def _getSearch(self, nd, params):
+    if not params.get("q", "").strip():
+      raise QueryError(400, "missing q parameter, e.g. q=log4j-core 2.14")
+    try:
+      limit = int(params.get("limit", "20"))
+    except ValueError:
+      raise QueryError(400, "limit must be an integer")
+    state = self._state
+    # if a reload swapped in new catalogs since this request started, index
+    # the ones it is using
+    searchIndex = state[3] if state[0] is nd else DependencySearchIndex(nd._depCatalog)
+    return searchIndex.searchRecords(params["q"], limit)
+
+  def _postReload(self, nd, params):
+    if not self.reload():
+      raise QueryError(500, "reload failed; still serving the previous catalogs")
+    return self._getStatus(self._state[0], params)
+
+  # returns: tuple (HTTP status, object to send back as JSON)
+  def handle(self, method, url):
+    parts = urlsplit(url)
+    handler = self._routes.get((method, parts.path.rstrip("/") or "/"), None)
+    if not handler:
+      return 404, {"error": f"no such endpoint: {method} {parts.path}"}
+    params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+    # take the current catalogs once, so a reload during this request
+    # doesn't change them part-way through
+    nd = self._state[0]
+    try:
+      return 200, handler(nd, params)
+    except QueryError as e:
+      return e.status, {"error": str(e)}
+
+  # Load the catalogs, then serve queries until interrupted. Reloads on
+  # SIGHUP, on POST /reload, and when the watched file changes.
+  # arguments:
+  #   1) optional: host to listen on
+  #   2) optional: port to listen on
+  #   3) optional: Unix socket path to listen on instead of host / port
+  # returns: False if the catalogs couldn't be loaded at startup
+  def serve(self, host="127.0.0.1", port=DEFAULT_PORT, socketPath=None):
+    if not self.reload():
+      return False
+
+    if socketPath:
+      if os.path.exists(socketPath):
+        os.remove(socketPath)
+      httpd = _UnixHTTPServer(socketPath, _QueryHandler)
+      where = socketPath
+    else:
+      httpd = ThreadingHTTPServer((host, port), _QueryHandler)
+      where = f"http://{host}:{httpd.server_address[1]}/"
+    httpd.catalogServer = self
+
+    if hasattr(signal, "SIGHUP"):
+      signal.signal(signal.SIGHUP, lambda signum, frame: self.requestReload())
+    signal.signal(signal.SIGTERM, _stopServing)
+    watcher = threading.Thread(target=self._watch, name="catalog-watcher", daemon=True)
+    watcher.start()
+
+    print(f"serving queries on {where}")
+    try:
+      httpd.serve_forever()
+    except KeyboardInterrupt:
+      pass
+    finally:
+      self._stopping.set()
+      self._reloadRequested.set()
+      httpd.server_close()
+      if socketPath and os.path.exists(socketPath):
+        os.remove(socketPath)
+    return True
+
+# SIGTERM handler: stop serving the same way as Ctrl-C does, so that the
+# Unix socket is cleaned up
+def _stopServing(signum, frame):
+  raise KeyboardInterrupt()
+
+class _QueryHandler(BaseHTTPRequestHandler):
+
+  def _respond(self, method):
+    status, obj = self.server.catalogServer.handle(method, self.path)
+    body = json.dumps(obj).encode("utf-8")
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def do_GET(self):
+    self._respond("GET")
+
+  def do_POST(self):
+    self._respond("POST")
+
+  # Unix socket clients have no address
+  def address_string(self):
+    if isinstance(self.client_address, tuple) and self.client_address:
+      return self.client_address[0]
+    return "local"
+
+  def log_message(self, format, *args):
+    pass
+
+class _UnixHTTPServer(ThreadingHTTPServer):
+  address_family = socket.AF_UNIX
+
+  # HTTPServer.server_bind expects a (host, port) address
+  def server_bind(self):
+    self.socket.bind(self.server_address)
+    self.server_name = "localhost"
+    self.server_port = 0
@@ -0,0 +1,182 @@
+# shards.py
+#
+# This module contains functions for splitting a run across several worker
+# processes or hosts, and for merging their partial results back together.
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+import zlib
+from pathlib import Path
+
+# version 1 shards held only each worker's merged dependency records, so
+# merging them didn't match a single run; they are refused
+SHARD_FORMAT_VERSION = 2
+
+# A shard file holds, for each of the worker's apps, the component records
+# exactly as that app reported them, as indexes into a shared "records"
+# list (identical records seen by consecutive apps are stored once). The
+# merge step replays every app's records, across all shards, in sorted
+# branch order with DependencyCatalog.addDependency(update=True), which
+# is the order a single run folds them in; so the merged catalogs, each
+# app's clearing statuses and the changed dependencies all come out as
+# they would from one run, whatever the number of shards.
+
+# takes: (1) app branch ID, (2) total number of shards
+# returns: shard index in range [0, shardCount) for this branch. Uses CRC32
+#          rather than hash() so every worker and host computes the same
+#          partition.
+def shardForBranch(branch, shardCount):
+  return zlib.crc32(branch.encode("utf-8")) % shardCount
+
+# takes: (1) string in the form "i/N", e.g. "2/8"
+# returns: tuple (shardIndex, shardCount), or None if invalid
+def parseShardSpec(spec):
+  try:
+    index, count = spec.split("/", maxsplit=1)
+    index = int(index)
+    count = int(count)
+  except ValueError:
+    return None
+  if count < 1 or index < 0 or index >= count:
+    return None
+  return (index, count)
+
+def getShardFilename(shardsDir, shardIndex, shardCount):
+  return os.path.join(shardsDir, f"shard-{shardIndex}-of-{shardCount}.json")
+
+# Collects each app's own component records as they are folded into a
+# worker's catalog; the catalog only keeps the last record seen for each
+# dependency-version.
+class ShardRecorder:
+
+  def __init__(self):
+    super(ShardRecorder, self).__init__()
+
+    # component records, as from Dependency.toDict
+    self._records = []
+    # depString => index in _records of the latest record for it
+    self._latestRecords = {}
+    # app branch ID => list of indexes in _records, in the order added
+    self._appRecords = {}
+
+  # DependencyCatalog listener: once addDependency(update=True) returns,
+  # the Dependency holds exactly the record the app reported.
+  # arguments:
+  #   1) depString
+  #   2) Dependency
+  #   3) name of the app that added it, or None
+  #   4) tuple (threat, category, license string) it is indexed under
+  def dependencyAdded(self, ds, dep, appName, indexKeys):
+    if not appName:
+      return
+    recordIndex = self._latestRecords.get(ds, None)
+    if recordIndex is None or not dep.matchesDict(self._records[recordIndex]):
+      recordIndex = len(self._records)
+      self._records.append(dep.toDict())
+      self._latestRecords[ds] = recordIndex
+    self._appRecords.setdefault(appName, []).append(recordIndex)
+
+# Write the apps handled by one worker, with each app's component records,
+# out to a shard file.
+# arguments:
+#   1) NexusData for this worker
+#   2) ShardRecorder that was listening to its dependency catalog
+#   3) shard file path
+#   4) shard index
+#   5) total number of shards
+# returns: filename if successfully written, or None if error.
+def writeShard(nd, recorder, filename, shardIndex, shardCount):
+  apps = []
+  for appBranch in nd._appCatalog.getAllAppBranches():
+    appDict = nd._appCatalog.getApp(appBranch).toDict()
+    del appDict["dependencies"]
+    appDict["records"] = recorder._appRecords.get(appBranch, [])
+    apps.append(appDict)
+
+  shard = {
+    "version": SHARD_FORMAT_VERSION,
+    "shardIndex": shardIndex,
+    "shardCount": shardCount,
+    "organizationId": nd._orgId,
+    "apps": apps,
+    "records": recorder._records,
+    "changedDeps": sorted(nd._depCatalog._changedDeps),
+  }
+
+  try:
+    Path(filename).parent.mkdir(parents=True, exist_ok=True)
+    tmpFilename = f"{filename}.tmp"
+    with open(tmpFilename, 'w') as f:
+      json.dump(shard, f)
+    os.replace(tmpFilename, filename)
+    return filename
+
+  except Exception as e:
+    print(f"Couldn't output shard to {filename}: {str(e)}")
+    return None
+
+# Merge shard files into the given NexusData, giving the same catalogs as
+# a single run over all of their apps.
+# arguments:
+#   1) NexusData to merge into
+#   2) list of shard file paths
+# returns: number of shards merged
+def mergeShards(nd, filenames):
+  merged = 0
+  # app branch ID => tuple (app dict, shard's records list)
+  apps = {}
+  changedDeps = set()
+  for filename in sorted(filenames):
+    try:
+      with open(filename, 'r') as f:
+        shard = json.load(f)
+    except (OSError, json.decoder.JSONDecodeError) as e:
+      print(f"Couldn't load shard {filename}: {str(e)}; skipping")
+      continue
+
+    if shard.get("version", None) != SHARD_FORMAT_VERSION:
+      print(f"Shard {filename} has unsupported version {shard.get('version', None)}; re-run its worker with this version; skipping")
+      continue
+
+    records = shard.get("records", [])
+    for appDict in shard.get("apps", []):
+      apps[appDict["branchId"]] = (appDict, records)
+    changedDeps.update(shard.get("changedDeps", []))
+    merged = merged + 1
+
+  for appBranch in sorted(apps.keys()):
+    appDict, records = apps[appBranch]
+    nd._appCatalog.addApp(appDict["name"], appDict["appId"], appBranch,
+      appDict["reportId"], appDict.get("target", ""))
+    app = nd._appCatalog.getApp(appBranch)
+    app.setFetchStatus(appDict.get("fetchStatus", None))
+    for recordIndex in appDict.get("records", []):
+      ds = nd._depCatalog.addDependency(records[recordIndex],
+        appName=appBranch, update=True)
+      app.addDependency(ds)
+
+  # the replay above finds the same changes as the workers did; also keep
+  # any a worker recorded for dependencies that are still in the catalog
+  depCatalog = nd._depCatalog
+  depCatalog._changedDeps.update(ds for ds in changedDeps if ds in depCatalog._dependencies)
+  return merged
+# returns: list of shard file paths found in the given directory, for the
+#          given total number of shards
+def findShardFiles(shardsDir, shardCount):
+  return sorted(str(p) for p in Path(shardsDir).glob(f"shard-*-of-{shardCount}.json"))
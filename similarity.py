@@ -0,0 +1,199 @@
+# similarity.py
+#
+# This module contains functions for grouping license strings that fall
+# into the "Other" category, and suggesting the nearest existing category
+# for each, based on the license terms they share with categorized strings.
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import math
+import re
+
+from categories import getCategoryForLicenseString, getKnownLicenseStrings
+from conversions import splitLicenseTerms
+
+# Each license string is reduced to a set of tokens: every license ID in it
+# (including those inside "(A OR B)" choices), plus a "family:" token for
+# each ID with its version stripped, so that e.g. "GPL-2.0" and "GPL-3.0"
+# still have something in common. Strings are compared by the Jaccard
+# similarity of their token sets.
+
+_versionSuffix = re.compile(r"(-only|-or-later|\+)$|-\d[\d.]*$")
+_choiceSeparators = re.compile(r" OR | WITH ")
+
+# takes: (1) license string
+# returns: frozenset of tokens
+def tokenizeLicenseString(licString):
+  tokens = set()
+  for term in splitLicenseTerms(licString):
+    for licenseId in _choiceSeparators.split(term.strip("()")):
+      licenseId = licenseId.strip("() ")
+      if not licenseId:
+        continue
+      tokens.add(licenseId)
+      family = licenseId
+      while True:
+        stripped = _versionSuffix.sub("", family)
+        if stripped == family or not stripped:
+          break
+        family = stripped
+      tokens.add(f"family:{family}")
+  return frozenset(tokens)
+
+def jaccard(a, b):
+  if not a and not b:
+    return 0.0
+  shared = len(a & b)
+  return shared / (len(a) + len(b) - shared)
+
+class LicenseSimilarityIndex:
+
+  # arguments:
+  #   1) list of (license string, category) for the categorized strings to
+  #      compare against
+  def __init__(self, knownStrings):
+    super(LicenseSimilarityIndex, self).__init__()
+
+    self._strings = []
+    self._categories = []
+    self._tokens = []
+    # token => list of indexes into the lists above
+    self._postings = {}
+    for licString, category in knownStrings:
+      i = len(self._strings)
+      tokens = tokenizeLicenseString(licString)
+      self._strings.append(licString)
+      self._categories.append(category)
+      self._tokens.append(tokens)
+      for token in tokens:
+        self._postings.setdefault(token, []).append(i)
+
+  # Find the categorized strings sharing the most tokens with the given
+  # string. Only strings sharing at least one token are looked at, via the
+  # inverted index.
+  # returns: list of up to topN tuples (similarity, license string,
+  #          category), most similar first
+  def getNearest(self, licString, topN=5):
+    tokens = tokenizeLicenseString(licString)
+    shared = {}
+    for token in tokens:
+      for i in self._postings.get(token, []):
+        shared[i] = shared.get(i, 0) + 1
+    scored = []
+    for i, n in shared.items():
+      similarity = n / (len(tokens) + len(self._tokens[i]) - n)
+      scored.append((similarity, self._strings[i], self._categories[i]))
+    scored.sort(key=lambda s: (-s[0], s[1]))
+    return scored[:topN]
+
+  # Suggest a category for the given string from its nearest categorized
+  # strings. Each of them votes for its category with its similarity; the
+  # confidence is the winning category's share of the vote, scaled by the
+  # similarity of the closest string in that category.
+  # returns: tuple (category, confidence in [0, 1], nearest string in that
+  #          category, its similarity); category is "Other" with confidence
+  #          0 if nothing shares a token
+  def suggestCategory(self, licString, topN=5):
+    nearest = self.getNearest(licString, topN)
+    if not nearest:
+      return ("Other", 0.0, "", 0.0)
+    votes = {}
+    best = {}
+    for similarity, knownString, category in nearest:
+      votes[category] = votes.get(category, 0.0) + similarity
+      if category not in best:
+        best[category] = (similarity, knownString)
+    category = max(votes, key=lambda c: (votes[c], best[c][0]))
+    similarity, knownString = best[category]
+    confidence = votes[category] / sum(votes.values()) * similarity
+    return (category, confidence, knownString, similarity)
+
+# Group license strings whose token sets have at least the given Jaccard
+# similarity, transitively. Candidate pairs come from an inverted index on
+# each string's rarest tokens only (prefix filtering): two sets with
+# Jaccard >= threshold must share one of those, so the common tokens
+# (e.g. "Apache-2.0") don't make every pair a candidate.
+# arguments:
+#   1) list of license strings
+#   2) optional: minimum Jaccard similarity
+# returns: list of lists of license strings, largest cluster first
+def clusterLicenseStrings(licStrings, threshold=0.5):
+  tokenSets = [tokenizeLicenseString(s) for s in licStrings]
+  frequency = {}
+  for tokens in tokenSets:
+    for token in tokens:
+      frequency[token] = frequency.get(token, 0) + 1
+
+  parent = list(range(len(licStrings)))
+
+  def find(i):
+    while parent[i] != i:
+      parent[i] = parent[parent[i]]
+      i = parent[i]
+    return i
+
+  prefixPostings = {}
+  for i, tokens in enumerate(tokenSets):
+    ordered = sorted(tokens, key=lambda t: (frequency[t], t))
+    prefixLength = len(ordered) - math.ceil(threshold * len(ordered)) + 1
+    candidates = set()
+    for token in ordered[:prefixLength]:
+      candidates.update(prefixPostings.get(token, []))
+      prefixPostings.setdefault(token, []).append(i)
+    for j in candidates:
+      if jaccard(tokens, tokenSets[j]) >= threshold:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+          parent[rj] = ri
+
+  clusters = {}
+  for i in range(len(licStrings)):
+    clusters.setdefault(find(i), []).append(licStrings[i])
+  return sorted((sorted(c) for c in clusters.values()),
+    key=lambda c: (-len(c), c[0]))
+
+# Cluster the license strings in the catalog that fall into "Other", and
+# suggest a category for each from the categorized strings (those listed
+# in categories.py, plus those in the catalog matched by a term rule).
+# arguments:
+#   1) NexusData
+#   2) optional: minimum Jaccard similarity for clustering
+# returns: list of tuples (cluster number, license string, number of
+#          dependencies, suggested category, confidence, nearest string,
+#          similarity), grouped by cluster, largest cluster first
+def reviewOtherLicenses(nd, threshold=0.5):
+  licenseIndex = nd._depCatalog.getLicenseIndex()
+  known = dict(getKnownLicenseStrings())
+  others = []
+  for licString in licenseIndex:
+    category = getCategoryForLicenseString(licString)
+    if category == "Other":
+      others.append(licString)
+    elif licString not in known:
+      known[licString] = category
+
+  index = LicenseSimilarityIndex(sorted(known.items()))
+  rows = []
+  for clusterNum, cluster in enumerate(clusterLicenseStrings(others, threshold), start=1):
+    clusterRows = []
+    for licString in cluster:
+      category, confidence, nearest, similarity = index.suggestCategory(licString)
+      clusterRows.append((clusterNum, licString, len(licenseIndex[licString]),
+        category, confidence, nearest, similarity))
+    clusterRows.sort(key=lambda r: (-r[4], r[1]))
+    rows.extend(clusterRows)
+  return rows
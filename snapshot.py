@@ -0,0 +1,309 @@
+# snapshot.py
+#
+# This module contains functions for saving and loading a binary snapshot of
+# the app catalog and dependency catalog, so that a built catalog can be
+# reloaded without rebuilding it from JSON.
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+
+from apps import NexusAppCatalog
+from deps import Dependency, DependencyCatalog
+
+# File layout:
+#   8 bytes   magic "NXDSNAP\0"
+#   4 bytes   little-endian format version
+#   4 bytes   little-endian length of the column directory
+#   directory UTF-8 JSON list of [name, kind, byte length], in file order;
+#             kind is "i32" for a little-endian int32 array, or "json"
+#   rest      each column's bytes, one after another
+# Nothing in a snapshot is executable, so loading one from an untrusted
+# path can fail but can't run code.
+# Every string is stored once in a string table, and each column is an
+# array of indexes into it (-1 for None). Variable-length lists (licenses,
+# app names, app dependencies) are flattened into a values array plus an
+# offsets array, so the whole snapshot is a handful of flat arrays. The
+# clearing status each app reported for a dependency is stored alongside
+# that dependency's app names, sharing their offsets.
+
+SNAPSHOT_MAGIC = b"NXDSNAP\0"
+# version 1 snapshots were pickled, and are refused rather than unpickled
+SNAPSHOT_FORMAT_VERSION = 2
+
+LICENSE_KINDS = ["final", "effective", "observed", "declared"]
+
+class _StringTable:
+
+  def __init__(self):
+    super(_StringTable, self).__init__()
+
+    self._strings = []
+    self._ids = {}
+
+  def getId(self, s):
+    if s is None:
+      return -1
+    sId = self._ids.get(s, None)
+    if sId is None:
+      sId = len(self._strings)
+      self._strings.append(s)
+      self._ids[s] = sId
+    return sId
+
+def _intOrNone(value):
+  if value is None:
+    return -1
+  return value
+
+# takes: (1) list of lists, (2) function mapping each item to an int
+# returns: tuple (offsets array, values array)
+def _flatten(lists, toInt):
+  offsets = array('i', [0])
+  values = array('i')
+  for l in lists:
+    values.extend(toInt(item) for item in l)
+    offsets.append(len(values))
+  return offsets, values
+
+def _unflatten(offsets, values, fromInt):
+  items = list(map(fromInt, values))
+  return [items[offsets[i]:offsets[i+1]] for i in range(len(offsets) - 1)]
+
+# takes: (1) open binary file, (2) dict of columns, each an array('i') or
+#        any JSON-serializable value
+def _writeColumns(f, columns):
+  directory = []
+  payloads = []
+  for name, value in columns.items():
+    if isinstance(value, array):
+      if sys.byteorder != "little":
+        value = array('i', value)
+        value.byteswap()
+      data = value.tobytes()
+      kind = "i32"
+    else:
+      data = json.dumps(value, separators=(",", ":")).encode("utf-8")
+      kind = "json"
+    directory.append([name, kind, len(data)])
+    payloads.append(data)
+  header = json.dumps(directory).encode("utf-8")
+  f.write(struct.pack("<I", len(header)))
+  f.write(header)
+  for data in payloads:
+    f.write(data)
+
+# takes: (1) open binary file, positioned after the format version
+# returns: dict of columns, as written by _writeColumns
+def _readColumns(f):
+  headerLength = struct.unpack("<I", f.read(4))[0]
+  directory = json.loads(f.read(headerLength).decode("utf-8"))
+  columns = {}
+  for name, kind, length in directory:
+    data = f.read(length)
+    if len(data) != length:
+      raise ValueError(f"column {name} is truncated")
+    if kind == "i32":
+      value = array('i')
+      if value.itemsize != 4 or length % 4 != 0:
+        raise ValueError(f"column {name} has {length} bytes, not a whole number of int32s")
+      value.frombytes(data)
+      if sys.byteorder != "little":
+        value.byteswap()
+    elif kind == "json":
+      value = json.loads(data.decode("utf-8"))
+    else:
+      raise ValueError(f"column {name} has unknown kind {kind!r}")
+    columns[name] = value
+  return columns
+
+# Save a snapshot of the given NexusData's catalogs.
+# arguments:
+#   1) NexusData
+#   2) snapshot file path
+# returns: filename if successfully written, or None if error.
+def saveSnapshot(nd, filename):
+  strings = _StringTable()
+  sid = strings.getId
+
+  depCatalog = nd._depCatalog
+  depKeys = list(depCatalog._dependencies.keys())
+  depIndexes = {ds: i for i, ds in enumerate(depKeys)}
+  deps = [depCatalog._dependencies[ds] for ds in depKeys]
+
+  columns = {
+    "organizationId": nd._appCatalog._orgId if nd._appCatalog else nd._orgId,
+    "depKey": array('i', (sid(ds) for ds in depKeys)),
+    "depGroupId": array('i', (sid(d._groupId) for d in deps)),
+    "depArtifactId": array('i', (sid(d._artifactId) for d in deps)),
+    "depVersion": array('i', (sid(d._version) for d in deps)),
+    "depStatus": array('i', (sid(d._status) for d in deps)),
+    "depOverriddenThreat": array('i', (_intOrNone(d._overriddenLicenseThreat) for d in deps)),
+    "depEffectiveThreat": array('i', (_intOrNone(d._effectiveLicenseThreat) for d in deps)),
+    "changedDeps": array('i', (depIndexes[ds] for ds in depCatalog._changedDeps if ds in depIndexes)),
+  }
+  for kind in LICENSE_KINDS:
+    offsets, values = _flatten((d._licenses[kind] or [] for d in deps), sid)
+    columns[f"depLicenses.{kind}.offsets"] = offsets
+    columns[f"depLicenses.{kind}.values"] = values
+  offsets, values = _flatten((d._appNames for d in deps), sid)
+  columns["depAppNames.offsets"] = offsets
+  columns["depAppNames.values"] = values
+  appStatuses = depCatalog._appStatuses
+  columns["depAppStatuses.values"] = array('i', (sid(appStatuses.get(ds, {}).get(a, d._status))
+    for ds, d in zip(depKeys, deps) for a in d._appNames))
+
+  apps = []
+  if nd._appCatalog:
+    apps = [nd._appCatalog.getApp(b) for b in nd._appCatalog.getAllAppBranches()]
+  columns["appName"] = array('i', (sid(a._name) for a in apps))
+  columns["appAppId"] = array('i', (sid(a._appId) for a in apps))
+  columns["appBranchId"] = array('i', (sid(a._branchId) for a in apps))
+  columns["appReportId"] = array('i', (sid(a._reportId) for a in apps))
+  columns["appTarget"] = array('i', (sid(a._target) for a in apps))
+  columns["appFetchStatus"] = array('i', (sid(a._fetchStatus) for a in apps))
+  offsets, values = _flatten((a._dependencies for a in apps),
+    lambda ds: depIndexes.get(ds, -1))
+  columns["appDependencies.offsets"] = offsets
+  columns["appDependencies.values"] = values
+
+  columns["strings"] = strings._strings
+
+  try:
+    Path(filename).parent.mkdir(parents=True, exist_ok=True)
+    tmpFilename = f"{filename}.tmp"
+    with open(tmpFilename, 'wb') as f:
+      f.write(SNAPSHOT_MAGIC)
+      f.write(struct.pack("<I", SNAPSHOT_FORMAT_VERSION))
+      _writeColumns(f, columns)
+    # rename so that readers never see a partially-written snapshot
+    os.replace(tmpFilename, filename)
+    return filename
+
+  except Exception as e:
+    print(f"Couldn't output snapshot to {filename}: {str(e)}")
+    return None
+
+# Load a snapshot into the given NexusData, replacing its catalogs.
+# arguments:
+#   1) NexusData
+#   2) snapshot file path
+# returns: True if successfully loaded, False otherwise.
+def loadSnapshot(nd, filename):
+  try:
+    with open(filename, 'rb') as f:
+      magic = f.read(len(SNAPSHOT_MAGIC))
+      if magic != SNAPSHOT_MAGIC:
+        print(f"{filename} is not a nexusDeps snapshot")
+        return False
+      version = struct.unpack("<I", f.read(4))[0]
+      if version != SNAPSHOT_FORMAT_VERSION:
+        print(f"Snapshot {filename} has unsupported version {version}; re-create it with this version")
+        return False
+      columns = _readColumns(f)
+
+  except Exception as e:
+    print(f"Couldn't load snapshot from {filename}: {str(e)}")
+    return False
+
+  # append None so that the -1 index used for None maps straight to it
+  strings = columns["strings"]
+  strings.append(None)
+  s = strings.__getitem__
+  def threat(value):
+    if value == -1:
+      return None
+    return value
+
+  licenses = {
+    kind: _unflatten(columns[f"depLicenses.{kind}.offsets"],
+      columns[f"depLicenses.{kind}.values"], s)
+    for kind in LICENSE_KINDS
+  }
+  appNames = _unflatten(columns["depAppNames.offsets"],
+    columns["depAppNames.values"], s)
+  # snapshots from before per-app statuses were kept have no
+  # depAppStatuses column; each app then gets the dependency's status
+  appStatuses = None
+  if "depAppStatuses.values" in columns:
+    appStatuses = _unflatten(columns["depAppNames.offsets"],
+      columns["depAppStatuses.values"], s)
+
+  depCatalog = DependencyCatalog()
+  depKeys = list(map(s, columns["depKey"]))
+  rows = zip(
+    depKeys,
+    map(s, columns["depGroupId"]),
+    map(s, columns["depArtifactId"]),
+    map(s, columns["depVersion"]),
+    map(s, columns["depStatus"]),
+    map(threat, columns["depOverriddenThreat"]),
+    map(threat, columns["depEffectiveThreat"]),
+    licenses["final"], licenses["effective"], licenses["observed"],
+    licenses["declared"],
+    appNames,
+  )
+  dependencies = depCatalog._dependencies
+  for i, (ds, groupId, artifactId, version, status, overriddenThreat,
+      effectiveThreat, final, effective, observed, declared, names) in enumerate(rows):
+    dep = Dependency()
+    dep._groupId = groupId
+    dep._artifactId = artifactId
+    dep._version = version
+    dep._status = status
+    dep._licenses = {
+      "final": final,
+      "effective": effective,
+      "observed": observed,
+      "declared": declared
+    }
+    dep._overriddenLicenseThreat = overriddenThreat
+    dep._effectiveLicenseThreat = effectiveThreat
+    dep._appNames = names
+    dependencies[ds] = dep
+    if appStatuses is not None:
+      depCatalog._appStatuses[ds] = dict(zip(names, appStatuses[i]))
+    elif names:
+      depCatalog._appStatuses[ds] = {a: status for a in names}
+  depCatalog._changedDeps = set(depKeys[i] for i in columns["changedDeps"])
+  depCatalog.rebuildIndexes()
+
+  appCatalog = NexusAppCatalog(columns["organizationId"])
+  appDeps = _unflatten(columns["appDependencies.offsets"],
+    columns["appDependencies.values"], lambda i: depKeys[i] if i != -1 else None)
+  # snapshots from before multi-target runs have no appTarget column
+  appTargets = columns.get("appTarget", None)
+  # nor do those from before fetch statuses were kept
+  appFetchStatuses = columns.get("appFetchStatus", None)
+  for i in range(len(columns["appBranchId"])):
+    branchId = s(columns["appBranchId"][i])
+    appCatalog.addApp(s(columns["appName"][i]), s(columns["appAppId"][i]),
+      branchId, s(columns["appReportId"][i]),
+      s(appTargets[i]) if appTargets is not None else "")
+    app = appCatalog.getApp(branchId)
+    app._dependencies = [ds for ds in appDeps[i] if ds is not None]
+    if appFetchStatuses is not None:
+      app.setFetchStatus(s(appFetchStatuses[i]))
+
+  nd._depCatalog = depCatalog
+  nd._appCatalog = appCatalog
+  return True
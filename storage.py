@@ -0,0 +1,244 @@
+# storage.py
+#
+# This module contains the JSONStore class, which keeps downloaded Nexus IQ
+# license JSON data as compressed, content-addressed blobs.
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+# Layout inside the store directory:
+#   index.json                       => {branch: {"hash": ..., "reportId": ...,
+#                                                 "size": ..., "appName": ...}}
+#   blobs/[hash[:2]]/[hash].json.gz  => gzip-compressed JSON payload
+# Blobs are named by the SHA-256 of the uncompressed payload, so identical
+# payloads from different branches or runs are only stored once.
+#
+# put() only updates the index in memory; callers save it with saveIndex()
+# once a batch of puts is done, e.g. at the end of a run, rather than
+# rewriting it for every branch. Only the latest blob for each branch is
+# kept in the index; prune() deletes the blobs it no longer refers to.
+
+INDEX_FILENAME = "index.json"
+BLOBS_DIRNAME = "blobs"
+
+class JSONStore:
+
+  def __init__(self, storeDir):
+    super(JSONStore, self).__init__()
+
+    self._storeDir = storeDir
+    self._index = {}
+    # True if the index has changed since it was loaded or saved
+    self._dirty = False
+    self._lock = threading.Lock()
+    self._loadIndex()
+
+  def _indexFilename(self):
+    return os.path.join(self._storeDir, INDEX_FILENAME)
+
+  def _blobFilename(self, blobHash):
+    return os.path.join(self._storeDir, BLOBS_DIRNAME, blobHash[:2],
+      f"{blobHash}.json.gz")
+
+  def _loadIndex(self):
+    try:
+      with open(self._indexFilename(), 'r') as f:
+        self._index = json.load(f)
+    except FileNotFoundError:
+      self._index = {}
+    except json.decoder.JSONDecodeError as e:
+      print(f"Error parsing store index {self._indexFilename()}: {str(e)}; starting with an empty index")
+      self._index = {}
+
+  # Write out the index, if it has changed since it was loaded or saved.
+  # returns: True if saved or unchanged, False if error.
+  def saveIndex(self):
+    with self._lock:
+      if not self._dirty:
+        return True
+      try:
+        # write to a temp file and rename, so that readers never see a
+        # partially-written index
+        Path(self._storeDir).mkdir(parents=True, exist_ok=True)
+        tmpFilename = f"{self._indexFilename()}.tmp"
+        with open(tmpFilename, 'w') as f:
+          json.dump(self._index, f, indent=2, sort_keys=True)
+        os.replace(tmpFilename, self._indexFilename())
+        self._dirty = False
+        return True
+
+      except OSError as e:
+        print(f"Couldn't save store index {self._indexFilename()}: {str(e)}")
+        return False
+
+  # Store a raw JSON payload for the given branch; the index isn't saved
+  # until saveIndex() is called.
+  # arguments:
+  #   1) branch ID
+  #   2) raw payload bytes, as received from the server
+  #   3) optional: report ID that the payload came from
+  #   4) optional: Nexus IQ app public ID the payload came from
+  # returns: hash of the stored blob
+  def put(self, branch, content, reportId=None, appName=None):
+    blobHash = hashlib.sha256(content).hexdigest()
+    blobFilename = self._blobFilename(blobHash)
+
+    # only write the blob if we haven't already seen identical content
+    if not os.path.exists(blobFilename):
+      Path(blobFilename).parent.mkdir(parents=True, exist_ok=True)
+      tmpFilename = f"{blobFilename}.{threading.get_ident()}.tmp"
+      with gzip.open(tmpFilename, 'wb') as f:
+        f.write(content)
+      os.replace(tmpFilename, blobFilename)
+
+    with self._lock:
+      self._index[branch] = {"hash": blobHash, "reportId": reportId,
+        "size": len(content), "appName": appName}
+      self._dirty = True
+    return blobHash
+
+  def getEntry(self, branch):
+    return self._index.get(branch, None)
+
+  def getReportId(self, branch):
+    entry = self.getEntry(branch)
+    if not entry:
+      return None
+    return entry.get("reportId", None)
+
+  # returns: Nexus IQ app public ID for the stored payload, or None if
+  #          unknown, e.g. for payloads stored before app names were kept
+  def getAppName(self, branch):
+    entry = self.getEntry(branch)
+    if not entry:
+      return None
+    return entry.get("appName", None)
+
+  # returns: uncompressed size of the stored payload in bytes, or None if
+  #          unknown
+  def getSize(self, branch):
+    entry = self.getEntry(branch)
+    if not entry:
+      return None
+    return entry.get("size", None)
+
+  def getAllBranches(self):
+    return sorted(list(self._index.keys()))
+
+  def hasBranch(self, branch):
+    entry = self.getEntry(branch)
+    return entry is not None and os.path.exists(self._blobFilename(entry["hash"]))
+
+  # Open the stored payload for the given branch as a binary file object,
+  # decompressing as it is read. Caller is responsible for closing it.
+  # returns: file object, or None if the branch isn't in the store.
+  def open(self, branch):
+    entry = self.getEntry(branch)
+    if not entry:
+      return None
+    try:
+      return gzip.open(self._blobFilename(entry["hash"]), 'rb')
+    except FileNotFoundError:
+      print(f"Blob {entry['hash']} for {branch} is missing from store")
+      return None
+
+  # returns: raw stored payload bytes for the given branch, or None if not
+  #          found or not readable
+  def loadContent(self, branch):
+    f = self.open(branch)
+    if f is None:
+      return None
+    try:
+      with f:
+        return f.read()
+    except OSError as e:
+      print(f"Couldn't load stored JSON data for {branch}: {str(e)}")
+      return None
+
+  # Load and parse the stored payload for the given branch.
+  # returns: dict with JSON data, or None if not found or not parseable.
+  def loadJSON(self, branch):
+    f = self.open(branch)
+    if f is None:
+      return None
+    try:
+      with f:
+        return json.load(f)
+    except (OSError, json.decoder.JSONDecodeError) as e:
+      print(f"Couldn't load stored JSON data for {branch}: {str(e)}")
+      return None
+
+  # Import existing raw [branch].orig.json files into the store.
+  # arguments:
+  #   1) directory containing .orig.json files
+  # returns: number of files imported
+  def importRawFiles(self, rawDir):
+    count = 0
+    for p in sorted(Path(rawDir).glob("*.orig.json")):
+      branch = p.name[:-len(".orig.json")]
+      with open(p, 'rb') as f:
+        self.put(branch, f.read(), self.getReportId(branch),
+          self.getAppName(branch))
+      count = count + 1
+    self.saveIndex()
+    return count
+
+  # Delete the blobs that no branch in the saved index refers to, e.g. the
+  # data for branches' older reports. Blobs written since the index was
+  # last saved are kept, in case a run still in progress is about to refer
+  # to them; even so, don't prune while a run is using the store.
+  # returns: tuple (number of blobs deleted, compressed bytes freed)
+  def prune(self):
+    self.saveIndex()
+    try:
+      indexTime = os.path.getmtime(self._indexFilename())
+    except OSError:
+      print(f"No store index {self._indexFilename()}; not pruning")
+      return 0, 0
+    with self._lock:
+      referenced = set(entry["hash"] for entry in self._index.values())
+    deleted = 0
+    freedBytes = 0
+    for p in Path(self._storeDir, BLOBS_DIRNAME).glob("*/*.json.gz"):
+      if p.name[:-len(".json.gz")] in referenced:
+        continue
+      try:
+        st = p.stat()
+        if st.st_mtime >= indexTime:
+          continue
+        p.unlink()
+      except OSError as e:
+        print(f"Couldn't delete unreferenced blob {p}: {str(e)}")
+        continue
+      deleted = deleted + 1
+      freedBytes = freedBytes + st.st_size
+    return deleted, freedBytes
+
+  # Return (number of blobs, total compressed bytes) currently on disk.
+  def getDiskUsage(self):
+    numBlobs = 0
+    totalBytes = 0
+    for p in Path(self._storeDir, BLOBS_DIRNAME).glob("*/*.json.gz"):
+      numBlobs = numBlobs + 1
+      totalBytes = totalBytes + p.stat().st_size
+    return numBlobs, totalBytes
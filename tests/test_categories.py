@@ -0,0 +1,47 @@
+# test_categories.py
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+from categories import CATEGORY_LICENSE_STRINGS, getCategoryForLicenseString
+
+# the original lookup: each category's exact strings, checked in order
+def baselineCategory(licString):
+  for category, licStrings in CATEGORY_LICENSE_STRINGS:
+    if licString in licStrings:
+      return category
+  return "Other"
+
+def test_listed_strings_match_baseline():
+  listed = [s for category, licStrings in CATEGORY_LICENSE_STRINGS for s in licStrings]
+  assert len(listed) == len(set(listed))
+  for licString in listed:
+    assert getCategoryForLicenseString(licString) == baselineCategory(licString), licString
+
+def test_unknown_terms_match_baseline():
+  for licString in ["", "Not Declared", "No Source License", "Foo-1.0",
+    "MIT AND Foo-1.0", "Apache-2.0 AND Non-Standard"]:
+    assert getCategoryForLicenseString(licString) == baselineCategory(licString), licString
+
+# strings that aren't listed are categorized by their terms, most
+# restrictive first
+def test_unlisted_strings_use_term_rules():
+  assert getCategoryForLicenseString("MIT AND Zlib") == "Attribution"
+  assert getCategoryForLicenseString("ISC AND MIT AND Zlib") == "Attribution"
+  assert getCategoryForLicenseString("LGPL-2.1 AND MIT") == "Weak Copyleft"
+  assert getCategoryForLicenseString("COMMERCIAL AND GPL-3.0") == "Use Restrictions"
+  assert getCategoryForLicenseString("CC-PDDC AND CC0-1.0 AND Public Domain") == \
+    "CC0 or Public Domain"
@@ -0,0 +1,49 @@
+# test_columnar.py
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from apps import FETCH_STATUS_STALE
+from columnar import exportCatalog, importCatalog
+from main import NexusData
+from test_snapshot import describeApps, makeNexusData
+
+def describe(nd):
+  depCatalog = nd._depCatalog
+  return {
+    "dependencies": {ds: dep.toDict() for ds, dep in depCatalog._dependencies.items()},
+    "appStatuses": {ds: depCatalog.getAppStatuses(ds) for ds in depCatalog._dependencies},
+    "indexKeys": depCatalog._indexKeys,
+    # exports list each app's dependencies by depString
+    "apps": {b: dict(app, dependencies=sorted(app["dependencies"]))
+      for b, app in describeApps(nd).items()},
+  }
+
+@pytest.mark.parametrize("extension", ["parquet", "arrow"])
+def test_round_trip(tmp_path, extension):
+  nd = makeNexusData()
+  nd._appCatalog.getApp("app-b").setFetchStatus(FETCH_STATUS_STALE)
+  filename = str(tmp_path / f"catalog.{extension}")
+  assert exportCatalog(nd, filename) == filename
+
+  loaded = NexusData()
+  assert importCatalog(loaded, filename)
+  assert describe(loaded) == describe(nd)
+  assert loaded._appCatalog._orgId == "org"
@@ -0,0 +1,62 @@
+# test_conversions.py
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import conversions
+from conversions import compileConversionRules, getConvertedLicenseString, splitLicenseTerms
+
+# the whole-string conversions from before term-level rules were added
+BASELINE_CONVERSIONS = {
+  "EDL-1.0 AND EPL-1.0": "EPL-1.0 AND BSD-3-Clause",
+  "BSD-3-Clause AND EDL-1.0": "BSD-3-Clause",
+  "BSD-3-Clause AND EDL-1.0 AND MIT": "BSD-3-Clause AND MIT",
+  "BSD AND Generic-Liberal-Clause": "BSD-3-Clause",
+  "Apache-2.0 AND BSD-3-Clause AND Generic-Open-Source-Clause": "Apache-2.0 AND BSD-3-Clause",
+}
+
+def test_whole_string_conversions_match_baseline():
+  for licString, converted in BASELINE_CONVERSIONS.items():
+    assert getConvertedLicenseString(licString) == converted
+
+def test_strings_without_rule_terms_are_unchanged():
+  for licString in ["MIT", "Apache-2.0 AND MIT", "MIT AND Apache-2.0",
+    "(EDL-1.0 AND MIT) OR GPL-2.0", ""]:
+    assert getConvertedLicenseString(licString) == licString
+
+def test_term_rules():
+  assert getConvertedLicenseString("EDL-1.0 AND MIT") == "BSD-3-Clause AND MIT"
+  assert getConvertedLicenseString("MIT AND Generic-Open-Source-Clause") == "MIT"
+  assert getConvertedLicenseString("BSD AND Generic-Liberal-Clause AND MIT") == \
+    "BSD-3-Clause AND MIT"
+  # the only term isn't dropped
+  assert getConvertedLicenseString("Generic-Liberal-Clause") == "Generic-Liberal-Clause"
+  assert getConvertedLicenseString("BSD-3-Clause AND EDL-1.0 AND ISC") == \
+    "BSD-3-Clause AND ISC"
+
+def test_split_keeps_parentheses():
+  assert splitLicenseTerms("(A AND B) AND C") == ["(A AND B)", "C"]
+
+def test_recompiling_clears_memoized_results(monkeypatch):
+  assert getConvertedLicenseString("ISC AND MIT") == "ISC AND MIT"
+  monkeypatch.setattr(conversions, "REPLACE_TERMS", {"ISC": "MIT"})
+  compileConversionRules()
+  try:
+    assert getConvertedLicenseString("ISC AND MIT") == "MIT"
+  finally:
+    monkeypatch.undo()
+    compileConversionRules()
+  assert getConvertedLicenseString("ISC AND MIT") == "ISC AND MIT"
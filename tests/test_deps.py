@@ -0,0 +1,114 @@
+# test_deps.py
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import copy
+import itertools
+
+from deps import Dependency, DependencyCatalog
+
+def record(artifactId, **values):
+  depData = {"groupId": "g", "artifactId": artifactId, "version": "1",
+    "status": "Open", "effectiveLicenses": ["MIT"], "effectiveLicenseThreat": 0}
+  depData.update(values)
+  return depData
+
+# (app, record) in the order they are added; most records repeat an
+# earlier one exactly, some differ in one field
+RECORDS = [
+  ("app-a", record("same")),
+  ("app-b", record("same")),
+  ("app-a", record("status")),
+  ("app-b", record("status", status="Cleared")),
+  ("app-a", record("license")),
+  ("app-b", record("license", effectiveLicenses=["MIT", "Apache-2.0"])),
+  ("app-a", record("threat", effectiveLicenseThreat=None)),
+  ("app-b", record("threat", effectiveLicenseThreat=None)),
+  ("app-c", record("threat", effectiveLicenseThreat=-1)),
+  ("app-a", record("missing", effectiveLicenses=None)),
+  ("app-b", {"groupId": "g", "artifactId": "missing", "version": "1", "status": "Open"}),
+  ("app-a", {"componentIdentifier": {"coordinates": {"name": "comp", "version": "2"}},
+    "status": "Open", "declaredLicenses": ["BSD-3-Clause"]}),
+  ("app-b", {"componentIdentifier": {"coordinates": {"name": "comp", "version": "2"}},
+    "status": "Open", "declaredLicenses": ["BSD-3-Clause"]}),
+]
+
+def buildCatalog():
+  depCatalog = DependencyCatalog()
+  notified = []
+  depCatalog.addListener(lambda ds, dep, appName, indexKeys:
+    notified.append((ds, appName, indexKeys)))
+  for appName, depData in RECORDS:
+    depCatalog.addDependency(depData, appName, update=True)
+  return depCatalog, notified
+
+def describe(depCatalog):
+  return {
+    "dependencies": {ds: (dep.toDict(), dep._appNames)
+      for ds, dep in depCatalog._dependencies.items()},
+    "appStatuses": depCatalog._appStatuses,
+    "indexKeys": depCatalog._indexKeys,
+    "byApp": depCatalog._byApp,
+    "byLicense": depCatalog.getLicenseIndex(),
+  }
+
+def test_matching_records_skip_update_with_same_result(monkeypatch):
+  fast, fastNotified = buildCatalog()
+  # every record takes the full update path
+  monkeypatch.setattr(Dependency, "matchesDict", lambda self, depData: False)
+  full, fullNotified = buildCatalog()
+
+  assert describe(fast) == describe(full)
+  assert fastNotified == fullNotified
+  # only the dependencies whose records differed are marked as changed
+  assert fast.getChangedDependencies() == sorted([
+    "g : status : 1", "g : license : 1", "g : threat : 1", "g : missing : 1"])
+
+def indexes(depCatalog):
+  return (depCatalog._byThreat, depCatalog._byCategory, depCatalog._byLicense,
+    depCatalog._byApp, depCatalog._indexKeys)
+
+# the indexes kept up to date through adds, updates and app removal match
+# indexes built from scratch, and queries match a scan of every dependency
+def test_indexes_match_scan():
+  depCatalog, notified = buildCatalog()
+  depCatalog.removeAppFromDependencies("app-a",
+    list(depCatalog._byApp["app-a"]))
+  assert "app-a" not in depCatalog._byApp
+
+  incremental = copy.deepcopy(indexes(depCatalog))
+  depCatalog.rebuildIndexes()
+  assert incremental == indexes(depCatalog)
+
+  categories = list(depCatalog._byCategory) + ["Missing"]
+  licStrings = list(depCatalog._byLicense) + ["Missing"]
+  for category, licString, appName, minThreat in itertools.product(
+    [None] + categories, [None] + licStrings, [None, "app-b", "app-c"], [None, 0, 8]):
+    expected = []
+    for ds, dep in sorted(depCatalog._dependencies.items()):
+      threat, depCategory, depLicString = depCatalog._indexKeys[ds]
+      if category is not None and depCategory != category:
+        continue
+      if licString is not None and depLicString != licString:
+        continue
+      if appName is not None and appName not in dep._appNames:
+        continue
+      if minThreat is not None and (threat is None or threat < minThreat):
+        continue
+      expected.append(dep)
+    assert depCatalog.queryDependencies(minThreat=minThreat, category=category,
+      licString=licString, appName=appName) == expected
@@ -0,0 +1,74 @@
+# test_htmlreport.py
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+
+import htmlreport
+from htmlreport import _searchTokens, _shardSearchEntries, createHTMLReport
+from main import NexusData
+from test_search import makeCatalog
+
+def makeEntries(texts):
+  return [(text, "page.html", _searchTokens(text)) for text in texts]
+
+def test_large_shards_are_split(monkeypatch):
+  monkeypatch.setattr(htmlreport, "MAX_SEARCH_SHARD_ENTRIES", 3)
+  texts = ["org : a : 1", "org.x : b : 1", "org.y : c : 1", "ore : d : 1",
+    "or : e : 1", "zz : f : 1"]
+  shards, split = _shardSearchEntries(makeEntries(texts))
+
+  assert split == ["or"]
+  # the split shard keeps the entry whose token is exactly "or" first
+  assert shards["or"][0][0] == "or : e : 1"
+  assert sorted(e[0] for e in shards["org"]) == [
+    "org : a : 1", "org.x : b : 1", "org.y : c : 1"]
+  assert [e[0] for e in shards["ore"]] == ["ore : d : 1"]
+  assert [e[0] for e in shards["zz"]] == ["zz : f : 1"]
+
+def test_small_shards_are_not_split():
+  shards, split = _shardSearchEntries(makeEntries(["org : a : 1", "ore : b : 1"]))
+  assert split == []
+  assert len(shards["or"]) == 2
+
+def test_report_pages_and_search(tmp_path):
+  nd = NexusData()
+  nd._depCatalog = makeCatalog(
+    [("org.example", f"lib{n}", "1.0", 0) for n in range(7)])
+  outputDir = str(tmp_path)
+  assert createHTMLReport(nd, outputDir, pageSize=3)
+
+  categoryDirs = os.listdir(os.path.join(outputDir, "category"))
+  assert len(categoryDirs) == 1
+  pages = sorted(os.listdir(os.path.join(outputDir, "category", categoryDirs[0])))
+  assert len(pages) == 3
+  rowCounts = []
+  for page in pages:
+    with open(os.path.join(outputDir, "category", categoryDirs[0], page)) as f:
+      rowCounts.append(f.read().count("org.example : lib"))
+  assert sorted(rowCounts) == [1, 3, 3]
+
+  with open(os.path.join(outputDir, "search", "manifest.json")) as f:
+    manifest = json.load(f)
+  assert manifest["split"] == []
+  with open(os.path.join(outputDir, "search", "li.json")) as f:
+    entries = json.load(f)
+  # each dependency points at the page it was written to
+  urls = {text: url for text, url, tokens in entries}
+  assert urls["org.example : lib0 : 1.0"].endswith("page-1.html")
+  assert urls["org.example : lib6 : 1.0"].endswith("page-3.html")
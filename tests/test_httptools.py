@@ -0,0 +1,183 @@
+# test_httptools.py
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import httptools
+from apps import FETCH_STATUS_MISSING, FETCH_STATUS_STALE, NexusAppCatalog, NexusTarget
+from main import NexusData
+from reports import getIncompleteApps
+from storage import JSONStore
+
+BODY = b'{"aaData": []}'
+ETAG = '"v1"'
+
+class Handler(BaseHTTPRequestHandler):
+
+  def do_GET(self):
+    if "trickle" in self.path:
+      self.trickle()
+      return
+    self.server.statuses.append(None)
+    if self.headers.get("If-None-Match", None) == ETAG:
+      self.send_response(304)
+      self.send_header("ETag", ETAG)
+      self.end_headers()
+      self.server.statuses[-1] = 304
+      return
+    self.send_response(200)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("ETag", ETAG)
+    self.send_header("Content-Length", str(len(BODY)))
+    self.end_headers()
+    self.wfile.write(BODY)
+    self.server.statuses[-1] = 200
+
+  # send a complete set of headers, then the body one byte at a time, each
+  # well within any read timeout
+  def trickle(self):
+    body = b'{"aaData": []}'
+    self.send_response(200)
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    try:
+      for i in range(len(body)):
+        self.wfile.write(body[i:i+1])
+        self.wfile.flush()
+        time.sleep(0.2)
+    except OSError:
+      pass
+
+  def log_message(self, format, *args):
+    pass
+
+@pytest.fixture
+def server():
+  httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+  httpd.statuses = []
+  t = threading.Thread(target=httpd.serve_forever, daemon=True)
+  t.start()
+  yield httpd
+  httpd.shutdown()
+  httpd.server_close()
+
+@pytest.fixture(autouse=True)
+def resetTransport(monkeypatch):
+  for name in ["_cache", "_recorder", "_replayer", "_rateLimiter", "_deadline"]:
+    monkeypatch.setattr(httptools, name, None)
+
+def serverURL(server, path="/licenses.json"):
+  return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+def test_cache_serves_stored_body_on_304(server, tmp_path):
+  cache = httptools.HTTPCache(str(tmp_path), 1024 * 1024)
+  httptools._cache = cache
+  url = serverURL(server)
+
+  first = httptools.get(url)
+  second = httptools.get(url)
+  assert server.statuses == [200, 304]
+  assert first.status_code == second.status_code == 200
+  assert second.content == BODY
+  assert second.headers["Content-Type"] == "application/json"
+  stats = cache.getStats()
+  assert stats["notModified"] == 1
+  assert stats["stored"] == 1
+
+  # a cache reloaded from disk revalidates the same way
+  cache.save()
+  httptools._cache = httptools.HTTPCache(str(tmp_path), 1024 * 1024)
+  assert httptools.get(url).content == BODY
+  assert server.statuses == [200, 304, 304]
+
+def test_record_with_cache_replays_without_it(server, tmp_path):
+  httptools._cache = httptools.HTTPCache(str(tmp_path / "cache"), 1024 * 1024)
+  url = serverURL(server)
+  httptools.get(url)
+
+  # recorded while the cache turns the server's 304 into the stored body
+  fixtures = str(tmp_path / "fixtures.zip")
+  httptools._recorder = httptools.HTTPRecorder(fixtures)
+  httptools.get(url)
+  assert server.statuses == [200, 304]
+  httptools._recorder.save()
+
+  httptools._recorder = None
+  httptools._cache = None
+  httptools._replayer = httptools.HTTPReplayer(fixtures, 0.0)
+  r = httptools.get(url)
+  assert r.status_code == 200
+  assert r.content == BODY
+  assert server.statuses == [200, 304]
+
+def test_replay_bypasses_cache(server, tmp_path):
+  fixtures = str(tmp_path / "fixtures.zip")
+  httptools._recorder = httptools.HTTPRecorder(fixtures)
+  httptools.get(serverURL(server))
+  httptools._recorder.save()
+  httptools._recorder = None
+
+  cache = httptools.HTTPCache(str(tmp_path / "cache"), 1024 * 1024)
+  httptools._cache = cache
+  httptools._replayer = httptools.HTTPReplayer(fixtures, 0.0)
+  assert httptools.get(serverURL(server)).content == BODY
+  assert cache.getStats()["requests"] == 0
+  assert server.statuses == [200]
+
+def test_deadline_cuts_off_trickling_response(server, monkeypatch):
+  monkeypatch.setattr(httptools, "_requestTimeout", 5)
+  httptools.configureDeadline(0.5)
+  start = time.monotonic()
+  with pytest.raises(httptools.DeadlineExceeded):
+    httptools.get(serverURL(server, "/trickle"))
+  assert time.monotonic() - start < 1.5
+  with pytest.raises(httptools.DeadlineExceeded):
+    httptools.get(serverURL(server))
+
+def test_body_read_before_deadline(server):
+  httptools.configureDeadline(30)
+  r = httptools.get(serverURL(server))
+  assert r.status_code == 200
+  assert r.content == BODY
+
+def test_stale_and_missing_under_deadline(server, tmp_path, monkeypatch):
+  monkeypatch.setattr(httptools, "_requestTimeout", 5)
+  nd = NexusData()
+  nd._jsonDir = str(tmp_path)
+  nd._store = JSONStore(str(tmp_path))
+  nd._store.put("app-a", json.dumps({"aaData": [{"groupId": "g",
+    "artifactId": "a", "version": "1", "status": "Open"}]}).encode("utf-8"), "old")
+  nd._targets[""] = NexusTarget("", "org", serverURL(server, "/trickle"), "", "u", "p")
+  nd._appCatalog = NexusAppCatalog("org")
+  # app-a's new report trickles in past the deadline, and there's no time
+  # left for app-b, which has nothing stored
+  nd._appCatalog.addApp("app-a", "", "app-a", "new")
+  nd._appCatalog.addApp("app-b", "", "app-b", "new")
+  httptools.configureDeadline(0.5)
+  nd.getAllLicensesAndReports()
+
+  assert nd._appCatalog.getApp("app-a").getFetchStatus() == FETCH_STATUS_STALE
+  assert nd._appCatalog.getApp("app-b").getFetchStatus() == FETCH_STATUS_MISSING
+  assert getIncompleteApps(nd) == (["app-a"], ["app-b"])
+  assert nd._appCatalog.getApp("app-a")._dependencies == ["g : a : 1"]
+  assert nd._store.getReportId("app-a") == "old"
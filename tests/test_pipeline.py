@@ -0,0 +1,134 @@
+# test_pipeline.py
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import threading
+import time
+
+from apps import FETCH_STATUS_CURRENT, FETCH_STATUS_MISSING, NexusAppCatalog
+from main import NexusData
+from pipeline import LicensePipeline
+
+BAD_UTF8 = b'{"components": ["\xff\xfe"]}'
+GOOD = b'{"components": []}'
+
+class FakeNexusData(NexusData):
+
+  def __init__(self, payloads):
+    super(FakeNexusData, self).__init__()
+    self._payloads = payloads
+    self.folded = {}
+
+  def fetchLicenseContent(self, appBranch, force=False):
+    return self._payloads[appBranch], FETCH_STATUS_CURRENT
+
+  def foldLicenseData(self, appBranch, lic_rj, fetchStatus):
+    self.folded[appBranch] = lic_rj
+    return bool(lic_rj)
+
+class ExplodingNexusData(FakeNexusData):
+
+  def parseLicenseContent(self, appBranch, content):
+    if appBranch == "bad":
+      raise RuntimeError("parser bug")
+    return super(ExplodingNexusData, self).parseLicenseContent(appBranch, content)
+
+# Real folding into the catalogs, with the first apps made slowest to fetch
+# so that they finish parsing last.
+class SlowFirstNexusData(NexusData):
+
+  def __init__(self, payloads):
+    super(SlowFirstNexusData, self).__init__()
+    self._payloads = payloads
+    self._appCatalog = NexusAppCatalog("org")
+    for appBranch in payloads:
+      self._appCatalog.addApp(appBranch, appBranch, appBranch, "report")
+
+  def fetchLicenseContent(self, appBranch, force=False):
+    appBranches = list(self._payloads)
+    time.sleep(0.05 * (len(appBranches) - appBranches.index(appBranch)))
+    return self._payloads[appBranch], FETCH_STATUS_CURRENT
+
+def licensePayload(license, threat):
+  return json.dumps({"aaData": [{
+    "groupId": "g", "artifactId": "a", "version": "1",
+    "status": "Open", "effectiveLicenses": [license],
+    "effectiveLicenseThreat": threat,
+  }]}).encode("utf-8")
+
+def runWithTimeout(pipeline, appBranches, timeout=10):
+  result = []
+  t = threading.Thread(target=lambda: result.append(pipeline.run(appBranches)), daemon=True)
+  t.start()
+  t.join(timeout)
+  assert not t.is_alive(), "pipeline hung"
+  return result[0]
+
+def test_parseLicenseContent_invalid_utf8():
+  nd = NexusData()
+  assert nd.parseLicenseContent("bad", BAD_UTF8) is None
+
+def test_pipeline_survives_bad_payload():
+  nd = FakeNexusData({"bad": BAD_UTF8, "good": GOOD})
+  folded = runWithTimeout(LicensePipeline(nd, 2, 2), ["bad", "good"])
+  assert folded == 1
+  assert nd.folded == {"bad": None, "good": {"components": []}}
+
+def test_pipeline_survives_parser_exception():
+  nd = ExplodingNexusData({"bad": GOOD, "good": GOOD})
+  folded = runWithTimeout(LicensePipeline(nd, 1, 1), ["bad", "good"])
+  assert folded == 1
+  assert nd.folded["bad"] is None
+
+def test_pipeline_folds_conflicting_records_in_app_order():
+  payloads = {
+    "app-a": licensePayload("GPL-2.0", 10),
+    "app-b": licensePayload("MIT", 0),
+    "app-c": licensePayload("MIT", 0),
+    "app-d": licensePayload("Apache-2.0", 0),
+  }
+  serial = SlowFirstNexusData(payloads)
+  for appBranch in payloads:
+    serial.getLicenses(appBranch)
+  expected = serial._depCatalog._dependencies["g : a : 1"].toDict()
+
+  nd = SlowFirstNexusData(payloads)
+  folded = runWithTimeout(LicensePipeline(nd, 4, 2), list(payloads))
+  assert folded == 4
+  assert nd._depCatalog._dependencies["g : a : 1"].toDict() == expected
+  assert expected["effectiveLicenses"] == ["Apache-2.0"]
+  assert nd._appCatalog.getApp("app-a")._dependencies == ["g : a : 1"]
+
+class RefetchNexusData(SlowFirstNexusData):
+
+  def fetchLicenseContent(self, appBranch, force=False):
+    content = self._payloads.get(appBranch, None)
+    if content is None:
+      return None, FETCH_STATUS_MISSING
+    return content, FETCH_STATUS_CURRENT
+
+def test_refreshApps_keeps_data_for_failed_fetches():
+  nd = RefetchNexusData({"app-a": licensePayload("MIT", 0),
+    "app-b": licensePayload("MIT", 0)})
+  nd.getAllLicensesAndReports()
+  nd._payloads = {"app-a": licensePayload("Apache-2.0", 0)}
+  assert nd.refreshApps(["app-a", "app-b"], 2) == 1
+  dep = nd._depCatalog._dependencies["g : a : 1"]
+  assert dep._licenses["effective"] == ["Apache-2.0"]
+  assert sorted(dep._appNames) == ["app-a", "app-b"]
+  assert nd._appCatalog.getApp("app-b")._dependencies == ["g : a : 1"]
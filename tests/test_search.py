@@ -0,0 +1,156 @@
+# test_search.py
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import time
+
+from deps import Dependency, DependencyCatalog, depString
+from search import (SCORE_ARTIFACT_PREFIX, SCORE_EXACT_ARTIFACT, SCORE_GROUP_PREFIX,
+  SCORE_WORD_PREFIX, DependencySearchIndex, getCoordinateTerms, parseSearchQuery)
+
+def makeCatalog(coords):
+  depCatalog = DependencyCatalog()
+  for groupId, artifactId, version, threat in coords:
+    dep = Dependency()
+    dep._groupId = groupId
+    dep._artifactId = artifactId
+    dep._version = version
+    dep._status = "Open"
+    dep._effectiveLicenseThreat = threat
+    dep._appNames = ["app1"]
+    depCatalog._dependencies[depString(groupId, artifactId, version)] = dep
+  depCatalog.rebuildIndexes()
+  return depCatalog
+
+# more than 10,000 dependencies under "org", sorting before the one we want
+def makeBroadCatalog():
+  coords = [("org.aaa", f"lib{n:05d}", "1.0", 0) for n in range(20000)]
+  coords.append(("org.zzz", "log4j-core", "2.14.1", 10))
+  return makeCatalog(coords)
+
+def test_single_word():
+  index = DependencySearchIndex(makeBroadCatalog())
+  assert index.search("log4j") == [(0.9, "org.zzz : log4j-core : 2.14.1")]
+
+def test_multi_word_with_broad_word():
+  index = DependencySearchIndex(makeBroadCatalog())
+  results = index.search("org log4j")
+  assert [ds for score, ds in results] == ["org.zzz : log4j-core : 2.14.1"]
+
+def test_broad_prefix_ranks_by_threat():
+  index = DependencySearchIndex(makeBroadCatalog())
+  results = index.search("org", limit=1)
+  assert [ds for score, ds in results] == ["org.zzz : log4j-core : 2.14.1"]
+
+def test_version_prefix():
+  index = DependencySearchIndex(makeCatalog([
+    ("org.apache.logging.log4j", "log4j-core", "2.14.1", 10),
+    ("org.apache.logging.log4j", "log4j-core", "2.17.1", 0),
+  ]))
+  assert [ds for score, ds in index.search("log4j-core 2.14")] == \
+    ["org.apache.logging.log4j : log4j-core : 2.14.1"]
+  assert [ds for score, ds in index.search("org.apache.logging.log4j:log4j-core:2.17.1")] == \
+    ["org.apache.logging.log4j : log4j-core : 2.17.1"]
+
+def test_typo():
+  index = DependencySearchIndex(makeCatalog([
+    ("com.fasterxml.jackson.core", "jackson-databind", "2.12.3", 0),
+    ("org.slf4j", "slf4j-api", "1.7.30", 0),
+  ]))
+  results = index.search("jackson-databnd")
+  assert [ds for score, ds in results] == ["com.fasterxml.jackson.core : jackson-databind : 2.12.3"]
+
+def test_typo_with_broad_word():
+  coords = [("org.aaa", f"lib{n:05d}", "1.0", 0) for n in range(20000)]
+  coords.append(("org.zzz", "jackson-databind", "2.12.3", 0))
+  index = DependencySearchIndex(makeCatalog(coords))
+  results = index.search("org jackson-databnd")
+  assert [ds for score, ds in results] == ["org.zzz : jackson-databind : 2.12.3"]
+
+# varied groups, artifacts, versions and threats, where most dependencies
+# match a one- or two-character prefix
+def makeMixedCatalog():
+  groups = ["org.apache.commons", "org.apache.logging.log4j", "org.aaa",
+    "com.fasterxml.jackson.core", "io.netty", "ore.example", None]
+  artifacts = ["commons-lang3", "log4j-core", "log4j-api", "jackson-databind",
+    "netty-all", "core", "org"]
+  threats = [None, 0, 1, 5, 8, 10]
+  coords = []
+  for n in range(20000):
+    artifactId = artifacts[n % len(artifacts)]
+    if n % 3:
+      artifactId = f"{artifactId}-{n % 500}"
+    coords.append((groups[n % len(groups)], artifactId,
+      f"{n % 3 + 1}.{n % 21}.{n}", threats[n % len(threats)]))
+  return makeCatalog(coords)
+
+# score every dependency against the words by prefix, the slow way
+def linearSearch(depCatalog, text, limit=20):
+  words, versions = parseSearchQuery(text)
+  results = []
+  for ds, dep in depCatalog._dependencies.items():
+    if not all((dep._version or "").lower().startswith(v) for v in versions):
+      continue
+    groupId = (dep._groupId or "").lower()
+    artifactId = (dep._artifactId or "").lower()
+    coords = f"{groupId}:{artifactId}"
+    terms = getCoordinateTerms(dep)
+    scores = []
+    for word in words:
+      if not any(t.startswith(word) for t in terms):
+        break
+      if artifactId == word or coords == word:
+        scores.append(SCORE_EXACT_ARTIFACT)
+      elif artifactId.startswith(word):
+        scores.append(SCORE_ARTIFACT_PREFIX)
+      elif groupId.startswith(word) or coords.startswith(word):
+        scores.append(SCORE_GROUP_PREFIX)
+      else:
+        scores.append(SCORE_WORD_PREFIX)
+    else:
+      score = sum(scores) / len(words) if words else SCORE_EXACT_ARTIFACT
+      threat = depCatalog._indexKeys[ds][0]
+      results.append((-score, 1 if threat is None else -threat, ds))
+  results.sort()
+  return [(-score, ds) for score, threat, ds in results[:limit]]
+
+BROAD_QUERIES = ["o", "org", "org.apache", "2.1", "core", "log4j 2.1",
+  "org log4j", "o c", "org.apache.logging.log4j:log4j-core", "commons-lang3"]
+
+def test_broad_prefixes_match_linear_scan():
+  depCatalog = makeMixedCatalog()
+  index = DependencySearchIndex(depCatalog)
+  for query in BROAD_QUERIES:
+    for limit in [1, 20, 300]:
+      assert index.search(query, limit) == linearSearch(depCatalog, query, limit), query
+
+def bestTime(f, repeat=3):
+  times = []
+  for i in range(repeat):
+    start = time.perf_counter()
+    f()
+    times.append(time.perf_counter() - start)
+  return min(times)
+
+# ranking a broad prefix shouldn't cost as much as scoring every dependency
+def test_broad_prefix_faster_than_linear_scan():
+  depCatalog = makeMixedCatalog()
+  index = DependencySearchIndex(depCatalog)
+  for query in ["o", "2.1"]:
+    indexed = bestTime(lambda: index.search(query))
+    linear = bestTime(lambda: linearSearch(depCatalog, query))
+    assert indexed * 3 < linear, query
@@ -0,0 +1,96 @@
+# test_shards.py
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+
+import shards
+from apps import FETCH_STATUS_CURRENT, NexusAppCatalog
+from main import NexusData
+
+def component(artifactId, license, threat, status="Open"):
+  return {
+    "groupId": "g", "artifactId": artifactId, "version": "1",
+    "status": status, "effectiveLicenses": [license],
+    "effectiveLicenseThreat": threat,
+  }
+
+# app branch => components in its report; "x" is reported differently by
+# app-c, and "y" is cleared in app-d's report only
+REPORTS = {
+  "app-a": [component("x", "MIT", 0), component("y", "Apache-2.0", 0)],
+  "app-b": [component("x", "MIT", 0)],
+  "app-c": [component("x", "GPL-2.0", 10), component("y", "Apache-2.0", 0)],
+  "app-d": [component("x", "MIT", 0), component("y", "Apache-2.0", 0, "Cleared")],
+  "app-e": [component("y", "Apache-2.0", 0)],
+}
+
+class FakeNexusData(NexusData):
+
+  def __init__(self, appBranches):
+    super(FakeNexusData, self).__init__()
+    self._appCatalog = NexusAppCatalog("org")
+    for appBranch in appBranches:
+      self._appCatalog.addApp(appBranch, appBranch, appBranch, "report")
+
+  def fetchLicenseContent(self, appBranch, force=False):
+    return json.dumps({"aaData": REPORTS[appBranch]}).encode("utf-8"), FETCH_STATUS_CURRENT
+
+def describe(nd):
+  depCatalog = nd._depCatalog
+  return {
+    "dependencies": {ds: dep.toDict() for ds, dep in depCatalog._dependencies.items()},
+    "apps": {ds: sorted(dep._appNames) for ds, dep in depCatalog._dependencies.items()},
+    "appStatuses": {ds: depCatalog.getAppStatuses(ds) for ds in depCatalog._dependencies},
+    "changed": depCatalog.getChangedDependencies(),
+    "appDependencies": {b: nd._appCatalog.getApp(b)._dependencies
+      for b in nd._appCatalog.getAllAppBranches()},
+  }
+
+def runSharded(tmp_path, shardCount):
+  for shardIndex in range(shardCount):
+    appBranches = [b for b in REPORTS
+      if shards.shardForBranch(b, shardCount) == shardIndex]
+    nd = FakeNexusData(appBranches)
+    recorder = shards.ShardRecorder()
+    nd._depCatalog.addListener(recorder.dependencyAdded)
+    nd.getAllLicensesAndReports()
+    filename = shards.getShardFilename(str(tmp_path), shardIndex, shardCount)
+    assert shards.writeShard(nd, recorder, filename, shardIndex, shardCount)
+
+  merged = FakeNexusData([])
+  filenames = shards.findShardFiles(str(tmp_path), shardCount)
+  assert shards.mergeShards(merged, filenames) == shardCount
+  return merged
+
+def test_merge_matches_single_run(tmp_path, monkeypatch):
+  monkeypatch.setattr("time.sleep", lambda seconds: None)
+  single = FakeNexusData(REPORTS)
+  single.getAllLicensesAndReports()
+  expected = describe(single)
+  assert expected["dependencies"]["g : x : 1"]["effectiveLicenses"] == ["MIT"]
+  assert expected["changed"] == ["g : x : 1", "g : y : 1"]
+
+  for shardCount in [1, 2, 3, 5]:
+    merged = runSharded(tmp_path / str(shardCount), shardCount)
+    assert describe(merged) == expected
+
+def test_merge_refuses_old_shards(tmp_path):
+  filename = shards.getShardFilename(str(tmp_path), 0, 1)
+  with open(filename, 'w') as f:
+    json.dump({"version": 1, "apps": [], "dependencies": {}}, f)
+  assert shards.mergeShards(FakeNexusData([]), [filename]) == 0
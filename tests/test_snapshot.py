@@ -0,0 +1,53 @@
+# test_snapshot.py
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+from apps import FETCH_STATUS_STALE
+from main import NexusData
+from snapshot import loadSnapshot, saveSnapshot
+from test_shards import REPORTS, FakeNexusData, describe
+
+def makeNexusData():
+  nd = FakeNexusData(list(REPORTS))
+  nd.getAllLicensesAndReports()
+  return nd
+
+def describeApps(nd):
+  return {b: nd._appCatalog.getApp(b).toDict() for b in nd._appCatalog.getAllAppBranches()}
+
+def test_round_trip(tmp_path):
+  nd = makeNexusData()
+  # "y" is cleared in app-d's report only
+  assert nd._depCatalog.getAppStatuses("g : y : 1")["app-d"] == "Cleared"
+  nd._depCatalog._changedDeps = {"g : y : 1"}
+  nd._appCatalog.getApp("app-b").setFetchStatus(FETCH_STATUS_STALE)
+  filename = str(tmp_path / "catalog.snapshot")
+  assert saveSnapshot(nd, filename) == filename
+
+  loaded = NexusData()
+  assert loadSnapshot(loaded, filename)
+  assert describe(loaded) == describe(nd)
+  assert describeApps(loaded) == describeApps(nd)
+  assert loaded._appCatalog._orgId == "org"
+  assert loaded._depCatalog._indexKeys == nd._depCatalog._indexKeys
+  assert loaded._depCatalog.queryDependencies(minThreat=8) == \
+    nd._depCatalog.queryDependencies(minThreat=8)
+
+def test_refuses_other_files(tmp_path):
+  filename = tmp_path / "catalog.snapshot"
+  filename.write_bytes(b"not a snapshot")
+  assert not loadSnapshot(NexusData(), str(filename))
@@ -0,0 +1,70 @@
+# test_storage.py
+#
+# Copyright (C) 2017 The Linux Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+from pathlib import Path
+
+from storage import JSONStore, INDEX_FILENAME
+
+def ageBlobs(storeDir, seconds):
+  for p in Path(storeDir).glob("blobs/*/*.json.gz"):
+    st = p.stat()
+    os.utime(p, (st.st_atime - seconds, st.st_mtime - seconds))
+
+def test_index_saved_once_per_batch(tmp_path):
+  store = JSONStore(str(tmp_path))
+  for i in range(5):
+    store.put(f"branch-{i}", f'{{"n": {i}}}'.encode("utf-8"), "r1", "app")
+  assert not (tmp_path / INDEX_FILENAME).exists()
+  assert store.saveIndex()
+
+  reloaded = JSONStore(str(tmp_path))
+  assert reloaded.getAllBranches() == [f"branch-{i}" for i in range(5)]
+  assert reloaded.loadJSON("branch-3") == {"n": 3}
+  assert reloaded.getReportId("branch-3") == "r1"
+  assert reloaded.getAppName("branch-3") == "app"
+
+def test_prune_deletes_only_unreferenced_blobs(tmp_path):
+  store = JSONStore(str(tmp_path))
+  store.put("a", b'{"report": 1}', "r1")
+  store.put("b", b'{"report": 1}', "r1")
+  store.put("c", b'{"report": 2}', "r1")
+  store.saveIndex()
+  # c's report is replaced, leaving its old blob unreferenced
+  store.put("c", b'{"report": 3}', "r2")
+  store.saveIndex()
+  ageBlobs(tmp_path, 60)
+  assert store.getDiskUsage()[0] == 3
+
+  deleted, freedBytes = store.prune()
+  assert deleted == 1
+  assert freedBytes > 0
+  assert store.getDiskUsage()[0] == 2
+  for branch, report in [("a", 1), ("b", 1), ("c", 3)]:
+    assert store.loadJSON(branch) == {"report": report}
+
+def test_prune_keeps_blobs_newer_than_index(tmp_path):
+  store = JSONStore(str(tmp_path))
+  store.put("a", b'{"report": 1}', "r1")
+  store.saveIndex()
+  ageBlobs(tmp_path, 60)
+  os.utime(tmp_path / INDEX_FILENAME, (0, os.path.getmtime(tmp_path / INDEX_FILENAME) - 30))
+  # written by a run that hasn't saved the index yet
+  other = JSONStore(str(tmp_path))
+  other.put("b", b'{"report": 2}', "r1")
+  assert store.prune() == (0, 0)